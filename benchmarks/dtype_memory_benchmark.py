@@ -0,0 +1,125 @@
+"""省メモリ型（compact_frame）適用前後のメモリ使用量と集計結果の差を比較する。
+
+DB 接続は不要で、実品種相当の規模の Yield / WAT ワイド形式データを合成して測る。
+
+    uv run python -m benchmarks.dtype_memory_benchmark --lots 900 --wafers 25 --bins 64 --params 250 --sites 9
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.app.data.schema import compact_frame, memory_report
+from src.app.services import YieldService, compute_bulk_spc
+
+
+def _yield_frame(rng: np.random.Generator, lots: int, wafers: int, bins: int) -> pd.DataFrame:
+    """CP 工程のワイド形式（1ウエハ1行、0_PASS と FAIL_BIN_* は EffectiveNum に対する %）。"""
+    n = lots * wafers
+    lot_ids = np.repeat([f"LT{i:06d}.1" for i in range(lots)], wafers)
+    effective = rng.integers(800, 1200, n).astype(np.float64)
+    counts = rng.dirichlet(np.r_[40.0, np.full(bins, 0.2)], n) * effective[:, None]
+    df = pd.DataFrame(
+        {
+            "Product": np.full(n, "SCP117A", dtype=object),
+            "BulkID": pd.Series(lot_ids, dtype=object).str.slice(0, 8),
+            "LotID": pd.Series(lot_ids, dtype=object),
+            "WaferID": np.tile(np.arange(1, wafers + 1), lots).astype(np.float64),
+            "Time": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n) * 600, unit="s"),
+            "EffectiveNum": effective,
+            "0_PASS": counts[:, 0] / effective * 100,
+        }
+    )
+    fails = {f"FAIL_BIN_{b + 2:02d}_F{b + 2}": counts[:, b + 1] / effective * 100 for b in range(bins)}
+    df = pd.concat([df, pd.DataFrame(fails)], axis=1)
+    df["Stage"] = "CP"
+    return df
+
+
+def _wat_frame(rng: np.random.Generator, lots: int, wafers: int, params: int, sites: int) -> pd.DataFrame:
+    """WAT のワイド形式（1サイト1行、パラメータごとに桁の異なる測定値）。"""
+    n_wafers = lots * wafers
+    n = n_wafers * sites
+    wafer_ids = np.repeat([f"LT{i // wafers:06d}-{i % wafers + 1:02d}" for i in range(n_wafers)], sites)
+    site = np.tile(np.arange(1, sites + 1), n_wafers)
+    df = pd.DataFrame(
+        {
+            "Product": np.full(n, "SCP117A", dtype=object),
+            "BulkID": pd.Series(wafer_ids, dtype=object).str.slice(0, 8),
+            "WaferID": pd.Series(wafer_ids, dtype=object),
+            "DieX": (site % 3 - 1).astype(np.float64) * 5,
+            "DieY": (site // 3 - 1).astype(np.float64) * 5,
+            "Site": site.astype(np.float64),
+            "Time": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.repeat(np.arange(n_wafers), sites) * 600, unit="s"),
+        }
+    )
+    # しきい値電圧・リーク電流・抵抗などを想定して桁を散らす
+    scales = 10.0 ** rng.integers(-12, 4, params)
+    values = rng.normal(1.0, 0.05, (n, params)) * scales
+    measurements = pd.DataFrame(values, columns=[f"PRM_{p:03d}" for p in range(params)])
+    return pd.concat([df, measurements], axis=1)
+
+
+def _measure(label: str, df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, object]]:
+    before = memory_report(df)
+    started = time.perf_counter()
+    compact = compact_frame(df)
+    elapsed = time.perf_counter() - started
+    after = memory_report(compact)
+    return compact, {
+        "dataset": label,
+        "rows": len(df),
+        "columns": df.shape[1],
+        "before_MB": round(before.bytes / 1024**2, 1),
+        "after_MB": round(after.bytes / 1024**2, 1),
+        "ratio": round(after.bytes / before.bytes, 3),
+        "compact_s": round(elapsed, 3),
+    }
+
+
+def _max_relative_diff(left: pd.DataFrame, right: pd.DataFrame) -> float:
+    a = left.to_numpy(dtype=np.float64)
+    b = right.to_numpy(dtype=np.float64)
+    scale = np.maximum(np.abs(a), np.finfo(np.float64).tiny)
+    with np.errstate(invalid="ignore"):
+        return float(np.nanmax(np.abs(a - b) / scale))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lots", type=int, default=900, help="6か月分のロット数")
+    parser.add_argument("--wafers", type=int, default=25)
+    parser.add_argument("--bins", type=int, default=64)
+    parser.add_argument("--params", type=int, default=250)
+    parser.add_argument("--sites", type=int, default=9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    yield_df = _yield_frame(rng, args.lots, args.wafers, args.bins)
+    wat_df = _wat_frame(rng, args.lots, args.wafers, args.params, args.sites)
+    yield_compact, yield_row = _measure("yield CP", yield_df)
+    wat_compact, wat_row = _measure("WAT", wat_df)
+    print(pd.DataFrame([yield_row, wat_row]).to_string(index=False))
+
+    print("\n列別内訳（WAT, 変換後の上位）")
+    print(memory_report(wat_compact).columns.head(8).to_string(index=False))
+
+    # 省メモリ型でも集計結果が実用上変わらないことを確認する
+    summary = YieldService.build_summary(yield_df, "BulkID").set_index("BulkID")
+    summary_compact = YieldService.build_summary(yield_compact, "BulkID").set_index("BulkID")
+    metrics = [c for c in summary.columns if c != "Category"]
+    print(f"\nbuild_summary(BulkID) 最大相対誤差: {_max_relative_diff(summary[metrics], summary_compact[metrics]):.2e}")
+    params = [f"PRM_{p:03d}" for p in range(min(args.params, 20))]
+    spc = compute_bulk_spc(wat_df, params).bulk
+    spc_compact = compute_bulk_spc(wat_compact, params).bulk
+    columns = ["mean_val", "std_val", "UCL", "LCL"]
+    print(f"SPC BulkID 統計 最大相対誤差: {_max_relative_diff(spc[columns], spc_compact[columns]):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""クライアント側ピボットとサーバー側集計の転送行数・所要時間を比較する。
+
+Oracle 接続が必要です（.env の DB_USERNAME / DB_PASSWORD / DB_DSN）。
+
+    uv run python -m benchmarks.yield_pivot_benchmark --product SCP117A --stage CP --repeat 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.app.config import load_config
+from src.app.data.oracle_repo import PIVOT_MODES, OracleRepository
+
+
+def _count_rows(repo: OracleRepository, counter: list[int]) -> None:
+    """リポジトリが受信した行数を数えられるようにフェッチ処理をフックする。"""
+    original = repo._fetch_frame
+
+    def counting_fetch_frame(conn, query, params):
+        df = original(conn, query, params)
+        counter[0] += len(df)
+        return df
+
+    repo._fetch_frame = counting_fetch_frame
+
+
+def _compare(client: pd.DataFrame, server: pd.DataFrame) -> str:
+    if list(client.columns) != list(server.columns):
+        missing = sorted(set(client.columns) ^ set(server.columns))
+        return f"columns differ: {missing[:5]}"
+    if len(client) != len(server):
+        return f"row count differs: {len(client)} vs {len(server)}"
+    rate_cols = [c for c in client.columns if c == "0_PASS" or c.startswith("FAIL_BIN_")]
+    diff = np.nanmax(np.abs(client[rate_cols].to_numpy(float) - server[rate_cols].to_numpy(float)))
+    return f"max abs diff {diff:.3g}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--product", required=True, help="PRODUCT_ID (source_name)")
+    parser.add_argument("--stage", default="CP", choices=["CP", "FT"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    load_dotenv()
+    config = load_config()
+    config = replace(config, database=replace(config.database, backend="oracle", yield_incremental=False))
+    repo = OracleRepository(config)
+    counter = [0]
+    _count_rows(repo, counter)
+
+    results: dict[str, pd.DataFrame] = {}
+    rows = []
+    for mode in PIVOT_MODES:
+        timings = []
+        for _ in range(args.repeat):
+            counter[0] = 0
+            started = time.perf_counter()
+            df = repo.load_yield_overview(args.product, args.stage, pivot_mode=mode)
+            timings.append(time.perf_counter() - started)
+        results[mode] = df
+        rows.append(
+            {
+                "mode": mode,
+                "rows_transferred": counter[0],
+                "wafers": len(df),
+                "columns": df.shape[1],
+                "best_s": min(timings),
+                "median_s": float(np.median(timings)),
+            }
+        )
+    repo.close()
+
+    print(pd.DataFrame(rows).to_string(index=False))
+    print("schema check:", _compare(results["client"], results["server"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
+from dataclasses import asdict
+
 import streamlit as st
 
+from src.app.charts import configure_figure_cache
 from src.app.config import load_config
-from src.app.data import create_repository
-from src.app.services import YieldService
+from src.app.data import (
+    cache_statistics,
+    coalescing_statistics,
+    create_repository,
+    dataset_memory,
+    get_dataset_store,
+    in_flight_queries,
+    pool_statistics,
+)
+from src.app.services import YieldService, ensure_prefetch_scheduler
 
 st.set_page_config(page_title="Dashboard Home", layout="wide")
 
 
 def main() -> None:
     config = load_config()
+    scheduler = ensure_prefetch_scheduler(config)
     repo = create_repository(config)
     yield_service = YieldService(repo)
 
@@ -35,6 +47,75 @@ def main() -> None:
         }
     )
 
+    st.subheader("接続プール")
+    pool_rows = pool_statistics(check_health=True)
+    if pool_rows:
+        st.dataframe(pool_rows, width="stretch")
+    else:
+        st.info("共有中の接続プールはありません。")
+
+    st.subheader("クエリキャッシュ")
+    cache_rows = cache_statistics()
+    if cache_rows:
+        st.dataframe(cache_rows, width="stretch")
+    else:
+        st.info("クエリキャッシュは無効です（CACHE_TTL_SECONDS=0）。")
+
+    st.subheader("同時リクエストの集約")
+    flight_rows = coalescing_statistics()
+    if flight_rows:
+        st.caption("キャッシュにない同じ (backend, product, stage) の取得が重なった場合、1回のクエリ結果を共有します。")
+        st.dataframe(flight_rows, width="stretch")
+        running = in_flight_queries()
+        if running:
+            st.dataframe(running, width="stretch")
+    else:
+        st.info("クエリキャッシュが無効のため、同時リクエストは集約されません。")
+
+    st.subheader("共有データセットストア")
+    store = get_dataset_store(config)
+    store_stats = store.stats()
+    st.caption(
+        f"{store_stats.entries} 件 / {store_stats.bytes / 1024**2:,.1f} MB"
+        f"（上限 {store_stats.max_bytes / 1024**2:,.0f} MB）・セッションのハンドル {store_stats.handles} 個"
+        f"・共有ヒット {store_stats.hits} 回 / 新規 {store_stats.loads} 回 / 追い出し {store_stats.evictions} 回"
+    )
+    store_entries = store.entries()
+    if store_entries:
+        st.dataframe([asdict(e) for e in store_entries], width="stretch")
+        if st.button("参照されていないデータセットを解放"):
+            st.success(f"{store.evict_idle()} 件を解放しました。")
+    else:
+        st.info("常駐しているデータセットはありません。")
+
+    st.subheader("データセットのメモリ")
+    datasets = dataset_memory()
+    if datasets:
+        st.caption(
+            "COMPACT_DTYPES=" + ("1（ID はカテゴリ型、率・測定値は float32）" if config.database.compact_dtypes else "0")
+        )
+        st.dataframe([row for row, _ in datasets], width="stretch")
+        labels = [f"{row['product']} / {row['stage']}" for row, _ in datasets]
+        selected = st.selectbox("列別の内訳", range(len(datasets)), format_func=labels.__getitem__)
+        st.dataframe(datasets[selected][1].columns, width="stretch")
+    else:
+        st.info("キャッシュ中のデータセットはありません。")
+
+    st.subheader("図キャッシュ")
+    figure_stats = configure_figure_cache(config).stats()
+    if figure_stats.max_entries > 0:
+        st.dataframe([asdict(figure_stats)], width="stretch")
+    else:
+        st.info("図キャッシュは無効です（CHART_CACHE_ENTRIES=0）。")
+
+    st.subheader("バックグラウンド更新")
+    if scheduler is None:
+        st.info("先読みスケジューラは無効です（PREFETCH_INTERVAL_SECONDS=0）。")
+    elif not scheduler.status():
+        st.info(f"初回の更新を実行中です（間隔 {scheduler.interval_seconds} 秒）。")
+    else:
+        st.dataframe([asdict(s) for s in scheduler.status()], width="stretch")
+
 
 if __name__ == "__main__":
     main()
@@ -2,13 +2,15 @@ import pandas as pd
 import streamlit as st
 
 from src.app.charts import (
+    RenderBudget,
     build_distribution_chart,
     build_failure_mode_chart,
     build_yield_combo_chart,
+    configure_figure_cache,
 )
 from src.app.config import load_config
-from src.app.data import create_repository
-from src.app.services import YieldService
+from src.app.data import DatasetHandle, create_repository, create_snapshot_store, get_dataset_store
+from src.app.services import YieldService, ensure_prefetch_scheduler
 from src.app.ui import (
     sidebar_backend_selector,
     sidebar_product_selector,
@@ -17,12 +19,19 @@ from src.app.ui import (
 
 st.set_page_config(page_title="Yield Analysis", layout="wide")
 
+AGGREGATION_LABELS = {"mean": "ウエハ平均", "weighted": "ダイ加重"}
+
 
 def main() -> None:
     config = load_config()
+    ensure_prefetch_scheduler(config)
     config = sidebar_backend_selector(config)
+    configure_figure_cache(config)
+    budget = RenderBudget.from_config(config)
     repo = create_repository(config)
-    service = YieldService(repo)
+    snapshots = create_snapshot_store(config)
+    service = YieldService(repo, snapshots)
+    store = get_dataset_store(config)
     current_backend = config.database.backend
 
     st.title("Yield Analysis")
@@ -57,16 +66,22 @@ def main() -> None:
         st.info("サイドバーから Run Analysis を押してデータを読込んでください。")
         return
 
-    stage_cache: dict[str, pd.DataFrame] = {} if run_analysis else (state["data"] if state else {})
+    # セッションには共有ストアのハンドルだけを置き、DataFrame は同じ版を開いた全員で共有する
+    stage_cache: dict[str, DatasetHandle] = {} if run_analysis else (state["data"] if state else {})
     needs_load = run_analysis or selected_stage not in stage_cache
 
     if needs_load:
-        df_stage = service.load_dataset(selected_product, selected_stage)
+        handle = store.open(
+            current_backend,
+            selected_product.name,
+            selected_stage,
+            lambda: service.load_dataset(selected_product, selected_stage),
+        )
+        df_stage = handle.frame
         if df_stage.empty:
             st.warning(f"{selected_product.label} の {selected_stage} データが見つかりません。")
             return
-        stage_cache = stage_cache.copy()
-        stage_cache[selected_stage] = df_stage
+        stage_cache = {**stage_cache, selected_stage: handle}
         st.session_state[SESSION_KEY] = {
             "product": selected_product.name,
             "data": stage_cache,
@@ -78,9 +93,12 @@ def main() -> None:
         else:
             st.info(f"{selected_product.label} の {selected_stage} データを読み込みました。")
     else:
-        df_stage = stage_cache[selected_stage]
+        df_stage = stage_cache[selected_stage].frame
         st.info(f"{selected_product.label} のキャッシュ済み {selected_stage} データを使用しています。")
 
+    # 全粒度のサマリーは版ごとに1度だけ作り、新しい版では変わった月だけ集計し直す
+    rollups = stage_cache[selected_stage].derived("rollups", service.build_rollups, update=service.update_rollups)
+
     def render_stage_section(stage_name: str, df_stage: pd.DataFrame) -> None:
         agg_period = st.radio(
             "集計粒度",
@@ -88,16 +106,26 @@ def main() -> None:
             horizontal=True,
             key=f"agg_period_{stage_name.lower()}",
         )
-        df_summary = service.build_summary(df_stage, agg_period)
-        st.plotly_chart(build_yield_combo_chart(df_summary), width="stretch")
+        mode = "mean"
+        if rollups.weighted:
+            mode = st.radio(
+                "集計方法",
+                options=list(AGGREGATION_LABELS),
+                format_func=AGGREGATION_LABELS.get,
+                horizontal=True,
+                key=f"agg_mode_{stage_name.lower()}",
+                help="ダイ加重は BIN ダイ数の合計 / EffectiveNum の合計で、ウエハごとのダイ数の違いを反映します。",
+            )
+        df_summary = service.build_summary(rollups, agg_period, mode)
+        st.plotly_chart(build_yield_combo_chart(df_summary, budget=budget), width="stretch")
 
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("#### Lot別分布")
-            st.plotly_chart(build_distribution_chart(df_stage), width="stretch")
+            st.plotly_chart(build_distribution_chart(df_stage, budget=budget), width="stretch")
         with col2:
             st.markdown("#### 不良モード構成比")
-            fig_failure = build_failure_mode_chart(df_stage)
+            fig_failure = build_failure_mode_chart(df_stage, budget=budget)
             if fig_failure.data:
                 st.plotly_chart(fig_failure, width="stretch")
             else:
@@ -1,15 +1,26 @@
 import streamlit as st
 
 from src.app.charts import (
+    RenderBudget,
     build_bulk_trend_chart,
     build_individual_chart,
     build_wafer_map,
+    configure_figure_cache,
 )
 from src.app.config import load_config
-from src.app.data import create_repository
-from src.app.services import WATService, YieldService
-from src.app.specs import extract_limits, load_specs
+from src.app.data.cache import WAT_STAGE_KEY
+from src.app.data import create_repository, create_snapshot_store, get_dataset_store
+from src.app.services import (
+    WATService,
+    YieldService,
+    ensure_prefetch_scheduler,
+    individual_limits,
+    worst_parameters,
+)
+from src.app.specs import load_compiled_specs
 from src.app.ui import (
+    load_progress_bar,
+    paginate,
     sidebar_backend_selector,
     sidebar_product_selector,
     sidebar_run_button,
@@ -20,10 +31,15 @@ st.set_page_config(page_title="WAT / SPC Analysis", layout="wide")
 
 def main() -> None:
     config = load_config()
+    ensure_prefetch_scheduler(config)
     config = sidebar_backend_selector(config)
+    configure_figure_cache(config)
+    budget = RenderBudget.from_config(config)
     repo = create_repository(config)
-    wat_service = WATService(repo)
-    yield_service = YieldService(repo)
+    snapshots = create_snapshot_store(config)
+    wat_service = WATService(repo, snapshots)
+    store = get_dataset_store(config)
+    yield_service = YieldService(repo, snapshots)
     current_backend = config.database.backend
 
     st.title("WAT / SPC Analysis")
@@ -47,45 +63,106 @@ def main() -> None:
         return
 
     if run_analysis:
-        df = wat_service.load_dataset(product.source_name)
-        if df.empty:
+        update_progress, progress_bar = load_progress_bar("WATデータ取得中")
+        handle = store.open(
+            current_backend,
+            product.name,
+            WAT_STAGE_KEY,
+            lambda: wat_service.load_dataset(product.source_name),
+            initial=lambda: wat_service.load_dataset(product.source_name, progress=update_progress),
+        )
+        progress_bar.empty()
+        if handle.frame.empty:
             st.warning("対象データが空です。")
             return
-        specs = load_specs(product.name)
+        # セッションにはハンドルだけを置き、SPC などの導出結果も同じ版を開いた全員で共有する
         st.session_state[SESSION_KEY] = {
             "product": product.name,
-            "data": df,
-            "specs": specs,
+            "data": handle,
             "backend": current_backend,
         }
         state = st.session_state[SESSION_KEY]
         st.success(f"{product.label} のWATデータを読み込みました。")
     elif state:
-        df = state["data"]
-        specs = state["specs"]
+        handle = state["data"]
         st.info(f"{product.label} のキャッシュ済みデータを使用しています。")
     else:
         st.warning("データが存在しません。Run Analysis を実行してください。")
         return
 
+    df = handle.frame
+    specs = load_compiled_specs(product.name)
     if specs is None:
         st.info("Specsが見つからないため管理限界線は表示されません。")
 
-    params = wat_service.available_parameters(df)
+    spc = handle.derived("spc", lambda frame: wat_service.compute_spc(frame, specs), depends=specs)
+    params = spc.parameters
     if not params:
         st.warning("数値パラメータが見つかりません。")
         return
+    violations, ranking = handle.derived("violations", lambda _: wat_service.detect_violations(spc), depends=spc)
+
+    st.markdown("### Process Capability")
+    capability = handle.derived(
+        "capability", lambda frame: wat_service.compute_capability(frame, specs), depends=specs
+    )
+    cap_col1, cap_col2, cap_col3 = st.columns(3)
+    with cap_col1:
+        level = st.radio(
+            "集計単位",
+            ["overall", "BulkID", "Period"],
+            format_func={"overall": "全体", "BulkID": "BulkID別", "Period": "月別"}.get,
+            horizontal=True,
+        )
+    with cap_col2:
+        cap_index = st.selectbox("並べ替え指標", ["Cpk", "Ppk", "Cp", "Pp"])
+    with cap_col3:
+        specs_only = st.checkbox("規格のあるパラメータのみ", value=True)
+    cap_table = worst_parameters(capability.table(level), index=cap_index, only_with_specs=specs_only)
+    if cap_table.empty:
+        st.info("工程能力を計算できるパラメータがありません（Specs 未設定）。")
+    else:
+        below = int((cap_table[cap_index] < 1.33).sum())
+        st.caption(f"{cap_index} < 1.33 の行: {below} / {len(cap_table)}（列見出しのクリックで並べ替えできます）")
+        st.dataframe(cap_table, hide_index=True, width="stretch")
+
+    st.markdown("### SPC Rule Violations")
+    if ranking.empty:
+        st.success("Western Electric / Nelson ルールの違反はありません。")
+    else:
+        st.caption(f"{len(ranking)} / {len(params)} パラメータでルール違反を検出しました（スコア順）。")
+        st.dataframe(ranking, hide_index=True, width="stretch")
+        with st.expander("違反点の一覧"):
+            st.dataframe(violations, hide_index=True, width="stretch")
 
     st.markdown("### Bulk Trend")
+    filter_col1, filter_col2, filter_col3 = st.columns([2, 1, 1])
+    with filter_col1:
+        search = st.text_input("パラメータ検索", placeholder="名前の一部で絞り込み")
+    with filter_col2:
+        order = st.selectbox(
+            "並び順",
+            list(WATService.PARAMETER_ORDERS),
+            format_func={"severity": "SPC違反スコア順", "name": "名前順", "original": "元の順序"}.get,
+        )
+    with filter_col3:
+        only_flagged = st.checkbox(
+            "ルール違反のみ", value=not ranking.empty, disabled=ranking.empty
+        )
+    trend_params = wat_service.order_parameters(
+        params, ranking, search=search, order=order, flagged_only=only_flagged
+    )
+    # 表示中のページ分だけ図を生成・送信する
+    visible_params = paginate(trend_params, key="wat_trend")
     columns = st.columns(3)
-    for idx, param in enumerate(params):
-        trend = wat_service.aggregate_bulk_trend(df, param)
+    for idx, param in enumerate(visible_params):
+        trend = spc.trend(param)
         if trend.empty:
             continue
-        usl, lsl = extract_limits(specs, param)
+        usl, lsl = spc.spec_limits(param)
         with columns[idx % 3]:
             st.plotly_chart(
-                build_bulk_trend_chart(trend, param, usl, lsl),
+                build_bulk_trend_chart(trend, param, usl, lsl, budget=budget),
                 width="stretch",
             )
 
@@ -98,8 +175,11 @@ def main() -> None:
         selected_param = st.selectbox("Parameter", params)
 
     if selected_bulk and selected_param:
-        df_detail = df[df["BulkID"] == selected_bulk]
-        usl, lsl = extract_limits(specs, selected_param)
+        df_detail = wat_service.load_lot(product.source_name, selected_bulk)
+        usl, lsl = spc.spec_limits(selected_param)
+        limits = spc.control_limits(selected_param, selected_bulk)
+        if limits is None and selected_param in df_detail.columns:
+            limits = individual_limits(df_detail[selected_param])
         col_a, col_b = st.columns(2)
         with col_a:
             st.plotly_chart(
@@ -107,7 +187,14 @@ def main() -> None:
             )
         with col_b:
             st.plotly_chart(
-                build_individual_chart(df_detail, selected_param, usl, lsl),
+                build_individual_chart(
+                    df_detail,
+                    selected_param,
+                    usl,
+                    lsl,
+                    limits=limits,
+                    budget=budget,
+                ),
                 width="stretch",
             )
 
@@ -1,10 +1,16 @@
+import pandas as pd
 import streamlit as st
 
-from src.app.charts import build_wafer_map
+from src.app.charts import build_wafer_gallery, build_wafer_map, configure_figure_cache
 from src.app.config import load_config
-from src.app.data import create_repository
-from src.app.services import WATService, YieldService
+from src.app.data.cache import WAT_INDEX_STAGE_KEY, WAT_STAGE_KEY
+from src.app.data import DatasetStore, create_repository, create_snapshot_store, get_dataset_store
+from src.app.services import WATService, WaferGrid, YieldService, ensure_prefetch_scheduler
+from src.app.services.spc import WAT_SPEC_STAGE
+from src.app.specs import extract_limits, load_compiled_specs
 from src.app.ui import (
+    load_progress_bar,
+    paginate,
     sidebar_backend_selector,
     sidebar_product_selector,
     sidebar_run_button,
@@ -12,13 +18,202 @@ from src.app.ui import (
 
 st.set_page_config(page_title="Wafer Map Viewer", layout="wide")
 
+COLORSCALES = ["Viridis", "Plasma", "Turbo", "Cividis", "RdBu"]
+VIEW_MODES = ["Single Wafer", "Stack Map", "Gallery"]
+STAT_LABELS = {
+    "mean": "Mean",
+    "median": "Median",
+    "sigma": "Sigma",
+    "fail_rate": "Fail Rate (%)",
+    "count": "Wafer Count",
+}
+
+
+def _lot_grid(state: dict, wat_service: WATService, product, bulk_id: str) -> WaferGrid | None:
+    """選択ロットの密行列。同じ BulkID の間は作り直さない。"""
+    lot_grid = state.get("grid")
+    if lot_grid is None or lot_grid[0] != bulk_id:
+        lot_df = wat_service.load_lot(product.source_name, bulk_id)
+        lot_grid = (bulk_id, wat_service.build_wafer_grid(lot_df))
+        state["grid"] = lot_grid
+    return lot_grid[1]
+
+
+def _dataset_grid(state: dict, store: DatasetStore, wat_service: WATService, product) -> WaferGrid | None:
+    """期間指定のスタックマップ用に、品種全体の密行列を版ごとに1度だけ作る（全セッションで共有）。"""
+    if "dataset" not in state:
+        update_progress, progress_bar = load_progress_bar("WATデータ取得中")
+        state["dataset"] = store.open(
+            state["backend"],
+            product.name,
+            WAT_STAGE_KEY,
+            lambda: wat_service.load_dataset(product.source_name),
+            initial=lambda: wat_service.load_dataset(product.source_name, progress=update_progress),
+        )
+        progress_bar.empty()
+    return state["dataset"].derived("wafer_grid", wat_service.build_wafer_grid)
+
+
+def _render_single_wafer(state: dict, wat_service: WATService, product, wafer_index) -> None:
+    wafer_keys = {
+        f"{wafer} ({bulk})": (bulk, wafer)
+        for bulk, wafer in wafer_index[["BulkID", "WaferID"]].itertuples(index=False, name=None)
+    }
+    if not wafer_keys:
+        st.warning("WaferID カラムが見つかりません。")
+        return
+
+    st.markdown("### 表示設定")
+    sel_col1, sel_col2, sel_col3 = st.columns(3)
+    with sel_col1:
+        selected_label = st.selectbox("Wafer ID", list(wafer_keys))
+    selected_bulk, selected_wafer = wafer_keys[selected_label]
+    # 同じ BulkID 内のウエハ切り替えは読み込み済みの密行列を参照するだけにする
+    grid = _lot_grid(state, wat_service, product, selected_bulk)
+    if grid is None:
+        st.warning("選択したロットの測定データが見つかりません。")
+        return
+    position = grid.position(selected_wafer, selected_bulk)
+    parameters = grid.parameters
+    if not parameters:
+        st.warning("数値パラメータが見つかりません。")
+        return
+    with sel_col2:
+        selected_param = st.selectbox("Parameter", parameters)
+    with sel_col3:
+        selected_colorscale = st.selectbox("Colorscale", COLORSCALES)
+
+    zmin, zmax = grid.value_range(selected_param, position)
+
+    auto_scale = st.checkbox("ウエハ内の値でカラースケールを自動調整", value=True)
+    manual_min, manual_max = zmin, zmax
+    if not auto_scale:
+        range_col1, range_col2 = st.columns(2)
+        with range_col1:
+            manual_min = st.number_input(
+                "Color Min", value=zmin if zmin is not None else 0.0, format="%.4f"
+            )
+        with range_col2:
+            manual_max = st.number_input(
+                "Color Max", value=zmax if zmax is not None else 0.0, format="%.4f"
+            )
+
+    fig = build_wafer_map(
+        grid.die_map(selected_param, position),
+        selected_param,
+        x=grid.x,
+        y=grid.y,
+        colorscale=selected_colorscale,
+        zmin=None if auto_scale else manual_min,
+        zmax=None if auto_scale else manual_max,
+        title=f"{product.label} / {selected_wafer} ({selected_param})",
+    )
+    st.plotly_chart(fig, width="stretch")
+
+    st.markdown("### Data Preview")
+    st.dataframe(grid.die_frame(selected_param, position))
+
+
+def _select_wafer_set(state: dict, store: DatasetStore, wat_service: WATService, product, wafer_index):
+    """スタックマップ・ギャラリーの対象ウエハ (grid, positions, 説明) を選ぶ。"""
+    scope = st.radio("対象ウエハ", ["ロット", "期間"], horizontal=True)
+    if scope == "ロット":
+        bulks = list(dict.fromkeys(wafer_index["BulkID"]))
+        selected_bulk = st.selectbox("BulkID", bulks)
+        grid = _lot_grid(state, wat_service, product, selected_bulk)
+        if grid is None:
+            return None, None, ""
+        return grid, grid.positions(bulk_id=selected_bulk), str(selected_bulk)
+
+    times = pd.to_datetime(wafer_index["Time"])
+    first, last = times.min().date(), times.max().date()
+    date_range = st.date_input("期間", value=(first, last), min_value=first, max_value=last)
+    if not isinstance(date_range, (tuple, list)) or len(date_range) != 2:
+        st.info("開始日と終了日を選択してください。")
+        return None, None, ""
+    start, end = date_range
+    grid = _dataset_grid(state, store, wat_service, product)
+    if grid is None:
+        return None, None, ""
+    end_of_day = pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+    return grid, grid.positions(start=start, end=end_of_day), f"{start} – {end}"
+
+
+def _render_stack(
+    state: dict, store: DatasetStore, wat_service: WATService, product, wafer_index, mode: str
+) -> None:
+    grid, positions, scope_label = _select_wafer_set(state, store, wat_service, product, wafer_index)
+    if grid is None:
+        st.warning("対象ウエハの測定データが見つかりません。")
+        return
+    if len(positions) == 0:
+        st.warning("条件に該当するウエハがありません。")
+        return
+    parameters = grid.parameters
+    if not parameters:
+        st.warning("数値パラメータが見つかりません。")
+        return
+
+    sel_col1, sel_col2, sel_col3 = st.columns(3)
+    with sel_col1:
+        selected_param = st.selectbox("Parameter", parameters)
+    with sel_col2:
+        selected_colorscale = st.selectbox("Colorscale", COLORSCALES)
+    st.caption(f"対象: {scope_label}（{len(positions)} 枚）")
+
+    if mode == "Stack Map":
+        with sel_col3:
+            statistic = st.selectbox(
+                "Statistic", list(wat_service.STACK_STATISTICS), format_func=STAT_LABELS.get
+            )
+        specs = load_compiled_specs(product.name)
+        z = wat_service.composite_wafer_map(grid, selected_param, statistic, positions, specs)
+        fig = build_wafer_map(
+            z,
+            f"{selected_param} {STAT_LABELS[statistic]}",
+            x=grid.x,
+            y=grid.y,
+            colorscale=selected_colorscale,
+            title=f"{product.label} / {scope_label} Stack Map ({selected_param}, {STAT_LABELS[statistic]})",
+        )
+        st.plotly_chart(fig, width="stretch")
+        if statistic == "fail_rate" and extract_limits(specs, selected_param, stage=WAT_SPEC_STAGE) == (None, None):
+            st.info(f"{selected_param} の USL/LSL が未設定のため Fail Rate は 0 になります。")
+        return
+
+    with sel_col3:
+        columns = st.selectbox("列数", [3, 4, 6, 8], index=1)
+    # カラースケールは表示ページではなく対象ウエハ全体で揃える
+    zmin, zmax = grid.value_range(selected_param)
+    visible = paginate(list(positions), key="wafer_gallery", page_sizes=(8, 16, 32, 64), default_size=16)
+    if not visible:
+        return
+    layer = grid.layer(selected_param)
+    fig = build_wafer_gallery(
+        layer[visible],
+        selected_param,
+        x=grid.x,
+        y=grid.y,
+        labels=tuple(grid.wafer_label(i) for i in visible),
+        columns=columns,
+        colorscale=selected_colorscale,
+        zmin=zmin,
+        zmax=zmax,
+        title=f"{product.label} / {scope_label} ({selected_param})",
+    )
+    st.plotly_chart(fig, width="stretch")
+
 
 def main() -> None:
     config = load_config()
+    ensure_prefetch_scheduler(config)
     config = sidebar_backend_selector(config)
+    configure_figure_cache(config)
     repo = create_repository(config)
-    wat_service = WATService(repo)
-    yield_service = YieldService(repo)
+    snapshots = create_snapshot_store(config)
+    wat_service = WATService(repo, snapshots)
+    store = get_dataset_store(config)
+    yield_service = YieldService(repo, snapshots)
     current_backend = config.database.backend
 
     st.title("Wafer Map Viewer")
@@ -44,74 +239,36 @@ def main() -> None:
         return
 
     if run_analysis:
-        df = wat_service.load_dataset(product.source_name)
-        if df.empty:
+        # ウエハ一覧だけを取得し、測定値は選択されたウエハ分をその都度読み込む
+        index_handle = store.open(
+            current_backend,
+            product.name,
+            WAT_INDEX_STAGE_KEY,
+            lambda: wat_service.list_wafer_index(product.source_name),
+        )
+        wafer_index = index_handle.frame
+        if wafer_index.empty:
             st.warning(f"{product.label} の測定データが見つかりません。")
             return
         st.session_state[SESSION_KEY] = {
             "product": product.name,
-            "data": df,
+            "index": index_handle,
             "backend": current_backend,
         }
         state = st.session_state[SESSION_KEY]
-        st.success(f"{product.label} のウエハデータを読み込みました。")
+        st.success(f"{product.label} のウエハ一覧を読み込みました（{len(wafer_index)} 枚）。")
     elif state:
-        df = state["data"]
-        st.info(f"{product.label} のキャッシュ済みデータを使用しています。")
+        wafer_index = state["index"].frame
+        st.info(f"{product.label} のキャッシュ済みウエハ一覧を使用しています。")
     else:
         st.warning("データが存在しません。Load Wafers を実行してください。")
         return
 
-    wafers = wat_service.list_wafers(df)
-    parameters = wat_service.available_parameters(df)
-
-    if not wafers:
-        st.warning("WaferID カラムが見つかりません。")
-        return
-    if not parameters:
-        st.warning("数値パラメータが見つかりません。")
-        return
-
-    st.markdown("### 表示設定")
-    sel_col1, sel_col2, sel_col3 = st.columns(3)
-    with sel_col1:
-        selected_wafer = st.selectbox("Wafer ID", wafers)
-    with sel_col2:
-        selected_param = st.selectbox("Parameter", parameters)
-    with sel_col3:
-        selected_colorscale = st.selectbox(
-            "Colorscale", ["Viridis", "Plasma", "Turbo", "Cividis", "RdBu"]
-        )
-
-    wafer_df = wat_service.filter_by_wafer(df, selected_wafer)
-    zmin, zmax = wat_service.parameter_range(wafer_df, selected_param)
-
-    auto_scale = st.checkbox("ウエハ内の値でカラースケールを自動調整", value=True)
-    manual_min, manual_max = zmin, zmax
-    if not auto_scale:
-        range_col1, range_col2 = st.columns(2)
-        with range_col1:
-            manual_min = st.number_input(
-                "Color Min", value=zmin if zmin is not None else 0.0, format="%.4f"
-            )
-        with range_col2:
-            manual_max = st.number_input(
-                "Color Max", value=zmax if zmax is not None else 0.0, format="%.4f"
-            )
-
-    fig = build_wafer_map(
-        wafer_df,
-        selected_param,
-        colorscale=selected_colorscale,
-        zmin=None if auto_scale else manual_min,
-        zmax=None if auto_scale else manual_max,
-        title=f"{product.label} / {selected_wafer} ({selected_param})",
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-    st.markdown("### Data Preview")
-    preview_cols = ["DieX", "DieY", selected_param]
-    st.dataframe(wafer_df[preview_cols].sort_values(["DieY", "DieX"]))
+    mode = st.radio("表示", VIEW_MODES, horizontal=True)
+    if mode == "Single Wafer":
+        _render_single_wafer(state, wat_service, product, wafer_index)
+    else:
+        _render_stack(state, store, wat_service, product, wafer_index, mode)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 """Plotlyベースのチャート生成ヘルパー。"""
 
 from .yield_charts import build_yield_combo_chart, build_distribution_chart, build_failure_mode_chart
-from .wat_charts import build_bulk_trend_chart, build_wafer_map, build_individual_chart
+from .wat_charts import build_bulk_trend_chart, build_wafer_map, build_wafer_gallery, build_individual_chart
+from .render_budget import RenderBudget, lttb_indices
+from .figure_cache import FigureCache, cached_figure, configure_figure_cache, get_figure_cache
 
 __all__ = [
     "build_yield_combo_chart",
@@ -9,5 +11,12 @@ __all__ = [
     "build_failure_mode_chart",
     "build_bulk_trend_chart",
     "build_wafer_map",
+    "build_wafer_gallery",
     "build_individual_chart",
+    "RenderBudget",
+    "lttb_indices",
+    "FigureCache",
+    "cached_figure",
+    "configure_figure_cache",
+    "get_figure_cache",
 ]
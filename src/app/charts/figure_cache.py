@@ -0,0 +1,159 @@
+"""入力データの指紋と描画オプションをキーに Plotly 図を再利用する LRU キャッシュ。"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, TypeVar
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from ..config import AppConfig
+
+DEFAULT_MAX_ENTRIES = 512
+
+F = TypeVar("F", bound=Callable[..., go.Figure])
+
+
+@dataclass(frozen=True)
+class FigureCacheStats:
+    hits: int
+    misses: int
+    bypassed: int
+    evictions: int
+    entries: int
+    max_entries: int
+
+
+def frame_fingerprint(df: pd.DataFrame) -> tuple:
+    """(行数, 列名と dtype, 全行のハッシュ) による内容指紋。
+
+    サンプリングはせず、インデックスを含む全行をハッシュするので、1セルの書き換えや値の入れ替えも別の図になる。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return (len(df), tuple((str(c), str(t)) for c, t in df.dtypes.items()), digest.hexdigest())
+
+
+def _freeze(value: object) -> Hashable:
+    """引数をキャッシュキーに使えるハッシュ可能な値へ変換する（できなければ TypeError）。"""
+    if isinstance(value, pd.DataFrame):
+        return ("frame", *frame_fingerprint(value))
+    if isinstance(value, pd.Series):
+        return ("series", value.name, *frame_fingerprint(value.to_frame()))
+    if isinstance(value, np.ndarray):
+        # ウエハマップの z 行列など（数 MB 程度までを想定し全体をハッシュする）
+        digest = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16)
+        return ("array", value.shape, value.dtype.str, digest.hexdigest())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return ("nan",)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    hash(value)
+    return value
+
+
+class FigureCache:
+    """go.Figure を LRU で保持する。返す図は共有されるため、呼び出し側で変更してはならない。"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, go.Figure] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evictions = 0
+
+    def get_or_build(self, key: Hashable | None, build: Callable[[], go.Figure]) -> go.Figure:
+        if key is None or self.max_entries <= 0:
+            with self._lock:
+                self._bypassed += 1
+            return build()
+        with self._lock:
+            fig = self._entries.get(key)
+            if fig is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return fig
+            self._misses += 1
+        fig = build()
+        with self._lock:
+            self._entries[key] = fig
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return fig
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > max(max_entries, 0):
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> FigureCacheStats:
+        with self._lock:
+            return FigureCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                bypassed=self._bypassed,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+            )
+
+
+_FIGURE_CACHE = FigureCache()
+
+
+def get_figure_cache() -> FigureCache:
+    return _FIGURE_CACHE
+
+
+def configure_figure_cache(config: AppConfig) -> FigureCache:
+    """CHART_CACHE_ENTRIES を反映する（0 でキャッシュ無効）。"""
+    if _FIGURE_CACHE.max_entries != config.chart_cache_entries:
+        _FIGURE_CACHE.resize(config.chart_cache_entries)
+    return _FIGURE_CACHE
+
+
+def cached_figure(builder: F) -> F:
+    """チャート生成関数の結果を、全引数（DataFrame は指紋）をキーにキャッシュする。"""
+    name = f"{builder.__module__}.{builder.__qualname__}"
+
+    @functools.wraps(builder)
+    def wrapper(*args, **kwargs) -> go.Figure:
+        try:
+            key: Hashable | None = (name, _freeze(args), _freeze(kwargs))
+        except TypeError:
+            key = None
+        return _FIGURE_CACHE.get_or_build(key, lambda: builder(*args, **kwargs))
+
+    wrapper.uncached = builder  # type: ignore[attr-defined]
+    return wrapper  # type: ignore[return-value]
+
+
+__all__ = [
+    "FigureCache",
+    "FigureCacheStats",
+    "cached_figure",
+    "configure_figure_cache",
+    "frame_fingerprint",
+    "get_figure_cache",
+]
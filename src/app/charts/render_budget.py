@@ -0,0 +1,127 @@
+"""ブラウザへ送る点数・トレース数を抑えるための描画予算と間引きヘルパー。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from ..config import AppConfig
+
+OTHER_LABEL = "Other"
+
+
+@dataclass(frozen=True)
+class RenderBudget:
+    """1図あたりの最大点数・最大トレース数。
+
+    点数が webgl_threshold を超える散布図は Scattergl で描き、max_points を超える系列は
+    LTTB で間引く。箱ひげ図は統計量をサーバー側で計算して送る。
+    """
+
+    max_points: int = 5000
+    max_traces: int = 50
+    webgl_threshold: int = 1000
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "RenderBudget | None":
+        """CHART_MAX_POINTS=0 なら予算モードを使わない（従来どおり全点を描く）。"""
+        if config.chart_max_points <= 0:
+            return None
+        return cls(
+            max_points=config.chart_max_points,
+            max_traces=max(config.chart_max_traces, 2),
+            webgl_threshold=min(config.chart_webgl_threshold, config.chart_max_points),
+        )
+
+    def scatter(self, n_points: int) -> type[go.Scatter] | type[go.Scattergl]:
+        return go.Scattergl if n_points > self.webgl_threshold else go.Scatter
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets で残す点の位置（昇順）を返す。
+
+    x は単調増加の数値であること。NaN を含む y は呼び出し側で除いておく。
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 先頭・末尾を固定し、間の n-2 点を n_out-2 個のバケットに分ける
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    anchor = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor]) - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+
+def downsample_frame(df: pd.DataFrame, value: str, n_out: int, x: str | None = None) -> pd.DataFrame:
+    """value 列の形を保ったまま n_out 行まで間引く（x 省略時は行位置を横軸とみなす）。"""
+    valid = df[pd.to_numeric(df[value], errors="coerce").notna()]
+    if len(valid) <= n_out:
+        return valid
+    xs = np.arange(len(valid)) if x is None else pd.to_numeric(valid[x], errors="coerce").to_numpy()
+    keep = lttb_indices(xs, valid[value].to_numpy(dtype=np.float64), n_out)
+    return valid.iloc[keep]
+
+
+def box_statistics(df: pd.DataFrame, group: str, value: str) -> pd.DataFrame:
+    """群ごとの箱ひげ統計量（Tukey の 1.5 IQR フェンス）を一括で求める。"""
+    values = pd.to_numeric(df[value], errors="coerce")
+    grouped = values.groupby(df[group], sort=True, observed=True)
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    stats["mean"] = grouped.mean()
+    stats["n"] = grouped.count()
+    iqr = stats["q3"] - stats["q1"]
+    low_limit = (stats["q1"] - 1.5 * iqr).reindex(df[group]).to_numpy()
+    high_limit = (stats["q3"] + 1.5 * iqr).reindex(df[group]).to_numpy()
+    inside = (values.to_numpy() >= low_limit) & (values.to_numpy() <= high_limit)
+    fenced = values.where(inside).groupby(df[group], sort=True, observed=True)
+    stats["lowerfence"] = fenced.min().fillna(stats["q1"])
+    stats["upperfence"] = fenced.max().fillna(stats["q3"])
+    stats.index.name = group
+    return stats.reset_index()
+
+
+def outlier_points(df: pd.DataFrame, stats: pd.DataFrame, group: str, value: str) -> pd.DataFrame:
+    bounds = stats.set_index(group)
+    values = pd.to_numeric(df[value], errors="coerce")
+    low = bounds["lowerfence"].reindex(df[group]).to_numpy()
+    high = bounds["upperfence"].reindex(df[group]).to_numpy()
+    return df[(values.to_numpy() < low) | (values.to_numpy() > high)]
+
+
+def cap_categories(totals: pd.Series, max_items: int) -> tuple[list[str], list[str]]:
+    """合計の大きい順に max_items-1 個を残し、残りを Other にまとめるための (残す, まとめる) 列名。"""
+    ordered = totals.sort_values(ascending=False, kind="stable")
+    if len(ordered) <= max_items:
+        return list(ordered.index), []
+    return list(ordered.index[: max_items - 1]), list(ordered.index[max_items - 1 :])
+
+
+__all__ = [
+    "OTHER_LABEL",
+    "RenderBudget",
+    "box_statistics",
+    "cap_categories",
+    "downsample_frame",
+    "lttb_indices",
+    "outlier_points",
+]
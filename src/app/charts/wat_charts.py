@@ -1,27 +1,48 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 
+from .figure_cache import cached_figure
+from .render_budget import RenderBudget, downsample_frame
 
-D2_CONSTANT = 1.128
 
-
-def build_bulk_trend_chart(df_trend: pd.DataFrame, parameter: str, usl: float | None, lsl: float | None) -> go.Figure:
+@cached_figure
+def build_bulk_trend_chart(
+    df_trend: pd.DataFrame,
+    parameter: str,
+    usl: float | None,
+    lsl: float | None,
+    *,
+    budget: RenderBudget | None = None,
+) -> go.Figure:
+    """BulkID はカテゴリ軸なので、2系列は同じ行集合から描き、軸の並びも元の順に固定する。"""
+    scatter = go.Scatter
+    shown = df_trend
+    if budget is not None:
+        scatter = budget.scatter(len(df_trend))
+        # 系列ごとに LTTB で選んだ行の和集合を元の順で使う（合計が予算に収まるよう半分ずつ）
+        per_series = max(budget.max_points // 2, 3)
+        keep = downsample_frame(df_trend, "mean_val", per_series).index.union(
+            downsample_frame(df_trend, "moving_avg", per_series).index
+        )
+        shown = df_trend[df_trend.index.isin(keep)]
     fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
-            x=df_trend["BulkID"],
-            y=df_trend["mean_val"],
+        scatter(
+            x=shown["BulkID"],
+            y=shown["mean_val"],
             name="Bulk Mean",
             mode="markers",
             marker=dict(size=6),
         )
     )
     fig.add_trace(
-        go.Scatter(
-            x=df_trend["BulkID"],
-            y=df_trend["moving_avg"],
+        scatter(
+            x=shown["BulkID"],
+            y=shown["moving_avg"],
             name="Moving Avg (n=3)",
             mode="lines",
             line=dict(color="red", width=2),
@@ -35,37 +56,51 @@ def build_bulk_trend_chart(df_trend: pd.DataFrame, parameter: str, usl: float |
         title=f"{parameter} Trend by Bulk",
         height=350,
         margin=dict(l=40, r=40, t=40, b=40),
+        xaxis=dict(type="category", categoryorder="array", categoryarray=shown["BulkID"].astype(str).tolist()),
     )
     return fig
 
 
+@cached_figure
 def build_wafer_map(
-    df: pd.DataFrame,
+    data: pd.DataFrame | np.ndarray,
     parameter: str,
     *,
+    x: np.ndarray | None = None,
+    y: np.ndarray | None = None,
     colorscale: str = "Viridis",
     zmin: float | None = None,
     zmax: float | None = None,
     title: str | None = None,
 ) -> go.Figure:
-    if (
-        df.empty
-        or parameter not in df.columns
-        or "DieX" not in df.columns
-        or "DieY" not in df.columns
-    ):
-        return go.Figure()
+    """data に WaferGrid の (DieY, DieX) 行列と x / y 軸を渡すと、そのまま z 行列として描く。
+
+    スタックマップは WaferGrid.stack などで縮約済みの行列を渡す。
+    縦持ちの DataFrame を渡した場合は DieY × DieX に並べ替えてから同じ経路で描く。
+    """
+    if isinstance(data, pd.DataFrame):
+        if data.empty or parameter not in data.columns or "DieX" not in data.columns or "DieY" not in data.columns:
+            return go.Figure()
+        values = pd.to_numeric(data[parameter], errors="coerce")
+        matrix = values.groupby([data["DieY"], data["DieX"]], sort=True).mean().unstack("DieX")
+        z, x, y = matrix.to_numpy(dtype=np.float64), matrix.columns.to_numpy(), matrix.index.to_numpy()
+    else:
+        z = np.asarray(data, dtype=np.float64)
+        if z.ndim != 2 or z.size == 0:
+            return go.Figure()
+        x = np.arange(z.shape[1]) if x is None else x
+        y = np.arange(z.shape[0]) if y is None else y
 
-    values = pd.to_numeric(df[parameter], errors="coerce")
     fig = go.Figure(
         go.Heatmap(
-            x=df["DieX"],
-            y=df["DieY"],
-            z=values,
+            x=x,
+            y=y,
+            z=z,
             colorscale=colorscale,
             zmin=zmin,
             zmax=zmax,
             colorbar=dict(title=parameter),
+            hoverongaps=False,
             hovertemplate="DieX: %{x}<br>DieY: %{y}<br>Value: %{z}<extra></extra>",
         )
     )
@@ -80,19 +115,98 @@ def build_wafer_map(
     return fig
 
 
-def build_individual_chart(df: pd.DataFrame, parameter: str, usl: float | None, lsl: float | None) -> go.Figure:
-    if df.empty or parameter not in df.columns:
+@cached_figure
+def build_wafer_gallery(
+    layers: np.ndarray,
+    parameter: str,
+    *,
+    x: np.ndarray | None = None,
+    y: np.ndarray | None = None,
+    labels: tuple[str, ...] = (),
+    columns: int = 4,
+    colorscale: str = "Viridis",
+    zmin: float | None = None,
+    zmax: float | None = None,
+    title: str | None = None,
+) -> go.Figure:
+    """(ウエハ, DieY, DieX) 配列の各ウエハを共通カラースケールの小さなマップとして並べる。"""
+    layers = np.asarray(layers, dtype=np.float64)
+    if layers.ndim != 3 or len(layers) == 0:
+        return go.Figure()
+    n = len(layers)
+    columns = max(min(columns, n), 1)
+    rows = (n + columns - 1) // columns
+    x = np.arange(layers.shape[2]) if x is None else x
+    y = np.arange(layers.shape[1]) if y is None else y
+    if zmin is None or zmax is None:
+        finite = layers[np.isfinite(layers)]
+        if finite.size:
+            zmin = float(finite.min()) if zmin is None else zmin
+            zmax = float(finite.max()) if zmax is None else zmax
+
+    fig = make_subplots(
+        rows=rows,
+        cols=columns,
+        subplot_titles=[labels[i] if i < len(labels) else str(i + 1) for i in range(n)],
+        horizontal_spacing=0.02,
+        vertical_spacing=min(0.08, 0.3 / rows),
+    )
+    for i in range(n):
+        fig.add_trace(
+            go.Heatmap(
+                x=x,
+                y=y,
+                z=layers[i],
+                coloraxis="coloraxis",
+                hoverongaps=False,
+                hovertemplate="DieX: %{x}<br>DieY: %{y}<br>Value: %{z}<extra></extra>",
+            ),
+            row=i // columns + 1,
+            col=i % columns + 1,
+        )
+    fig.update_xaxes(showticklabels=False)
+    fig.update_yaxes(showticklabels=False)
+    for i in range(n):
+        # 各サブプロットの縦横比をダイ座標に合わせる
+        suffix = "" if i == 0 else str(i + 1)
+        fig.layout[f"yaxis{suffix}"].update(scaleanchor=f"x{suffix}", constrain="domain")
+    fig.update_layout(
+        title=title or f"Wafer Gallery: {parameter}",
+        coloraxis=dict(colorscale=colorscale, cmin=zmin, cmax=zmax, colorbar=dict(title=parameter)),
+        height=max(220 * rows, 300),
+        margin=dict(l=20, r=20, t=60, b=20),
+    )
+    fig.update_annotations(font_size=10)
+    return fig
+
+
+@cached_figure
+def build_individual_chart(
+    df: pd.DataFrame,
+    parameter: str,
+    usl: float | None,
+    lsl: float | None,
+    *,
+    limits: tuple[float, float, float] | None,
+    budget: RenderBudget | None = None,
+) -> go.Figure:
+    """limits には SPCResult.control_limits などで求めた (CL, UCL, LCL) を渡す。
+
+    budget を渡すと描画点だけを LTTB で間引く（管理限界は全点から求めたものをそのまま引く）。
+    """
+    if df.empty or parameter not in df.columns or limits is None:
         return go.Figure()
 
     values = df[parameter]
-    cl = values.mean()
-    moving_ranges = values.diff().abs().dropna()
-    avg_mr = moving_ranges.mean() if not moving_ranges.empty else 0
-    ucl = cl + 3 * (avg_mr / D2_CONSTANT) if avg_mr else cl
-    lcl = cl - 3 * (avg_mr / D2_CONSTANT) if avg_mr else cl
+    cl, ucl, lcl = limits
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df.index, y=values, mode="lines+markers", name="Value"))
+    if budget is not None:
+        shown = downsample_frame(df, parameter, budget.max_points)
+        scatter = budget.scatter(len(shown))
+        fig.add_trace(scatter(x=shown.index, y=shown[parameter], mode="lines+markers", name="Value"))
+    else:
+        fig.add_trace(go.Scatter(x=df.index, y=values, mode="lines+markers", name="Value"))
     fig.add_hline(y=cl, line_dash="dash", annotation_text="CL")
     fig.add_hline(y=ucl, line_dash="dot", annotation_text="UCL")
     fig.add_hline(y=lcl, line_dash="dot", annotation_text="LCL")
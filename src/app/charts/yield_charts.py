@@ -4,6 +4,9 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from .figure_cache import cached_figure
+from .render_budget import OTHER_LABEL, RenderBudget, box_statistics, cap_categories, outlier_points
+
 
 def _format_fail_label(column_name: str) -> str:
     if column_name.startswith("FAIL_BIN_"):
@@ -11,15 +14,23 @@ def _format_fail_label(column_name: str) -> str:
     return column_name
 
 
-def build_yield_combo_chart(df_summary: pd.DataFrame) -> go.Figure:
+@cached_figure
+def build_yield_combo_chart(df_summary: pd.DataFrame, *, budget: RenderBudget | None = None) -> go.Figure:
     fig = go.Figure()
     fail_cols = [c for c in df_summary.columns if c.startswith("FAIL_BIN_")]
     x_axis = df_summary["Category"]
-    for col in fail_cols:
+    bars = df_summary[fail_cols]
+    if budget is not None:
+        # 不良BINが多い場合は寄与の小さい BIN を Other にまとめ、トレース数を抑える
+        keep, merged = cap_categories(bars.sum(), budget.max_traces - 1)
+        bars = bars[keep]
+        if merged:
+            bars = bars.assign(**{OTHER_LABEL: df_summary[merged].sum(axis=1)})
+    for col in bars.columns:
         fig.add_trace(
             go.Bar(
                 x=x_axis,
-                y=df_summary[col],
+                y=bars[col],
                 name=_format_fail_label(col),
             )
         )
@@ -41,7 +52,10 @@ def build_yield_combo_chart(df_summary: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def build_distribution_chart(df: pd.DataFrame) -> go.Figure:
+@cached_figure
+def build_distribution_chart(df: pd.DataFrame, *, budget: RenderBudget | None = None) -> go.Figure:
+    if budget is not None and (len(df) > budget.max_points or df["LotID"].nunique() > budget.max_traces):
+        return _build_distribution_summary_chart(df, budget)
     return px.box(
         df,
         x="LotID",
@@ -52,11 +66,55 @@ def build_distribution_chart(df: pd.DataFrame) -> go.Figure:
     )
 
 
-def build_failure_mode_chart(df: pd.DataFrame) -> go.Figure:
+def _build_distribution_summary_chart(df: pd.DataFrame, budget: RenderBudget) -> go.Figure:
+    """Lot ごとの箱ひげ統計量をサーバー側で求め、1トレースの箱ひげ図 + 外れ値だけを送る。"""
+    stats = box_statistics(df, "LotID", "0_PASS")
+    fig = go.Figure(
+        go.Box(
+            x=stats["LotID"],
+            q1=stats["q1"],
+            median=stats["median"],
+            q3=stats["q3"],
+            mean=stats["mean"],
+            lowerfence=stats["lowerfence"],
+            upperfence=stats["upperfence"],
+            name="0_PASS",
+            boxpoints=False,
+        )
+    )
+    outliers = outlier_points(df, stats, "LotID", "0_PASS")
+    if len(outliers) > budget.max_points:
+        outliers = outliers.sample(budget.max_points, random_state=0)
+    if not outliers.empty:
+        scatter = budget.scatter(len(outliers))
+        fig.add_trace(
+            scatter(
+                x=outliers["LotID"],
+                y=outliers["0_PASS"],
+                mode="markers",
+                name="Outliers",
+                marker=dict(size=4, color="rgba(200, 30, 30, 0.6)"),
+            )
+        )
+    fig.update_layout(
+        title=f"Yield Distribution by Lot ({len(stats)} lots, summary mode)",
+        xaxis_title="LotID",
+        yaxis_title="0_PASS",
+        showlegend=False,
+    )
+    return fig
+
+
+@cached_figure
+def build_failure_mode_chart(df: pd.DataFrame, *, budget: RenderBudget | None = None) -> go.Figure:
     fail_cols = [c for c in df.columns if c.startswith("FAIL_BIN_")]
     if not fail_cols:
         return go.Figure()
     fail_sum = df[fail_cols].sum().sort_values(ascending=False)
+    if budget is not None:
+        keep, merged = cap_categories(fail_sum, budget.max_traces)
+        if merged:
+            fail_sum = pd.concat([fail_sum[keep], pd.Series({OTHER_LABEL: fail_sum[merged].sum()})])
     return px.pie(
         values=fail_sum.values,
         names=[_format_fail_label(name) for name in fail_sum.index],
@@ -14,6 +14,17 @@ class DatabaseConfig:
     oracle_username: str | None
     oracle_password: str | None
     oracle_dsn: str | None
+    pool_min: int = 1
+    pool_max: int = 8
+    pool_increment: int = 1
+    yield_incremental: bool = False
+    incremental_overlap_minutes: int = 60
+    yield_pivot_mode: str = "client"
+    oracle_fetch_mode: str = "arrow"
+    oracle_arraysize: int = 10000
+    oracle_prefetchrows: int = 10000
+    wat_chunk_rows: int = 500_000
+    compact_dtypes: bool = True
 
 
 @dataclass(frozen=True)
@@ -21,6 +32,16 @@ class AppConfig:
     environment: str
     database: DatabaseConfig
     cache_ttl_seconds: int
+    cache_max_bytes: int = 1024 * 1024 * 1024
+    snapshot_dir: str | None = None
+    prefetch_interval_seconds: int = 0
+    prefetch_concurrency: int = 2
+    prefetch_jitter_seconds: float = 30.0
+    chart_max_points: int = 5000
+    chart_max_traces: int = 50
+    chart_webgl_threshold: int = 1000
+    chart_cache_entries: int = 512
+    dataset_store_max_bytes: int = 2048 * 1024 * 1024
 
 
 @lru_cache(maxsize=1)
@@ -34,6 +55,27 @@ def load_config() -> AppConfig:
             oracle_username=os.getenv("DB_USERNAME"),
             oracle_password=os.getenv("DB_PASSWORD"),
             oracle_dsn=os.getenv("DB_DSN"),
+            pool_min=int(os.getenv("DB_POOL_MIN", "1")),
+            pool_max=int(os.getenv("DB_POOL_MAX", "8")),
+            pool_increment=int(os.getenv("DB_POOL_INCREMENT", "1")),
+            yield_incremental=os.getenv("YIELD_INCREMENTAL", "0").lower() in {"1", "true", "yes"},
+            incremental_overlap_minutes=int(os.getenv("YIELD_INCREMENTAL_OVERLAP_MINUTES", "60")),
+            yield_pivot_mode=os.getenv("YIELD_PIVOT_MODE", "client").lower(),
+            oracle_fetch_mode=os.getenv("DB_FETCH_MODE", "arrow").lower(),
+            oracle_arraysize=int(os.getenv("DB_ARRAYSIZE", "10000")),
+            oracle_prefetchrows=int(os.getenv("DB_PREFETCHROWS", "10000")),
+            wat_chunk_rows=int(os.getenv("WAT_CHUNK_ROWS", "500000")),
+            compact_dtypes=os.getenv("COMPACT_DTYPES", "1").lower() in {"1", "true", "yes"},
         ),
         cache_ttl_seconds=int(os.getenv("CACHE_TTL_SECONDS", "600")),
+        cache_max_bytes=int(os.getenv("CACHE_MAX_MB", "1024")) * 1024 * 1024,
+        snapshot_dir=os.getenv("SNAPSHOT_DIR") or None,
+        prefetch_interval_seconds=int(os.getenv("PREFETCH_INTERVAL_SECONDS", "0")),
+        prefetch_concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "2")),
+        prefetch_jitter_seconds=float(os.getenv("PREFETCH_JITTER_SECONDS", "30")),
+        chart_max_points=int(os.getenv("CHART_MAX_POINTS", "5000")),
+        chart_max_traces=int(os.getenv("CHART_MAX_TRACES", "50")),
+        chart_webgl_threshold=int(os.getenv("CHART_WEBGL_THRESHOLD", "1000")),
+        chart_cache_entries=int(os.getenv("CHART_CACHE_ENTRIES", "512")),
+        dataset_store_max_bytes=int(os.getenv("DATASET_STORE_MAX_MB", "2048")) * 1024 * 1024,
     )
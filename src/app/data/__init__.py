@@ -1,5 +1,42 @@
 """データ取得ロジックの公開API。"""
 
-from .repositories import DatabaseRepository, create_repository
+from .cache import CachedRepository, CacheStats
+from .connections import PoolStats
+from .dataset_store import DatasetHandle, DatasetStore, get_dataset_store
+from .repositories import (
+    DatabaseRepository,
+    RepositoryFactory,
+    cache_statistics,
+    coalescing_statistics,
+    create_repository,
+    dataset_memory,
+    in_flight_queries,
+    pool_statistics,
+)
+from .schema import MemoryReport, compact_frame, memory_report
+from .singleflight import SingleFlight, SingleFlightStats
+from .snapshots import SnapshotStore, create_snapshot_store
 
-__all__ = ["DatabaseRepository", "create_repository"]
+__all__ = [
+    "DatabaseRepository",
+    "RepositoryFactory",
+    "CachedRepository",
+    "CacheStats",
+    "PoolStats",
+    "create_repository",
+    "pool_statistics",
+    "cache_statistics",
+    "coalescing_statistics",
+    "in_flight_queries",
+    "dataset_memory",
+    "MemoryReport",
+    "compact_frame",
+    "memory_report",
+    "DatasetHandle",
+    "DatasetStore",
+    "get_dataset_store",
+    "SingleFlight",
+    "SingleFlightStats",
+    "SnapshotStore",
+    "create_snapshot_store",
+]
@@ -0,0 +1,239 @@
+"""クエリ結果をTTLとメモリ上限で管理するキャッシュ付きリポジトリ。"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Hashable
+
+import pandas as pd
+
+from .progress import ProgressCallback
+from .schema import MemoryReport, memory_report
+from .singleflight import InFlightCall, SingleFlight, SingleFlightStats
+
+CacheKey = tuple[str, str, str]
+
+WAT_STAGE_KEY = "WAT"
+WAT_INDEX_STAGE_KEY = "WAT/INDEX"
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """キャッシュのヒット率・常駐量のスナップショット。"""
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+
+@dataclass
+class _CacheEntry:
+    frame: pd.DataFrame
+    nbytes: int
+    expires_at: float
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class QueryResultCache:
+    """DataFrame を LRU + TTL で保持する。メモリ上限は DataFrame のバイト数で測る。"""
+
+    def __init__(self, ttl_seconds: float, max_bytes: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, *, count: bool = True) -> pd.DataFrame | None:
+        """count=False はヒット・ミスの件数に数えない（同じ呼び出し内での確認し直し用）。"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += count
+                return None
+            if entry.expires_at <= now:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += count
+                return None
+            self._entries.move_to_end(key)
+            self._hits += count
+            return entry.frame
+
+    def put(self, key: Hashable, df: pd.DataFrame) -> None:
+        nbytes = frame_nbytes(df)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = _CacheEntry(df, nbytes, time.monotonic() + self.ttl_seconds)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None) -> int:
+        with self._lock:
+            keys = [k for k in self._entries if predicate is None or predicate(k)]
+            for key in keys:
+                self._drop(key)
+        return len(keys)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def frames(self) -> list[tuple[Hashable, pd.DataFrame]]:
+        """常駐中の (キー, DataFrame) を古い順に返す（メモリ内訳の表示用）。"""
+        with self._lock:
+            return [(key, entry.frame) for key, entry in self._entries.items()]
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+class CachedRepository:
+    """任意の DatabaseRepository をラップし、(backend, product, stage) 単位で結果を共有する。
+
+    キャッシュにない同じキーの取得が同時に来た場合は、1回のクエリの完了を待って結果を共有する。
+    返却するのは浅いコピーなので、呼び出し側は列の追加・置換は行えるが
+    既存列をインプレースで書き換えてはならない。
+    """
+
+    def __init__(self, repo, backend: str, *, ttl_seconds: float, max_bytes: int) -> None:
+        self.repo = repo
+        self.backend = backend
+        self.cache = QueryResultCache(ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+        self.flight = SingleFlight()
+
+    def __getattr__(self, name: str):
+        # ping / pool_stats / close などはラップ対象へ委譲する
+        return getattr(self.repo, name)
+
+    def _key(self, product_name: str, stage: str) -> CacheKey:
+        return (self.backend, product_name.upper(), stage.upper())
+
+    def _fetch(self, key: CacheKey, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        cached = self.cache.get(key)
+        if cached is None:
+            # 後から来た呼び出しは進捗通知を受けず、最初の呼び出しのクエリ完了を待つ
+            cached = self.flight.do(key, lambda: self._load(key, loader))
+        return cached.copy(deep=False)
+
+    def _load(self, key: CacheKey, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        # キャッシュを見てから実行を始めるまでに、直前の実行が結果を入れて終わっていることがある
+        cached = self.cache.get(key, count=False)
+        if cached is not None:
+            return cached
+        df = loader()
+        self.cache.put(key, df)
+        return df
+
+    def _fetch_since(self, key: CacheKey, since: datetime, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """スナップショット補完用の差分取得。キャッシュはしないが、同じ起点の同時取得はまとめる。"""
+        return self.flight.do((*key, since.isoformat()), loader).copy(deep=False)
+
+    def load_yield_overview(
+        self, product_name: str, stage: str = "CP", *, since: datetime | None = None
+    ) -> pd.DataFrame:
+        if since is not None:
+            # 期間指定の取得はキャッシュ対象外（スナップショット補完用）
+            return self._fetch_since(
+                self._key(product_name, stage),
+                since,
+                lambda: self.repo.load_yield_overview(product_name, stage, since=since),
+            )
+        return self._fetch(
+            self._key(product_name, stage),
+            lambda: self.repo.load_yield_overview(product_name, stage),
+        )
+
+    def load_wat_measurements(
+        self, product_name: str, *, since: datetime | None = None, progress: ProgressCallback | None = None
+    ) -> pd.DataFrame:
+        if since is not None:
+            return self._fetch_since(
+                self._key(product_name, WAT_STAGE_KEY),
+                since,
+                lambda: self.repo.load_wat_measurements(product_name, since=since, progress=progress),
+            )
+        return self._fetch(
+            self._key(product_name, WAT_STAGE_KEY),
+            lambda: self.repo.load_wat_measurements(product_name, progress=progress),
+        )
+
+    def list_wat_wafers(self, product_name: str) -> pd.DataFrame:
+        return self._fetch(
+            self._key(product_name, WAT_INDEX_STAGE_KEY),
+            lambda: self.repo.list_wat_wafers(product_name),
+        )
+
+    def load_wat_lot(self, product_name: str, bulk_id: str, wafer_id: object | None = None) -> pd.DataFrame:
+        scope = f"{WAT_STAGE_KEY}/{bulk_id}" if wafer_id is None else f"{WAT_STAGE_KEY}/{bulk_id}/{wafer_id}"
+        return self._fetch(
+            self._key(product_name, scope),
+            lambda: self.repo.load_wat_lot(product_name, bulk_id, wafer_id),
+        )
+
+    def refresh_yield_overview(self, product_name: str, stage: str = "CP") -> pd.DataFrame:
+        """キャッシュを参照せずに取得し直し、結果で置き換える（バックグラウンド更新用）。"""
+        df = self.repo.load_yield_overview(product_name, stage)
+        self.cache.put(self._key(product_name, stage), df)
+        return df.copy(deep=False)
+
+    def refresh_wat_measurements(self, product_name: str) -> pd.DataFrame:
+        df = self.repo.load_wat_measurements(product_name)
+        needle = product_name.upper()
+        # ロット単位・一覧のキャッシュも古くなるので捨てる
+        self.cache.invalidate(lambda key: key[1] == needle and key[2].startswith(f"{WAT_STAGE_KEY}/"))
+        self.cache.put(self._key(product_name, WAT_STAGE_KEY), df)
+        return df.copy(deep=False)
+
+    def invalidate(self, product_name: str | None = None) -> int:
+        if product_name is None:
+            return self.cache.invalidate()
+        needle = product_name.upper()
+        return self.cache.invalidate(lambda key: key[1] == needle)
+
+    def cache_stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    def flight_stats(self) -> SingleFlightStats:
+        return self.flight.stats()
+
+    def in_flight(self) -> list[InFlightCall]:
+        return self.flight.in_flight()
+
+    def memory_reports(self) -> list[tuple[CacheKey, MemoryReport]]:
+        """キャッシュ中のデータセットごとの列別メモリ使用量。"""
+        return [(key, memory_report(frame)) for key, frame in self.cache.frames()]
+
+
+__all__ = ["CacheStats", "CachedRepository", "QueryResultCache", "WAT_STAGE_KEY", "frame_nbytes"]
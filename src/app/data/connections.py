@@ -0,0 +1,162 @@
+"""プロセス全体で共有するDBコネクションプール。"""
+
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+from ..config import DatabaseConfig
+
+try:
+    import oracledb
+except ImportError:  # pragma: no cover
+    oracledb = None
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """プールの利用状況スナップショット。"""
+
+    backend: str
+    target: str
+    opened: int
+    busy: int
+    min_size: int
+    max_size: int
+    acquired_total: int
+
+
+class OracleConnectionPool:
+    """python-oracledb のセッションプールを薄くラップする。"""
+
+    backend = "oracle"
+
+    def __init__(self, db: DatabaseConfig) -> None:
+        if oracledb is None:
+            raise RuntimeError("oracle backend requested but python-oracledb is未インストール")
+        self._db = db
+        self._pool = oracledb.create_pool(
+            user=db.oracle_username,
+            password=db.oracle_password,
+            dsn=db.oracle_dsn,
+            min=db.pool_min,
+            max=db.pool_max,
+            increment=db.pool_increment,
+            getmode=oracledb.POOL_GETMODE_WAIT,
+        )
+        self._lock = threading.Lock()
+        self._acquired_total = 0
+
+    @contextmanager
+    def connection(self) -> Iterator["oracledb.Connection"]:
+        with self._lock:
+            self._acquired_total += 1
+        with self._pool.acquire() as conn:
+            yield conn
+
+    def ping(self) -> bool:
+        try:
+            with self.connection() as conn:
+                conn.ping()
+        except oracledb.Error:
+            return False
+        return True
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            backend=self.backend,
+            target=self._db.oracle_dsn or "",
+            opened=self._pool.opened,
+            busy=self._pool.busy,
+            min_size=self._pool.min,
+            max_size=self._pool.max,
+            acquired_total=self._acquired_total,
+        )
+
+    def close(self) -> None:
+        self._pool.close(force=True)
+
+
+class SQLiteConnectionPool:
+    """SQLite接続を貸し出し式で共有する。
+
+    `check_same_thread=False` で開いた接続を同時に1スレッドだけへ貸し出すため、
+    Streamlit のスクリプトスレッドが入れ替わっても安全に再利用できる。
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, db: DatabaseConfig) -> None:
+        self._path = db.sqlite_path or "data/test.db"
+        self._min = max(db.pool_min, 0)
+        self._max = max(db.pool_max, 1)
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self._max)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._busy = 0
+        self._acquired_total = 0
+        for _ in range(min(self._min, self._max)):
+            self._idle.put(self._open())
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, check_same_thread=False)
+        with self._lock:
+            self._opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            with self._lock:
+                self._busy += 1
+                self._acquired_total += 1
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def ping(self) -> bool:
+        try:
+            with self.connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def stats(self) -> PoolStats:
+        return PoolStats(
+            backend=self.backend,
+            target=self._path,
+            opened=self._opened,
+            busy=self._busy,
+            min_size=self._min,
+            max_size=self._max,
+            acquired_total=self._acquired_total,
+        )
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+
+__all__ = ["PoolStats", "OracleConnectionPool", "SQLiteConnectionPool"]
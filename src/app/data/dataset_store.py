@@ -0,0 +1,390 @@
+"""セッション間で DataFrame を共有するプロセス単位のデータセットストア。
+
+各ページは `st.session_state` に DataFrame そのものではなく `DatasetHandle` だけを置く。
+同じ (backend, product, stage, データ版) を開いたセッションは同じ DataFrame を参照するため、
+サーバーのメモリは利用者数ではなく異なるデータセットの数に比例する。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+from ..config import AppConfig
+from .cache import frame_nbytes
+
+DatasetKey = tuple[str, str, str, str]  # (backend, product, stage, version)
+
+
+def data_version(df: pd.DataFrame) -> str:
+    """列名・dtype と全行の内容から作る短い版番号（1セルでも値が変われば別の版になる）。"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{len(df)}|{'|'.join(f'{c}:{t}' for c, t in df.dtypes.items())}".encode())
+    if len(df):
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def value_nbytes(value: Any) -> int:
+    """導出値のおおよそのバイト数。`nbytes` を持つもの・DataFrame・配列・それらのコンテナを数える。"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return frame_nbytes(value) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    if isinstance(value, dict):
+        return sum(value_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(v) for v in value)
+    return 0
+
+
+@dataclass(frozen=True)
+class StoreEntryInfo:
+    """管理画面に表示する常駐データセット1件分の情報。"""
+
+    backend: str
+    product: str
+    stage: str
+    version: str
+    rows: int
+    bytes: int
+    derived_bytes: int
+    refs: int
+    derived: int
+    loaded_at: datetime
+    idle_seconds: float
+
+
+@dataclass(frozen=True)
+class DatasetStoreStats:
+    entries: int
+    bytes: int
+    max_bytes: int
+    handles: int
+    hits: int
+    loads: int
+    evictions: int
+    reloads: int
+
+
+@dataclass
+class _StoreEntry:
+    frame: pd.DataFrame
+    nbytes: int
+    loaded_at: datetime
+    last_access: float
+    derived: dict[Hashable, tuple[Any, Any]] = field(default_factory=dict)
+    # update 付きで作った導出値の名前（次の版へ引き継ぐ対象）
+    incremental: set[Hashable] = field(default_factory=set)
+    # 直前の版から引き継いだ導出値（差分更新の起点。使ったものから取り除く）
+    previous: dict[Hashable, tuple[Any, Any]] = field(default_factory=dict)
+    # 導出値ごとのバイト数（参照のたびに測り直す）
+    derived_bytes: dict[Hashable, int] = field(default_factory=dict)
+
+    @property
+    def total_bytes(self) -> int:
+        return self.nbytes + sum(self.derived_bytes.values())
+
+
+class DatasetHandle:
+    """セッションが保持するデータセットへの参照。
+
+    ハンドルが破棄される（セッション終了・状態の置き換え）と参照数が自動で減る。
+    メモリ上限で追い出された後に参照された場合は、開いたときの loader で読み直す。
+    """
+
+    def __init__(self, store: "DatasetStore", key: DatasetKey, loader: Callable[[], pd.DataFrame]) -> None:
+        self.store = store
+        self.key = key
+        self._loader = loader
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    @property
+    def backend(self) -> str:
+        return self.key[0]
+
+    @property
+    def stage(self) -> str:
+        return self.key[2]
+
+    @property
+    def version(self) -> str:
+        return self.key[3]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """共有 DataFrame の浅いコピー（既存列をインプレースで書き換えてはならない）。"""
+        return self.store._frame(self.key, self._loader).copy(deep=False)
+
+    def derived(
+        self,
+        name: Hashable,
+        build: Callable[[pd.DataFrame], Any],
+        *,
+        depends: object = None,
+        update: Callable[[Any, pd.DataFrame], Any] | None = None,
+    ) -> Any:
+        """SPC 結果などデータセットから導出した値を、同じ版を開いた全セッションで共有する。
+
+        depends に渡したオブジェクト（Spec など）が替わると作り直す。
+        update を渡すと、同じ (backend, product, stage) の直前の版の値から update(前の値, DataFrame)
+        で差分更新する（直前の版の値がなければ build で作る）。
+        """
+        return self.store._derived(self.key, self._loader, name, build, depends, update)
+
+    def release(self) -> None:
+        self._finalizer()
+
+    def __repr__(self) -> str:
+        backend, product, stage, version = self.key
+        return f"DatasetHandle({backend}/{product}/{stage}@{version})"
+
+
+class DatasetStore:
+    """(backend, product, stage, データ版) をキーに DataFrame を参照カウント付きで保持する。
+
+    合計バイト数（DataFrame と導出値）が max_bytes を超えたら、参照されていないものから古い順（LRU）に追い出す。
+    それでも超える場合は参照中のものも追い出し、次の参照時に読み直させる。
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[DatasetKey, _StoreEntry] = OrderedDict()
+        self._refs: dict[DatasetKey, int] = {}
+        # (backend, product, stage) ごとに最後に開かれた版
+        self._latest: dict[tuple[str, str, str], DatasetKey] = {}
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+        self._reloads = 0
+
+    def open(
+        self,
+        backend: str,
+        product: str,
+        stage: str,
+        loader: Callable[[], pd.DataFrame],
+        *,
+        initial: Callable[[], pd.DataFrame] | None = None,
+    ) -> DatasetHandle:
+        """loader の結果と同じ版が常駐していればそれを共有し、なければ登録してハンドルを返す。
+
+        loader はキャッシュ付きリポジトリ経由の読み込みを想定しており、版の判定のために毎回呼ぶ。
+        initial を渡すと今回の読み込みだけそちら（進捗表示付きなど）を使い、
+        追い出し後の読み直しには loader を使う。
+        """
+        df = (initial or loader)()
+        key = (backend, product.upper(), stage.upper(), data_version(df))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._hits += 1
+                self._touch(key, entry)
+            else:
+                self._loads += 1
+                entry = self._insert(key, df)
+                self._carry_over(self._latest.get(key[:3]), entry)
+            self._latest[key[:3]] = key
+            self._drop_superseded(key)
+            self._refs[key] = self._refs.get(key, 0) + 1
+        return DatasetHandle(self, key, loader)
+
+    def _insert(self, key: DatasetKey, df: pd.DataFrame) -> _StoreEntry:
+        entry = _StoreEntry(
+            frame=df,
+            nbytes=frame_nbytes(df),
+            loaded_at=datetime.now(),
+            last_access=time.monotonic(),
+        )
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        self._evict(protect=key)
+        return entry
+
+    def _carry_over(self, old_key: DatasetKey | None, entry: _StoreEntry) -> None:
+        old = self._entries.get(old_key) if old_key is not None else None
+        if old is None:
+            return
+        entry.previous = {name: old.derived[name] for name in old.incremental if name in old.derived}
+        # 直前の版がまだ引き継いだ値を使っていなければ、それも起点として残す
+        for name, value in old.previous.items():
+            entry.previous.setdefault(name, value)
+
+    def _touch(self, key: DatasetKey, entry: _StoreEntry) -> None:
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(key)
+
+    def _frame(self, key: DatasetKey, loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        return self._entry(key, loader).frame
+
+    def _entry(self, key: DatasetKey, loader: Callable[[], pd.DataFrame]) -> _StoreEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._touch(key, entry)
+                return entry
+        # 追い出された版を読み直す（データが更新されていても、開いた時点の版として扱う）
+        df = loader()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._reloads += 1
+                entry = self._insert(key, df)
+            return entry
+
+    def _derived(
+        self,
+        key: DatasetKey,
+        loader: Callable[[], pd.DataFrame],
+        name: Hashable,
+        build: Callable[[pd.DataFrame], Any],
+        depends: object,
+        update: Callable[[Any, pd.DataFrame], Any] | None = None,
+    ) -> Any:
+        entry = self._entry(key, loader)
+        cached = entry.derived.get(name)
+        if cached is not None and cached[0] is depends:
+            # WaferGrid のレイヤーなど、導出値は参照後に育つことがあるので測り直す
+            self._account(key, entry, name, cached[1])
+            return cached[1]
+        with self._lock:
+            previous = entry.previous.pop(name, None) if update is not None else None
+        frame = entry.frame.copy(deep=False)
+        if previous is not None and previous[0] is depends:
+            value = update(previous[1], frame)
+        else:
+            value = build(frame)
+        with self._lock:
+            entry.derived[name] = (depends, value)
+            if update is not None:
+                entry.incremental.add(name)
+        self._account(key, entry, name, value)
+        return value
+
+    def _account(self, key: DatasetKey, entry: _StoreEntry, name: Hashable, value: Any) -> None:
+        nbytes = value_nbytes(value)
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            self._bytes += nbytes - entry.derived_bytes.get(name, 0)
+            entry.derived_bytes[name] = nbytes
+            self._evict(protect=key)
+
+    def _release(self, key: DatasetKey) -> None:
+        with self._lock:
+            refs = self._refs.get(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+                return
+            self._refs.pop(key, None)
+            # 新しい版に置き換わった古い版は、最後の参照が外れた時点で手放す
+            if self._latest.get(key[:3]) != key and key in self._entries:
+                self._drop(key)
+
+    def _drop_superseded(self, key: DatasetKey) -> None:
+        for old in [k for k in self._entries if k[:3] == key[:3] and k != key and not self._refs.get(k)]:
+            self._drop(old)
+
+    def _evict(self, protect: DatasetKey | None = None) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        for only_idle in (True, False):
+            for key in list(self._entries):
+                if self._bytes <= self.max_bytes:
+                    return
+                if key == protect or (only_idle and self._refs.get(key)):
+                    continue
+                self._drop(key)
+                self._evictions += 1
+
+    def _drop(self, key: DatasetKey) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.total_bytes
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def evict_idle(self) -> int:
+        """参照されていないデータセットをすべて手放す（管理画面用）。"""
+        with self._lock:
+            idle = [k for k in self._entries if not self._refs.get(k)]
+            for key in idle:
+                self._drop(key)
+            self._evictions += len(idle)
+        return len(idle)
+
+    def entries(self) -> list[StoreEntryInfo]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                StoreEntryInfo(
+                    backend=key[0],
+                    product=key[1],
+                    stage=key[2],
+                    version=key[3],
+                    rows=len(entry.frame),
+                    bytes=entry.total_bytes,
+                    derived_bytes=entry.total_bytes - entry.nbytes,
+                    refs=self._refs.get(key, 0),
+                    derived=len(entry.derived),
+                    loaded_at=entry.loaded_at,
+                    idle_seconds=round(now - entry.last_access, 1),
+                )
+                for key, entry in reversed(self._entries.items())
+            ]
+
+    def stats(self) -> DatasetStoreStats:
+        with self._lock:
+            return DatasetStoreStats(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                handles=sum(self._refs.values()),
+                hits=self._hits,
+                loads=self._loads,
+                evictions=self._evictions,
+                reloads=self._reloads,
+            )
+
+
+_STORE: DatasetStore | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_dataset_store(config: AppConfig) -> DatasetStore:
+    """プロセスで1つのストアを返す（DATASET_STORE_MAX_MB の変更は上限にだけ反映する）。"""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = DatasetStore(config.dataset_store_max_bytes)
+        elif _STORE.max_bytes != config.dataset_store_max_bytes:
+            _STORE.resize(config.dataset_store_max_bytes)
+        return _STORE
+
+
+__all__ = [
+    "DatasetHandle",
+    "DatasetKey",
+    "DatasetStore",
+    "DatasetStoreStats",
+    "StoreEntryInfo",
+    "data_version",
+    "get_dataset_store",
+    "value_nbytes",
+]
@@ -2,17 +2,22 @@
 
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass
-from typing import ClassVar
+from datetime import datetime, timedelta
+from typing import ClassVar, Iterator
 
 import pandas as pd
 
 from ..config import AppConfig
+from .connections import OracleConnectionPool, PoolStats
+from .progress import ProgressCallback
+from .schema import compact_frame
 
 try:
-    import oracledb
+    import pyarrow as pa
 except ImportError:  # pragma: no cover
-    oracledb = None
+    pa = None
 
 
 @dataclass(frozen=True)
@@ -21,6 +26,11 @@ class YieldQueryConfig:
 
     sql: str
     process_override: str | None = None
+    # サーバー側集計モード用: BIN辞書クエリと {bin_columns} を埋め込む集計クエリ
+    bin_dictionary_sql: str | None = None
+    aggregate_sql: str | None = None
+    bin_table_alias: str = "b"
+    has_bin_count: bool = True
 
 
 CP_STANDARD_QUERY = """
@@ -44,6 +54,7 @@ WHERE UPPER(h.PRODUCT_ID) = :product_name
   AND h.PROCESS = :process
   AND NVL(r.REWORK_NEW, 0) = 0
   AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
 ORDER BY h.REGIST_DATE ASC, h.LOT_ID, h.WAFER_ID, r.BIN_CODE
 """
 
@@ -70,6 +81,7 @@ WHERE UPPER(h.PRODUCT_ID) = :product_name
   AND h.PROCESS = :process
   AND b.REWORK_NEW = 0
   AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
 ORDER BY h.REGIST_DATE ASC, h.LOT_ID, h.WAFER_ID, b.BIN_CODE
 """
 
@@ -96,18 +108,168 @@ WHERE UPPER(h.PRODUCT_ID) = :product_name
   AND h.PROCESS = :process
   AND NVL(b.REWORK_NEW, 0) = 0
   AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
 ORDER BY h.REGIST_DATE ASC, h.ASSY_LOT_ID, b.BIN_CODE
 """
 
-CP_QUERY_DEFAULT = YieldQueryConfig(sql=CP_STANDARD_QUERY)
+CP_STANDARD_BIN_DICTIONARY_QUERY = """
+SELECT DISTINCT
+    r.BIN_CODE AS "Bin",
+    r.BIN_NAME AS "BinName"
+FROM SONAR.SEMI_CP_HEADER h
+JOIN SONAR.SEMI_CP_RESULT r
+  ON h.SUBSTRATE_ID = r.SUBSTRATE_ID
+ AND h.WAFER_ID = r.WAFER_ID
+ AND h.PRODUCT_ID = r.PRODUCT_ID
+ AND h.REWORK_NEW = r.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND NVL(r.REWORK_NEW, 0) = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+"""
+
+CP_STANDARD_AGGREGATE_QUERY = """
+SELECT
+    h.PRODUCT_ID AS "Product",
+    h.SUBSTRATE_ID AS "BulkID",
+    h.LOT_ID AS "LotID",
+    h.WAFER_ID AS "WaferID",
+    h.REGIST_DATE AS "Time",
+    h.EFFECTIVE_NUM AS "EffectiveNum",
+    {bin_columns}
+FROM SONAR.SEMI_CP_HEADER h
+JOIN SONAR.SEMI_CP_RESULT r
+  ON h.SUBSTRATE_ID = r.SUBSTRATE_ID
+ AND h.WAFER_ID = r.WAFER_ID
+ AND h.PRODUCT_ID = r.PRODUCT_ID
+ AND h.REWORK_NEW = r.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND NVL(r.REWORK_NEW, 0) = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+GROUP BY h.PRODUCT_ID, h.SUBSTRATE_ID, h.LOT_ID, h.WAFER_ID, h.REGIST_DATE, h.EFFECTIVE_NUM
+"""
+
+CP_CPY_BIN_DICTIONARY_QUERY = """
+SELECT DISTINCT
+    b.BIN_CODE AS "Bin",
+    b.BIN_NAME AS "BinName"
+FROM SONAR.SEMI_CP_HEADER h
+JOIN SONAR.SEMI_CP_BIN_SUM b
+  ON h.SUBSTRATE_ID = b.SUBSTRATE_ID
+ AND h.WAFER_ID = b.WAFER_ID
+ AND h.PRODUCT_ID = b.PRODUCT_ID
+ AND h.PROCESS = b.PROCESS
+ AND h.REWORK_NEW = b.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND b.REWORK_NEW = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+"""
+
+CP_CPY_AGGREGATE_QUERY = """
+SELECT
+    h.PRODUCT_ID AS "Product",
+    h.SUBSTRATE_ID AS "BulkID",
+    h.LOT_ID AS "LotID",
+    h.WAFER_ID AS "WaferID",
+    h.REGIST_DATE AS "Time",
+    h.EFFECTIVE_NUM AS "EffectiveNum",
+    {bin_columns}
+FROM SONAR.SEMI_CP_HEADER h
+JOIN SONAR.SEMI_CP_BIN_SUM b
+  ON h.SUBSTRATE_ID = b.SUBSTRATE_ID
+ AND h.WAFER_ID = b.WAFER_ID
+ AND h.PRODUCT_ID = b.PRODUCT_ID
+ AND h.PROCESS = b.PROCESS
+ AND h.REWORK_NEW = b.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND b.REWORK_NEW = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+GROUP BY h.PRODUCT_ID, h.SUBSTRATE_ID, h.LOT_ID, h.WAFER_ID, h.REGIST_DATE, h.EFFECTIVE_NUM
+"""
+
+FT_BIN_SUM_BIN_DICTIONARY_QUERY = """
+SELECT DISTINCT
+    b.BIN_CODE AS "Bin",
+    b.BIN_NAME AS "BinName"
+FROM SONAR.SEMI_FT_HEADER h
+JOIN SONAR.SEMI_FT_BIN_SUM b
+  ON h.ASSY_LOT_ID = b.ASSY_LOT_ID
+ AND NVL(h.WAFER_ID, -1) = NVL(b.WAFER_ID, -1)
+ AND h.PRODUCT_ID = b.PRODUCT_ID
+ AND h.PROCESS = b.PROCESS
+ AND h.REWORK_NEW = b.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND NVL(b.REWORK_NEW, 0) = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+"""
+
+FT_BIN_SUM_AGGREGATE_QUERY = """
+SELECT
+    h.PRODUCT_ID AS "Product",
+    h.ASSY_LOT_ID AS "BulkID",
+    h.ASSY_LOT_ID AS "LotID",
+    h.WAFER_ID AS "WaferID",
+    h.REGIST_DATE AS "Time",
+    h.EFFECTIVE_NUM AS "EffectiveNum",
+    {bin_columns}
+FROM SONAR.SEMI_FT_HEADER h
+JOIN SONAR.SEMI_FT_BIN_SUM b
+  ON h.ASSY_LOT_ID = b.ASSY_LOT_ID
+ AND NVL(h.WAFER_ID, -1) = NVL(b.WAFER_ID, -1)
+ AND h.PRODUCT_ID = b.PRODUCT_ID
+ AND h.PROCESS = b.PROCESS
+ AND h.REWORK_NEW = b.REWORK_NEW
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.PROCESS = :process
+  AND NVL(b.REWORK_NEW, 0) = 0
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+GROUP BY h.PRODUCT_ID, h.ASSY_LOT_ID, h.WAFER_ID, h.REGIST_DATE, h.EFFECTIVE_NUM
+"""
+
+CP_QUERY_DEFAULT = YieldQueryConfig(
+    sql=CP_STANDARD_QUERY,
+    bin_dictionary_sql=CP_STANDARD_BIN_DICTIONARY_QUERY,
+    aggregate_sql=CP_STANDARD_AGGREGATE_QUERY,
+    bin_table_alias="r",
+    has_bin_count=False,
+)
 CP_QUERY_MAP: dict[str, YieldQueryConfig] = {
     # CPY (Fail-Stop) のようにBinCount付きデータを使用したい品種はここで指定
-    "scp117a": YieldQueryConfig(sql=CP_CPY_QUERY, process_override="CPY"),
+    "scp117a": YieldQueryConfig(
+        sql=CP_CPY_QUERY,
+        process_override="CPY",
+        bin_dictionary_sql=CP_CPY_BIN_DICTIONARY_QUERY,
+        aggregate_sql=CP_CPY_AGGREGATE_QUERY,
+    ),
 }
 
-FT_QUERY_DEFAULT = YieldQueryConfig(sql=FT_BIN_SUM_QUERY)
+FT_QUERY_DEFAULT = YieldQueryConfig(
+    sql=FT_BIN_SUM_QUERY,
+    bin_dictionary_sql=FT_BIN_SUM_BIN_DICTIONARY_QUERY,
+    aggregate_sql=FT_BIN_SUM_AGGREGATE_QUERY,
+)
 FT_QUERY_MAP: dict[str, YieldQueryConfig] = {}
 
+# 差分取得を行わない場合に :since へ渡す下限（6か月フィルタのみが効く）
+FULL_LOAD_SINCE = datetime(1900, 1, 1)
+YIELD_RETENTION = pd.DateOffset(months=6)
+YIELD_KEY_COLUMNS: tuple[str, ...] = ("Product", "BulkID", "LotID", "WaferID")
+YIELD_INDEX_COLUMNS: tuple[str, ...] = (*YIELD_KEY_COLUMNS, "Time", "EffectiveNum")
+PIVOT_MODES: tuple[str, ...] = ("client", "server")
+FETCH_MODES: tuple[str, ...] = ("arrow", "cursor")
+# 取得直後に数値型へ揃える列（Oracle NUMBER は Decimal/object で届くことがある）
+NUMERIC_COLUMNS: tuple[str, ...] = ("EffectiveNum", "Bin", "BinCount", "Value", "DieX", "DieY", "Site")
+
 WAT_QUERY = """
 SELECT
     h.PRODUCT_ID AS "Product",
@@ -120,10 +282,115 @@ SELECT
     d.ITEM_NAME AS "Parameter",
     d.MEAS_DATA AS "Value"
 FROM SONAR.WAT_HEADER h
-LEFT JOIN SONAR.WAT_DETAIL d ON d.LOT_ID = h.LOT_ID
+LEFT JOIN SONAR.WAT_DETAIL d
+  ON d.LOT_ID = h.LOT_ID
+ AND d.SUBSTRATE_ID = h.SUBSTRATE_ID
+WHERE UPPER(h.PRODUCT_ID) = :product_name
+  AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+  AND h.REGIST_DATE >= :since
+"""
+
+# 1ロット(BulkID)だけを取得する。:wafer_id 付きはさらに1ウエハに絞る
+WAT_LOT_QUERY = WAT_QUERY + "  AND h.SUBSTRATE_ID = :bulk_id\n"
+WAT_WAFER_QUERY = WAT_LOT_QUERY + "  AND d.WAFER_ID = :wafer_id\n"
+
+# ウエハ選択用の一覧（測定値は転送しない）
+WAT_WAFER_INDEX_QUERY = """
+SELECT DISTINCT
+    h.PRODUCT_ID AS "Product",
+    h.SUBSTRATE_ID AS "BulkID",
+    d.WAFER_ID AS "WaferID",
+    h.REGIST_DATE AS "Time"
+FROM SONAR.WAT_HEADER h
+JOIN SONAR.WAT_DETAIL d
+  ON d.LOT_ID = h.LOT_ID
+ AND d.SUBSTRATE_ID = h.SUBSTRATE_ID
 WHERE UPPER(h.PRODUCT_ID) = :product_name
   AND h.REGIST_DATE >= ADD_MONTHS(SYSDATE, -6)
+ORDER BY h.REGIST_DATE, h.SUBSTRATE_ID, d.WAFER_ID
 """
+WAT_INDEX_COLUMNS: tuple[str, ...] = ("Product", "BulkID", "WaferID", "Time")
+
+# チャンク境界をウエハ単位で揃えるため、ストリーミング時は BulkID/WaferID 順に取得する
+WAT_STREAM_QUERY = WAT_QUERY + "ORDER BY h.SUBSTRATE_ID, d.WAFER_ID\n"
+WAT_PIVOT_INDEX: tuple[str, ...] = ("Product", "BulkID", "WaferID", "DieX", "DieY", "Site", "Time")
+WAT_WAFER_KEY: tuple[str, ...] = ("BulkID", "WaferID")
+
+
+def _bind_value(value: object) -> object:
+    """DataFrame 由来の numpy スカラーを oracledb がバインドできる Python 値に戻す。"""
+    return value.item() if hasattr(value, "item") else value
+
+
+@dataclass
+class _IncrementalYieldState:
+    """差分取得用に保持するワイド形式DataFrameと REGIST_DATE の最高水位。"""
+
+    frame: pd.DataFrame
+    high_water: datetime | None
+
+
+def _merge_yield_delta(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """差分のワイドDataFrameを既存分へマージし、同一ウエハは新しい行で置き換える。"""
+    if base.empty:
+        return delta
+    if delta.empty:
+        return base
+    rate_cols = [c for c in delta.columns if c == "0_PASS" or c.startswith("FAIL_BIN_")]
+    base_rate_cols = [c for c in base.columns if c == "0_PASS" or c.startswith("FAIL_BIN_")]
+    # 片側にしか存在しないBIN列は「該当チップ0件」として 0% で補完する
+    base = base.assign(**{c: 0.0 for c in rate_cols if c not in base.columns})
+    delta = delta.assign(**{c: 0.0 for c in base_rate_cols if c not in delta.columns})
+    merged = pd.concat([base, delta[base.columns]], ignore_index=True)
+    key_cols = [c for c in YIELD_KEY_COLUMNS if c in merged.columns]
+    merged = merged.drop_duplicates(subset=key_cols, keep="last")
+    sort_cols = list(key_cols)
+    if "Time" in merged.columns:
+        cutoff = pd.Timestamp.now() - YIELD_RETENTION
+        merged = merged[merged["Time"] >= cutoff]
+        sort_cols.append("Time")
+    # ピボット結果と同じ並び（インデックス列順）に揃える
+    return merged.sort_values(sort_cols, kind="stable").reset_index(drop=True)
+
+
+def _build_bin_labels(codes: pd.Series, names: pd.Series | None) -> pd.Series:
+    """BIN_CODE/BIN_NAME から `02_NAME` 形式の列ラベルを作る。"""
+    labels = pd.to_numeric(codes, errors="coerce").astype("Int64").astype(str).str.zfill(2)
+    if names is not None:
+        labels = (labels + "_" + names.fillna("").astype(str).str.strip()).str.rstrip("_")
+    return labels
+
+
+def _bin_sum_expression(alias: str, index: int, *, has_bin_count: bool) -> str:
+    value = f"{alias}.BIN_COUNT" if has_bin_count else "1"
+    return (
+        f"SUM(CASE WHEN {alias}.BIN_CODE = :bin_code_{index}"
+        f" AND DECODE({alias}.BIN_NAME, :bin_name_{index}, 1, 0) = 1"
+        f" THEN {value} ELSE 0 END) / NULLIF(h.EFFECTIVE_NUM, 0) * 100"
+        f' AS "BIN_{index}"'
+    )
+
+
+def _to_arrow_table(odf) -> "pa.Table":
+    """python-oracledb の DataFrame を pyarrow.Table へゼロコピーで変換する。"""
+    if hasattr(odf, "__arrow_c_stream__"):
+        return pa.table(odf)
+    return pa.Table.from_arrays(odf.column_arrays(), names=odf.column_names())
+
+
+def _cast_numeric_arrow(table: "pa.Table") -> "pa.Table":
+    for idx, name in enumerate(table.column_names):
+        is_numeric_target = name in NUMERIC_COLUMNS or name.startswith("BIN_")
+        if is_numeric_target and table.schema.field(idx).type != pa.float64():
+            table = table.set_column(idx, name, table.column(idx).cast(pa.float64()))
+    return table
+
+
+def _cast_numeric_pandas(df: pd.DataFrame) -> pd.DataFrame:
+    for name in df.columns:
+        if name in NUMERIC_COLUMNS or str(name).startswith("BIN_"):
+            df[name] = pd.to_numeric(df[name], errors="coerce").astype("float64")
+    return df
 
 
 class OracleRepository:
@@ -135,38 +402,177 @@ class OracleRepository:
     FT_DEFAULT: ClassVar[YieldQueryConfig] = FT_QUERY_DEFAULT
     FT_QUERY_MAP: ClassVar[dict[str, YieldQueryConfig]] = FT_QUERY_MAP
 
-    def __init__(self, config: AppConfig) -> None:
-        if oracledb is None:
-            raise RuntimeError("oracle backend requested but python-oracledb is未インストール")
+    def __init__(self, config: AppConfig, pool: OracleConnectionPool | None = None) -> None:
         self.config = config
-        self._conn = oracledb.connect(
-            user=self.config.database.oracle_username,
-            password=self.config.database.oracle_password,
-            dsn=self.config.database.oracle_dsn,
-        )
+        self._pool = pool or OracleConnectionPool(config.database)
+        self._incremental: dict[tuple[str, str], _IncrementalYieldState] = {}
+        self._incremental_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._incremental_guard = threading.Lock()
+        # 製品ごとの前回の全件取得の行数（WAT の進捗表示の見込み総数）
+        self._wat_rows: dict[str, int] = {}
+
+    def ping(self) -> bool:
+        return self._pool.ping()
+
+    def pool_stats(self) -> PoolStats:
+        return self._pool.stats()
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _read_sql(self, query: str, params: dict[str, object]) -> pd.DataFrame:
+        with self._pool.connection() as conn:
+            return self._fetch_frame(conn, query, params)
 
-    def _resolve_yield_query(self, product_name: str, stage: str) -> tuple[str, dict[str, str], str]:
+    def _compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        """COMPACT_DTYPES が有効なら ID をカテゴリ型・測定値を float32 などへ揃える。"""
+        return compact_frame(df) if self.config.database.compact_dtypes else df
+
+    def _fetch_frame(self, conn, query: str, params: dict[str, object]) -> pd.DataFrame:
+        """Arrow 経由（python-oracledb 3.x）またはカーソルの配列フェッチで DataFrame を作る。
+
+        どちらも `DB_ARRAYSIZE` 行単位でまとめて受信し、数値列は float64 で返す。
+        """
+        db = self.config.database
+        mode = db.oracle_fetch_mode.lower()
+        if mode not in FETCH_MODES:
+            raise ValueError(f"Unsupported fetch mode: {mode}")
+        if mode == "arrow" and pa is not None and hasattr(conn, "fetch_df_all"):
+            odf = conn.fetch_df_all(statement=query, parameters=params, arraysize=db.oracle_arraysize)
+            return _cast_numeric_arrow(_to_arrow_table(odf)).to_pandas()
+        with conn.cursor() as cursor:
+            cursor.arraysize = db.oracle_arraysize
+            cursor.prefetchrows = db.oracle_prefetchrows
+            cursor.execute(query, params)
+            columns = [col[0] for col in cursor.description]
+            rows = cursor.fetchall()
+        return _cast_numeric_pandas(pd.DataFrame.from_records(rows, columns=columns))
+
+    def _resolve_yield_query(
+        self, product_name: str, stage: str
+    ) -> tuple[YieldQueryConfig, dict[str, object], str]:
         stage_upper = stage.upper()
-        params: dict[str, str] = {"product_name": product_name.upper()}
+        params: dict[str, object] = {"product_name": product_name.upper(), "since": FULL_LOAD_SINCE}
         if stage_upper == "FT":
             query_cfg = self.FT_QUERY_MAP.get(product_name.lower(), self.FT_DEFAULT)
         else:
             query_cfg = self.CP_QUERY_MAP.get(product_name.lower(), self.CP_DEFAULT)
         params["process"] = query_cfg.process_override or stage_upper
-        return query_cfg.sql, params, stage_upper
+        return query_cfg, params, stage_upper
+
+    def load_yield_overview(
+        self,
+        product_name: str,
+        stage: str = "CP",
+        *,
+        since: datetime | None = None,
+        incremental: bool | None = None,
+        pivot_mode: str | None = None,
+    ) -> pd.DataFrame:
+        if since is not None:
+            # 期間指定（スナップショットの欠損パーティション補完など）は差分状態を使わない
+            return self._fetch_yield_wide(product_name, stage, since, pivot_mode)
+        use_incremental = self.config.database.yield_incremental if incremental is None else incremental
+        if use_incremental:
+            return self._load_yield_incremental(product_name, stage, pivot_mode)
+        return self._fetch_yield_wide(product_name, stage, FULL_LOAD_SINCE, pivot_mode)
+
+    def _fetch_yield_wide(
+        self, product_name: str, stage: str, since: datetime, pivot_mode: str | None = None
+    ) -> pd.DataFrame:
+        mode = (pivot_mode or self.config.database.yield_pivot_mode).lower()
+        if mode not in PIVOT_MODES:
+            raise ValueError(f"Unsupported pivot mode: {mode}")
+        query_cfg, params, stage_label = self._resolve_yield_query(product_name, stage)
+        params["since"] = since
+        if mode == "server" and query_cfg.aggregate_sql and query_cfg.bin_dictionary_sql:
+            return self._compact(self._aggregate_yield(query_cfg, params, stage_label))
+        return self._compact(self._pivot_yield(self._read_sql(query_cfg.sql, params), stage_label))
+
+    def _aggregate_yield(
+        self, query_cfg: YieldQueryConfig, params: dict[str, object], stage_label: str
+    ) -> pd.DataFrame:
+        """BIN辞書を先に取得し、ウエハ×BINの条件付き集計と正規化をOracle側で行う。"""
+        with self._pool.connection() as conn:
+            # 辞書と集計を同じ読み取り一貫性で実行し、間に追加されたBINを取りこぼさない
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION READ ONLY")
+            try:
+                dictionary = self._fetch_frame(conn, query_cfg.bin_dictionary_sql, params)
+                if dictionary.empty:
+                    return pd.DataFrame()
+                dictionary["BinLabel"] = _build_bin_labels(dictionary["Bin"], dictionary["BinName"])
+                dictionary = dictionary.sort_values(["BinLabel", "Bin"], kind="stable").reset_index(drop=True)
+                bin_columns = ",\n    ".join(
+                    _bin_sum_expression(
+                        query_cfg.bin_table_alias, idx, has_bin_count=query_cfg.has_bin_count
+                    )
+                    for idx in range(len(dictionary))
+                )
+                bind = dict(params)
+                for idx, row in dictionary.iterrows():
+                    bind[f"bin_code_{idx}"] = int(row["Bin"])
+                    bind[f"bin_name_{idx}"] = None if pd.isna(row["BinName"]) else row["BinName"]
+                sql = query_cfg.aggregate_sql.format(bin_columns=bin_columns)
+                raw = self._fetch_frame(conn, sql, bind)
+            finally:
+                conn.rollback()
+        if raw.empty:
+            return raw
+        pass_rows = dictionary[pd.to_numeric(dictionary["Bin"], errors="coerce") == self.PASS_BIN_CODE]
+        pass_label = pass_rows["BinLabel"].iloc[0] if not pass_rows.empty else None
+        index_cols = [c for c in YIELD_INDEX_COLUMNS if c in raw.columns]
+        df = raw[index_cols].copy()
+        df["EffectiveNum"] = pd.to_numeric(df["EffectiveNum"], errors="coerce")
+        for label, group in dictionary.groupby("BinLabel", sort=True):
+            name = "0_PASS" if pass_label and label == pass_label else f"FAIL_BIN_{label}"
+            # 空白違いのBIN名は同一ラベルになるため、クライアント側ピボットと同様に合算する
+            df[name] = raw[[f"BIN_{idx}" for idx in group.index]].sum(axis=1, min_count=1)
+        df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
+        df["Stage"] = stage_label
+        return df.sort_values(index_cols, kind="stable").reset_index(drop=True)
+
+    def _load_yield_incremental(
+        self, product_name: str, stage: str, pivot_mode: str | None = None
+    ) -> pd.DataFrame:
+        """前回の REGIST_DATE 最高水位以降だけを取得・ピボットして既存分へマージする。"""
+        key = (product_name.upper(), stage.upper())
+        with self._incremental_guard:
+            lock = self._incremental_locks.setdefault(key, threading.Lock())
+        with lock:
+            state = self._incremental.get(key)
+            since = FULL_LOAD_SINCE
+            if state is not None and state.high_water is not None:
+                overlap = timedelta(minutes=self.config.database.incremental_overlap_minutes)
+                since = state.high_water - overlap
+            delta = self._fetch_yield_wide(product_name, stage, since, pivot_mode)
+            if state is None:
+                frame = delta
+            else:
+                frame = self._compact(_merge_yield_delta(state.frame, delta))
+            high_water = state.high_water if state else None
+            if not delta.empty and "Time" in delta.columns:
+                delta_max = delta["Time"].max()
+                if pd.notna(delta_max):
+                    delta_max = delta_max.to_pydatetime()
+                    high_water = delta_max if high_water is None else max(high_water, delta_max)
+            self._incremental[key] = _IncrementalYieldState(frame=frame, high_water=high_water)
+        return frame.copy(deep=False)
 
-    def load_yield_overview(self, product_name: str, stage: str = "CP") -> pd.DataFrame:
-        query, params, stage_label = self._resolve_yield_query(product_name, stage)
-        df_long = pd.read_sql_query(query, self._conn, params=params)
+    def reset_incremental(self, product_name: str | None = None) -> None:
+        """差分取得の状態を破棄し、次回は6か月分を取り直す。"""
+        with self._incremental_guard:
+            if product_name is None:
+                self._incremental.clear()
+                return
+            needle = product_name.upper()
+            for key in [k for k in self._incremental if k[0] == needle]:
+                del self._incremental[key]
+
+    def _pivot_yield(self, df_long: pd.DataFrame, stage_label: str) -> pd.DataFrame:
         if df_long.empty:
             return df_long
-        df_long["BinLabel"] = pd.to_numeric(df_long["Bin"], errors="coerce").astype("Int64").astype(str).str.zfill(2)
-        if "BinName" in df_long.columns:
-            df_long["BinLabel"] = (
-                df_long["BinLabel"]
-                + "_"
-                + df_long["BinName"].fillna("").astype(str).str.strip()
-            ).str.rstrip("_")
+        df_long["BinLabel"] = _build_bin_labels(df_long["Bin"], df_long.get("BinName"))
         pass_label = None
         pass_rows = df_long[pd.to_numeric(df_long["Bin"], errors="coerce") == self.PASS_BIN_CODE]
         if not pass_rows.empty:
@@ -209,23 +615,120 @@ class OracleRepository:
         df["Stage"] = stage_label
         return df
 
-    def load_wat_measurements(self, product_name: str) -> pd.DataFrame:
-        params = {"product_name": product_name.upper()}
-        df_long = pd.read_sql_query(WAT_QUERY, self._conn, params=params)
+    def load_wat_measurements(
+        self,
+        product_name: str,
+        *,
+        since: datetime | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> pd.DataFrame:
+        params = {"product_name": product_name.upper(), "since": since or FULL_LOAD_SINCE}
+        if self.config.database.wat_chunk_rows > 0:
+            pieces = list(self.iter_wat_chunks(product_name, since=since, progress=progress))
+            if not pieces:
+                return pd.DataFrame()
+            return self._compact(self._combine_wat_chunks(pieces))
+        df_long = self._read_sql(WAT_QUERY, params)
+        if progress is not None:
+            progress(len(df_long), len(df_long))
+        return self._compact(self._pivot_wat(df_long))
+
+    def iter_wat_chunks(
+        self,
+        product_name: str,
+        *,
+        since: datetime | None = None,
+        chunk_rows: int | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Iterator[pd.DataFrame]:
+        """WAT を chunk_rows 行ずつ取得し、ウエハ単位で区切ってワイド形式へ逐次ピボットする。
+
+        最後のウエハはチャンクをまたぐ可能性があるため次のチャンクへ持ち越す。
+        ピーク時の縦持ちデータはチャンクサイズ（+1ウエハ分）に抑えられる。
+        総行数は数えず（結合全体の COUNT(*) は取得と同じくらい重い）、前回の全件取得の行数を見込みとして通知する。
+        見込みがない・超えた場合は None（行数のみの表示）になる。
+        """
+        product = product_name.upper()
+        params = {"product_name": product, "since": since or FULL_LOAD_SINCE}
+        size = chunk_rows or self.config.database.wat_chunk_rows
+        estimate = self._wat_rows.get(product) if since is None else None
+        if progress is not None:
+            progress(0, estimate)
+        done = 0
+        carry = pd.DataFrame()
+        for batch in self._iter_batches(WAT_STREAM_QUERY, params, size):
+            done += len(batch)
+            if not carry.empty:
+                batch = pd.concat([carry, batch], ignore_index=True)
+            last = batch.iloc[-1]
+            is_last_wafer = pd.Series(True, index=batch.index)
+            for col in WAT_WAFER_KEY:
+                if col in batch.columns:
+                    is_last_wafer &= batch[col].eq(last[col]) | (batch[col].isna() & pd.isna(last[col]))
+            carry = batch[is_last_wafer]
+            complete = batch[~is_last_wafer]
+            if not complete.empty:
+                yield self._compact(self._pivot_wat(complete))
+            if progress is not None:
+                progress(done, estimate if estimate is not None and done <= estimate else None)
+        if not carry.empty:
+            yield self._compact(self._pivot_wat(carry))
+        if since is None:
+            self._wat_rows[product] = done
+        if progress is not None:
+            progress(done, done)
+
+    def _iter_batches(self, query: str, params: dict[str, object], size: int) -> Iterator[pd.DataFrame]:
+        db = self.config.database
+        with self._pool.connection() as conn:
+            if db.oracle_fetch_mode == "arrow" and pa is not None and hasattr(conn, "fetch_df_batches"):
+                for odf in conn.fetch_df_batches(statement=query, parameters=params, size=size):
+                    yield _cast_numeric_arrow(_to_arrow_table(odf)).to_pandas()
+                return
+            with conn.cursor() as cursor:
+                cursor.arraysize = min(size, db.oracle_arraysize)
+                cursor.prefetchrows = db.oracle_prefetchrows
+                cursor.execute(query, params)
+                columns = [col[0] for col in cursor.description]
+                while rows := cursor.fetchmany(size):
+                    yield _cast_numeric_pandas(pd.DataFrame.from_records(rows, columns=columns))
+
+    def list_wat_wafers(self, product_name: str) -> pd.DataFrame:
+        """(Product, BulkID, WaferID, Time) の一覧だけを返す。"""
+        df = self._read_sql(WAT_WAFER_INDEX_QUERY, {"product_name": product_name.upper()})
+        if df.empty:
+            return pd.DataFrame(columns=list(WAT_INDEX_COLUMNS))
+        df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
+        return self._compact(df)
+
+    def load_wat_lot(self, product_name: str, bulk_id: str, wafer_id: object | None = None) -> pd.DataFrame:
+        """1つの BulkID（wafer_id 指定時は1ウエハ）の測定値だけをワイド形式で返す。"""
+        params: dict[str, object] = {
+            "product_name": product_name.upper(),
+            "since": FULL_LOAD_SINCE,
+            "bulk_id": _bind_value(bulk_id),
+        }
+        query = WAT_LOT_QUERY
+        if wafer_id is not None:
+            params["wafer_id"] = _bind_value(wafer_id)
+            query = WAT_WAFER_QUERY
+        return self._compact(self._pivot_wat(self._read_sql(query, params)))
+
+    @staticmethod
+    def _pivot_wat(df_long: pd.DataFrame) -> pd.DataFrame:
         if df_long.empty:
             return df_long
-
-        pivot_index = [
-            "Product",
-            "BulkID",
-            "WaferID",
-            "DieX",
-            "DieY",
-            "Site",
-            "Time",
-        ]
-        valid_index = [c for c in pivot_index if c in df_long.columns]
+        valid_index = [c for c in WAT_PIVOT_INDEX if c in df_long.columns]
         df = df_long.pivot_table(index=valid_index, columns="Parameter", values="Value").reset_index()
+        df.columns.name = None
         if "Time" in df.columns:
             df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
         return df
+
+    @staticmethod
+    def _combine_wat_chunks(pieces: list[pd.DataFrame]) -> pd.DataFrame:
+        df = pd.concat(pieces, ignore_index=True, sort=False)
+        valid_index = [c for c in WAT_PIVOT_INDEX if c in df.columns]
+        params = sorted(c for c in df.columns if c not in valid_index)
+        # 一括ピボットと同じ列順・行順に揃える
+        return df[valid_index + params].sort_values(valid_index, kind="stable").reset_index(drop=True)
@@ -0,0 +1,10 @@
+"""長時間の取得処理から UI へ進捗を伝えるための型。"""
+
+from __future__ import annotations
+
+from typing import Callable
+
+# (処理済み行数, 総行数 or 不明なら None) を受け取るコールバック
+ProgressCallback = Callable[[int, "int | None"], None]
+
+__all__ = ["ProgressCallback"]
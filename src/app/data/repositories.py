@@ -2,28 +2,47 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Protocol
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import ClassVar, Protocol
 
 import pandas as pd
 
-from ..config import AppConfig, load_config
+from ..config import AppConfig, DatabaseConfig, load_config
+from .cache import CachedRepository, CacheStats
+from .connections import PoolStats
 from .sqlite_repo import SQLiteRepository
 from .oracle_repo import OracleRepository
+from .progress import ProgressCallback
+from .schema import MemoryReport
+from .singleflight import SingleFlightStats
 
 
 class DatabaseRepository(Protocol):
     """Yield/WATデータを提供するための共通インターフェース。"""
 
-    def load_yield_overview(self, product_name: str, stage: str = "CP") -> pd.DataFrame: ...
+    def load_yield_overview(
+        self, product_name: str, stage: str = "CP", *, since: datetime | None = None
+    ) -> pd.DataFrame: ...
 
-    def load_wat_measurements(self, product_name: str) -> pd.DataFrame: ...
+    def load_wat_measurements(
+        self, product_name: str, *, since: datetime | None = None, progress: ProgressCallback | None = None
+    ) -> pd.DataFrame: ...
+
+    def list_wat_wafers(self, product_name: str) -> pd.DataFrame: ...
+
+    def load_wat_lot(self, product_name: str, bulk_id: str, wafer_id: object | None = None) -> pd.DataFrame: ...
 
 
 @dataclass
 class RepositoryFactory:
     config: AppConfig
 
+    # DatabaseConfig 単位でプロセス全体に1つだけリポジトリ(=コネクションプール)を保持する
+    _shared: ClassVar[dict[DatabaseConfig, DatabaseRepository]] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
     def create(self) -> DatabaseRepository:
         backend = self.config.database.backend
         if backend == "oracle":
@@ -32,7 +51,114 @@ class RepositoryFactory:
             return SQLiteRepository(self.config)
         raise ValueError(f"Unsupported DB backend: {backend}")
 
+    def create_cached(self) -> DatabaseRepository:
+        """CACHE_TTL_SECONDS > 0 なら結果キャッシュで包んだリポジトリを返す。"""
+        repo = self.create()
+        if self.config.cache_ttl_seconds <= 0:
+            return repo
+        return CachedRepository(
+            repo,
+            self.config.database.backend,
+            ttl_seconds=self.config.cache_ttl_seconds,
+            max_bytes=self.config.cache_max_bytes,
+        )
+
+    def shared(self) -> DatabaseRepository:
+        """同一接続設定のリポジトリを再利用し、Streamlit の再実行ごとの接続を避ける。"""
+        key = self.config.database
+        repo = self._shared.get(key)
+        if repo is not None:
+            return repo
+        with self._lock:
+            repo = self._shared.get(key)
+            if repo is None:
+                repo = self.create_cached()
+                self._shared[key] = repo
+        return repo
+
+    @classmethod
+    def shared_repositories(cls) -> dict[DatabaseConfig, DatabaseRepository]:
+        with cls._lock:
+            return dict(cls._shared)
+
+    @classmethod
+    def close_all(cls) -> None:
+        with cls._lock:
+            repos = list(cls._shared.values())
+            cls._shared.clear()
+        for repo in repos:
+            close = getattr(repo, "close", None)
+            if close is not None:
+                close()
+
 
 def create_repository(config: AppConfig | None = None) -> DatabaseRepository:
     cfg = config or load_config()
-    return RepositoryFactory(cfg).create()
+    return RepositoryFactory(cfg).shared()
+
+
+def pool_statistics(*, check_health: bool = False) -> list[dict[str, object]]:
+    """共有中のリポジトリごとのプール統計を返す。"""
+    rows: list[dict[str, object]] = []
+    for repo in RepositoryFactory.shared_repositories().values():
+        stats_fn = getattr(repo, "pool_stats", None)
+        if stats_fn is None:
+            continue
+        stats: PoolStats = stats_fn()
+        row: dict[str, object] = asdict(stats)
+        if check_health:
+            row["healthy"] = repo.ping()
+        rows.append(row)
+    return rows
+
+
+def dataset_memory() -> list[tuple[dict[str, object], MemoryReport]]:
+    """キャッシュ中のデータセットごとの (概要行, 列別メモリ内訳) を大きい順に返す。"""
+    rows: list[tuple[dict[str, object], MemoryReport]] = []
+    for repo in RepositoryFactory.shared_repositories().values():
+        if not isinstance(repo, CachedRepository):
+            continue
+        for (backend, product, stage), report in repo.memory_reports():
+            rows.append(({"backend": backend, "product": product, "stage": stage, **report.as_row()}, report))
+    return sorted(rows, key=lambda item: item[1].bytes, reverse=True)
+
+
+def coalescing_statistics() -> list[dict[str, object]]:
+    """共有中のリポジトリごとの同時リクエスト集約（single-flight）の統計を返す。"""
+    rows: list[dict[str, object]] = []
+    for db, repo in RepositoryFactory.shared_repositories().items():
+        if not isinstance(repo, CachedRepository):
+            continue
+        stats: SingleFlightStats = repo.flight_stats()
+        rows.append({"backend": db.backend, **asdict(stats)})
+    return rows
+
+
+def in_flight_queries() -> list[dict[str, object]]:
+    """実行中のクエリと、その完了を待っている呼び出し数。"""
+    rows: list[dict[str, object]] = []
+    for db, repo in RepositoryFactory.shared_repositories().items():
+        if not isinstance(repo, CachedRepository):
+            continue
+        for call in repo.in_flight():
+            # キーは (backend, product, stage[, since])
+            rows.append(
+                {
+                    "backend": db.backend,
+                    "query": " / ".join(map(str, call.key[1:])),
+                    "waiters": call.waiters,
+                    "elapsed_seconds": call.elapsed_seconds,
+                }
+            )
+    return rows
+
+
+def cache_statistics() -> list[dict[str, object]]:
+    """共有中のリポジトリごとの結果キャッシュ統計を返す。"""
+    rows: list[dict[str, object]] = []
+    for db, repo in RepositoryFactory.shared_repositories().items():
+        if not isinstance(repo, CachedRepository):
+            continue
+        stats: CacheStats = repo.cache_stats()
+        rows.append({"backend": db.backend, **asdict(stats)})
+    return rows
@@ -0,0 +1,124 @@
+"""リポジトリが返す Yield / WAT のワイド DataFrame の列型を省メモリな型へ揃える。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# 繰り返しの多い文字列 ID はカテゴリ型にする
+CATEGORY_COLUMNS: tuple[str, ...] = ("Product", "BulkID", "LotID", "WaferID", "Stage")
+# ダイ座標・サイトは小さな整数型にする
+SMALL_INT_COLUMNS: tuple[str, ...] = ("DieX", "DieY", "Site")
+# 上記以外の文字列列も、値の種類が行数のこの割合以下ならカテゴリ型にする
+CATEGORY_MAX_RATIO = 0.5
+# 件数として合算する列は精度を落とさない（float32 では 2^24 を超える合計が丸まる）
+KEEP_COLUMNS: frozenset[str] = frozenset({"Time", "EffectiveNum"})
+
+_FLOAT32_MAX = float(np.finfo(np.float32).max)
+_FLOAT32_TINY = float(np.finfo(np.float32).tiny)
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    """データセット1つ分の列別メモリ使用量。"""
+
+    rows: int
+    bytes: int
+    columns: pd.DataFrame
+
+    def as_row(self) -> dict[str, object]:
+        top = self.columns.iloc[0] if not self.columns.empty else None
+        return {
+            "rows": self.rows,
+            "columns": len(self.columns),
+            "MB": round(self.bytes / 1024**2, 2),
+            "largest_column": None if top is None else str(top["column"]),
+            "largest_MB": None if top is None else round(int(top["bytes"]) / 1024**2, 2),
+        }
+
+
+def _float32_safe(values: np.ndarray) -> bool:
+    """float32 の表現範囲に収まるか（桁あふれ・アンダーフローで 0 になる値がないか）。"""
+    finite = np.abs(values[np.isfinite(values)])
+    if finite.size == 0:
+        return True
+    nonzero = finite[finite > 0]
+    return bool(finite.max() <= _FLOAT32_MAX and (nonzero.size == 0 or nonzero.min() >= _FLOAT32_TINY))
+
+
+def _small_int(series: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(series, errors="coerce")
+    if numeric.isna().any():
+        return numeric.astype(np.float32)
+    values = numeric.to_numpy()
+    if not np.all(values == np.round(values)):
+        return numeric.astype(np.float32)
+    return pd.to_numeric(numeric.astype(np.int64), downcast="integer")
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """ID をカテゴリ型、ダイ座標を小さな整数型、率・測定値を float32 にした DataFrame を返す。
+
+    すでに変換済みの列はそのまま使うため、何度適用しても結果は変わらない。
+    float32 の範囲に収まらない値を含む列は float64 のまま残す。
+    """
+    if df.empty:
+        return df
+    converted: dict[str, pd.Series] = {}
+    for name in df.columns:
+        series = df[name]
+        dtype = series.dtype
+        if name in KEEP_COLUMNS or isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if name in CATEGORY_COLUMNS:
+            if _is_text(series):
+                converted[name] = series.astype("category")
+        elif name in SMALL_INT_COLUMNS:
+            if not pd.api.types.is_integer_dtype(dtype) or dtype.itemsize > 2:
+                converted[name] = _small_int(series)
+        elif dtype == np.float64 and _float32_safe(series.to_numpy()):
+            converted[name] = series.astype(np.float32)
+        elif _is_text(series) and series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(series):
+            converted[name] = series.astype("category")
+    if not converted:
+        return df
+    return df.assign(**converted)
+
+
+def constant_category(value: str, length: int) -> pd.Categorical:
+    """全行が同じ値のカテゴリ列（Stage など）を文字列の複製なしで作る。"""
+    return pd.Categorical.from_codes(np.zeros(length, dtype=np.int8), categories=[value])
+
+
+def memory_report(df: pd.DataFrame) -> MemoryReport:
+    """列ごとの dtype・バイト数・構成比（大きい順）。"""
+    usage = df.memory_usage(index=False, deep=True)
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    columns = pd.DataFrame(
+        {
+            "column": usage.index.astype(str),
+            "dtype": [str(df[c].dtype) for c in usage.index],
+            "bytes": usage.to_numpy(dtype=np.int64),
+        }
+    )
+    columns["share"] = columns["bytes"] / total if total else 0.0
+    columns = columns.sort_values("bytes", ascending=False, kind="stable").reset_index(drop=True)
+    return MemoryReport(rows=len(df), bytes=total, columns=columns)
+
+
+__all__ = [
+    "CATEGORY_COLUMNS",
+    "CATEGORY_MAX_RATIO",
+    "KEEP_COLUMNS",
+    "MemoryReport",
+    "SMALL_INT_COLUMNS",
+    "compact_frame",
+    "constant_category",
+    "memory_report",
+]
@@ -0,0 +1,117 @@
+"""同じキーの同時リクエストを1回の実行にまとめる（single-flight）。"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class SingleFlightStats:
+    """まとめた件数などのスナップショット。coalesced は実行を待って結果を共有した呼び出し数。"""
+
+    requests: int
+    executions: int
+    coalesced: int
+    failures: int
+    in_flight: int
+
+
+@dataclass(frozen=True)
+class InFlightCall:
+    """実行中のクエリ1件（管理画面用）。"""
+
+    key: Hashable
+    waiters: int
+    elapsed_seconds: float
+
+
+@dataclass
+class _Call(Generic[T]):
+    started: float
+    done: threading.Event = field(default_factory=threading.Event)
+    waiters: int = 0
+    result: T | None = None
+    error: BaseException | None = None
+
+
+class SingleFlight:
+    """実行中のキーに後から来た呼び出しは、新たに実行せず最初の呼び出しの完了を待って結果を共有する。
+
+    最初の呼び出しが例外（Exception）で失敗した場合は、待っていた呼び出しにも同じ例外を送出する。
+    Streamlit の再実行・停止など Exception 以外で中断された場合は、待っていた呼び出しが改めて実行する。
+    完了したキーは即座に忘れるため、結果の保持はキャッシュ側の役割。
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._executions = 0
+        self._coalesced = 0
+        self._failures = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            self._requests += 1
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call(started=time.monotonic())
+                    self._executions += 1
+                    leader = True
+                else:
+                    call.waiters += 1
+                    self._coalesced += 1
+                    leader = False
+            if leader:
+                return self._run(key, call, fn)
+            call.done.wait()
+            if call.error is None:
+                return call.result
+            if isinstance(call.error, Exception):
+                raise call.error
+            # 最初の呼び出し元のスクリプトが中断されただけなので、こちらで実行し直す
+            with self._lock:
+                self._coalesced -= 1
+
+    def _run(self, key: Hashable, call: _Call[T], fn: Callable[[], T]) -> T:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            if isinstance(exc, Exception):
+                with self._lock:
+                    self._failures += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> list[InFlightCall]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                InFlightCall(key=key, waiters=call.waiters, elapsed_seconds=round(now - call.started, 1))
+                for key, call in self._calls.items()
+            ]
+
+    def stats(self) -> SingleFlightStats:
+        with self._lock:
+            return SingleFlightStats(
+                requests=self._requests,
+                executions=self._executions,
+                coalesced=self._coalesced,
+                failures=self._failures,
+                in_flight=len(self._calls),
+            )
+
+
+__all__ = ["InFlightCall", "SingleFlight", "SingleFlightStats"]
@@ -0,0 +1,254 @@
+"""読み込み済みデータセットを Parquet で月別パーティション保存するスナップショット層。"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from ..config import AppConfig
+from .schema import compact_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+PART_FILE = "part.parquet"
+YIELD_KIND = "yield"
+WAT_KIND = "wat"
+
+
+def window_months(now: datetime, months: int) -> list[str]:
+    """now を含む直近 months+1 か月分（6か月窓の端月を含む）の月キーを古い順に返す。"""
+    periods = pd.period_range(end=pd.Timestamp(now).to_period("M"), periods=months + 1, freq="M")
+    return [str(p) for p in periods]
+
+
+def _month_end(month: str) -> datetime:
+    """YYYY-MM の翌月1日 0時（この時刻以降に書かれたパーティションは月全体を含む）。"""
+    return (pd.Period(month, freq="M") + 1).start_time.to_pydatetime()
+
+
+@dataclass(frozen=True)
+class SnapshotPartition:
+    kind: str
+    product: str
+    stage: str
+    month: str
+    rows: int
+    bytes: int
+    written_at: datetime
+
+
+class SnapshotStore:
+    """`<base>/<kind>/product=<P>/stage=<S>/month=<YYYY-MM>/part.parquet` 形式で保存する。
+
+    月が明けてから書かれたパーティションは不変として再利用し、当月・未保存の月・
+    月の途中で書かれたまま月が明けたパーティションをリポジトリから取り直す。
+    当月分も `refresh_seconds` 以内に書かれていれば再利用する。
+    `compact` が有効なら読み出した結果の列型をリポジトリと同じ省メモリ型へ揃える。
+    """
+
+    def __init__(
+        self, base_dir: str | Path, *, window: int = 6, refresh_seconds: float = 600, compact: bool = True
+    ) -> None:
+        if pa is None:
+            raise RuntimeError("snapshot store requested but pyarrow is未インストール")
+        self.base_dir = Path(base_dir)
+        self.window = window
+        self.refresh_seconds = refresh_seconds
+        self.compact = compact
+        self._locks: dict[Path, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _dataset_dir(self, kind: str, product: str, stage: str) -> Path:
+        return self.base_dir / kind / f"product={product.upper()}" / f"stage={stage.upper()}"
+
+    def _partition_path(self, kind: str, product: str, stage: str, month: str) -> Path:
+        return self._dataset_dir(kind, product, stage) / f"month={month}" / PART_FILE
+
+    def partitions(self, kind: str, product: str, stage: str) -> list[SnapshotPartition]:
+        root = self._dataset_dir(kind, product, stage)
+        if not root.exists():
+            return []
+        parts: list[SnapshotPartition] = []
+        for path in sorted(root.glob(f"month=*/{PART_FILE}")):
+            stat = path.stat()
+            parts.append(
+                SnapshotPartition(
+                    kind=kind,
+                    product=product.upper(),
+                    stage=stage.upper(),
+                    month=path.parent.name.split("=", 1)[1],
+                    rows=pq.ParquetFile(path).metadata.num_rows,
+                    bytes=stat.st_size,
+                    written_at=datetime.fromtimestamp(stat.st_mtime),
+                )
+            )
+        return parts
+
+    def missing_months(self, kind: str, product: str, stage: str, now: datetime | None = None) -> list[str]:
+        now = now or datetime.now()
+        months = window_months(now, self.window)
+        current = months[-1]
+        missing: list[str] = []
+        for month in months:
+            path = self._partition_path(kind, product, stage, month)
+            if not path.exists():
+                missing.append(month)
+                continue
+            written_at = path.stat().st_mtime
+            if month == current:
+                if time.time() - written_at > self.refresh_seconds:
+                    missing.append(month)
+            # 月の途中で書いたパーティションは、その後に届いた行を含まないので月が明けたら取り直す
+            elif datetime.fromtimestamp(written_at) < _month_end(month):
+                missing.append(month)
+        return missing
+
+    def write(self, kind: str, product: str, stage: str, df: pd.DataFrame, months: list[str]) -> None:
+        """df を月別に分割して保存する。データの無い月も空パーティションとして記録する。"""
+        if "Time" in df.columns and not df.empty:
+            month_series = df["Time"].dt.strftime("%Y-%m")
+        else:
+            month_series = pd.Series(dtype=str, index=df.index)
+        # プリフェッチと各セッションが同じ月を同時に書くことがあるため、データセット単位で直列化する
+        with self._write_lock(kind, product, stage):
+            for month in months:
+                part = df[month_series == month]
+                path = self._partition_path(kind, product, stage, month)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _replace_atomically(path, part.reset_index(drop=True))
+
+    def _write_lock(self, kind: str, product: str, stage: str) -> threading.Lock:
+        key = self._dataset_dir(kind, product, stage).resolve()
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def read(
+        self, kind: str, product: str, stage: str, *, fill_value: float | None = None, now: datetime | None = None
+    ) -> pd.DataFrame:
+        """窓内のパーティションをメモリマップで読み、列の差異を fill_value で補って結合する。"""
+        now = now or datetime.now()
+        tables = []
+        for month in window_months(now, self.window):
+            path = self._partition_path(kind, product, stage, month)
+            if not path.exists():
+                continue
+            table = pq.read_table(path, memory_map=True)
+            if table.num_rows:
+                tables.append(table)
+        if not tables:
+            return pd.DataFrame()
+        if fill_value is not None:
+            all_columns = list(dict.fromkeys(name for t in tables for name in t.column_names))
+            tables = [_add_missing_columns(t, all_columns, fill_value, _column_types(tables)) for t in tables]
+        # 月ごとにカテゴリの辞書や float32/float64 が異なっていても結合できるようにする
+        # （カテゴリ列はいったん文字列に戻し、compact_frame で全体の辞書を作り直す）
+        tables = [_decode_dictionaries(t) for t in tables]
+        df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+        if "Time" in df.columns:
+            cutoff = pd.Timestamp(now) - pd.DateOffset(months=self.window)
+            df = df[df["Time"] >= cutoff].reset_index(drop=True)
+        return compact_frame(df) if self.compact else df
+
+    def load(
+        self,
+        kind: str,
+        product: str,
+        stage: str,
+        fetch: Callable[[datetime], pd.DataFrame],
+        *,
+        fill_value: float | None = None,
+    ) -> pd.DataFrame:
+        """欠けている月だけ fetch(since) で取得・保存してから窓全体を読み出す。"""
+        now = datetime.now()
+        missing = self.missing_months(kind, product, stage, now)
+        if missing:
+            since = pd.Period(missing[0], freq="M").start_time.to_pydatetime()
+            fresh = fetch(since)
+            fetched_months = [m for m in window_months(now, self.window) if m >= missing[0]]
+            self.write(kind, product, stage, fresh, fetched_months)
+        return self.read(kind, product, stage, fill_value=fill_value, now=now)
+
+    def purge(self, kind: str | None = None, product: str | None = None) -> int:
+        """スナップショットを削除する（削除したパーティション数を返す）。"""
+        root = self.base_dir / kind if kind else self.base_dir
+        pattern = f"**/product={product.upper()}/**/{PART_FILE}" if product else f"**/{PART_FILE}"
+        removed = 0
+        for path in root.glob(pattern):
+            path.unlink()
+            removed += 1
+        return removed
+
+
+def _replace_atomically(path: Path, df: pd.DataFrame) -> None:
+    """同じディレクトリの一意な一時ファイルへ書き切ってから置き換える（読み手は常に完全なファイルを見る）。"""
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.stem}-", suffix=".tmp", delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _decode_dictionaries(table: "pa.Table") -> "pa.Table":
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            column = table.column(idx).cast(field.type.value_type)
+            table = table.set_column(idx, pa.field(field.name, field.type.value_type), column)
+    return table
+
+
+def _column_types(tables: list["pa.Table"]) -> dict[str, "pa.DataType"]:
+    types: dict[str, pa.DataType] = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, field.type)
+    return types
+
+
+def _add_missing_columns(
+    table: "pa.Table", columns: list[str], fill_value: float, types: dict[str, "pa.DataType"] | None = None
+) -> "pa.Table":
+    """欠けている列を、他の月と同じ型（不明なら float64）の fill_value で補う。"""
+    for name in columns:
+        if name not in table.column_names:
+            dtype = (types or {}).get(name, pa.float64())
+            if not pa.types.is_floating(dtype):
+                dtype = pa.float64()
+            table = table.append_column(name, pa.array([fill_value] * table.num_rows, type=dtype))
+    return table.select(columns)
+
+
+def create_snapshot_store(config: AppConfig) -> SnapshotStore | None:
+    """SNAPSHOT_DIR が設定されていればスナップショット層を返す。"""
+    if not config.snapshot_dir:
+        return None
+    return SnapshotStore(
+        Path(config.snapshot_dir) / config.database.backend,
+        refresh_seconds=config.cache_ttl_seconds,
+        compact=config.database.compact_dtypes,
+    )
+
+
+__all__ = [
+    "SnapshotPartition",
+    "SnapshotStore",
+    "YIELD_KIND",
+    "WAT_KIND",
+    "create_snapshot_store",
+    "window_months",
+]
@@ -2,22 +2,42 @@
 
 from __future__ import annotations
 
-import sqlite3
 from datetime import datetime, timedelta
 
 import pandas as pd
 
 from ..config import AppConfig
+from .connections import PoolStats, SQLiteConnectionPool
+from .progress import ProgressCallback
+from .schema import compact_frame
 
 
 class SQLiteRepository:
     PASS_BIN_CODE = 1
 
-    def __init__(self, config: AppConfig) -> None:
+    def __init__(self, config: AppConfig, pool: SQLiteConnectionPool | None = None) -> None:
         self.config = config
-        self._conn = sqlite3.connect(self.config.database.sqlite_path or "data/test.db")
+        self._pool = pool or SQLiteConnectionPool(config.database)
 
-    def load_yield_overview(self, product_name: str, stage: str = "CP") -> pd.DataFrame:
+    def ping(self) -> bool:
+        return self._pool.ping()
+
+    def pool_stats(self) -> PoolStats:
+        return self._pool.stats()
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        return compact_frame(df) if self.config.database.compact_dtypes else df
+
+    def _read_sql(self, query: str, params: tuple) -> pd.DataFrame:
+        with self._pool.connection() as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def load_yield_overview(
+        self, product_name: str, stage: str = "CP", *, since: datetime | None = None
+    ) -> pd.DataFrame:
         stage_upper = stage.upper()
         if stage_upper not in {"CP", "FT"}:
             raise ValueError(f"Unsupported stage: {stage}")
@@ -30,7 +50,9 @@ class SQLiteRepository:
         df["Stage"] = stage_upper
         if "Time" in df.columns:
             df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
-        return df
+            if since is not None:
+                df = df[df["Time"] >= since].reset_index(drop=True)
+        return self._compact(df)
 
     def _build_lot_metadata(self, product_name: str) -> pd.DataFrame:
         query = """
@@ -39,7 +61,7 @@ class SQLiteRepository:
             WHERE product = ?
             ORDER BY lot_id
         """
-        df = pd.read_sql_query(query, self._conn, params=(product_name,))
+        df = self._read_sql(query, (product_name,))
         if df.empty:
             return df
         base_time = datetime.utcnow()
@@ -66,7 +88,7 @@ class SQLiteRepository:
               AND stage = ?
             ORDER BY lot_id, bin_code
         """
-        df = pd.read_sql_query(query, self._conn, params=(product_name, stage))
+        df = self._read_sql(query, (product_name, stage))
         if df.empty:
             return df
         df["BinLabel"] = (
@@ -112,16 +134,47 @@ class SQLiteRepository:
         all_rate_cols = fail_cols + (["0_PASS"] if "0_PASS" in pivot.columns else [])
         for col in all_rate_cols:
             pivot[col] = pivot[col].div(denom) * 100
-        return pivot.drop(columns=["EffectiveNum"])
+        # 率 × EffectiveNum / 100 でダイ数に戻せるよう、Oracle 実装と同様に EffectiveNum を残す
+        return pivot
 
-    def load_wat_measurements(self, product_name: str) -> pd.DataFrame:
+    def load_wat_measurements(
+        self, product_name: str, *, since: datetime | None = None, progress: ProgressCallback | None = None
+    ) -> pd.DataFrame:
         query = """
             SELECT product, lot_id, subgroup, param1, param2
             FROM wat_data
             WHERE product = ?
             ORDER BY lot_id, subgroup
         """
-        df = pd.read_sql_query(query, self._conn, params=(product_name,))
+        df = self._read_sql(query, (product_name,))
+        if progress is not None:
+            progress(len(df), len(df))
+        df = self._shape_wat(df)
+        if since is not None and not df.empty:
+            df = df[df["Time"] >= since].reset_index(drop=True)
+        return self._compact(df)
+
+    def list_wat_wafers(self, product_name: str) -> pd.DataFrame:
+        df = self.load_wat_measurements(product_name)
+        if df.empty:
+            return pd.DataFrame(columns=["Product", "BulkID", "WaferID", "Time"])
+        index = df[["Product", "BulkID", "WaferID", "Time"]].drop_duplicates(["BulkID", "WaferID"])
+        return index.sort_values(["Time", "BulkID", "WaferID"]).reset_index(drop=True)
+
+    def load_wat_lot(self, product_name: str, bulk_id: str, wafer_id: object | None = None) -> pd.DataFrame:
+        query = """
+            SELECT product, lot_id, subgroup, param1, param2
+            FROM wat_data
+            WHERE product = ? AND lot_id = ?
+            ORDER BY lot_id, subgroup
+        """
+        df = self._shape_wat(self._read_sql(query, (product_name, bulk_id)))
+        if wafer_id is not None and not df.empty:
+            df = df[df["WaferID"] == wafer_id].reset_index(drop=True)
+        return self._compact(df)
+
+    @staticmethod
+    def _shape_wat(df: pd.DataFrame) -> pd.DataFrame:
         if df.empty:
             return df
 
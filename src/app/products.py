@@ -2,8 +2,8 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from functools import lru_cache
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterable, Sequence
 
@@ -13,6 +13,8 @@ DEFAULT_CONFIG_PATH = Path("config/products.yaml")
 DEFAULT_DATA_DIR = Path("data")
 DEFAULT_SPEC_DIR = Path("config/specs")
 DEFAULT_STAGES: tuple[str, ...] = ("CP", "FT")
+# libyaml があれば C 実装で読む（数千品種のカタログでも再読込を短く保つ）
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 @dataclass(frozen=True)
@@ -40,13 +42,9 @@ def _normalize_stage_list(raw: Iterable[str] | None) -> tuple[str, ...]:
     return tuple(str(stage).upper() for stage in raw if stage)
 
 
-@lru_cache(maxsize=1)
-def _load_configured_products(config_path: str) -> tuple[ProductDefinition, ...]:
-    path = Path(config_path)
-    if not path.exists():
-        return tuple()
+def _parse_products_file(path: Path) -> tuple[ProductDefinition, ...]:
     with path.open(encoding="utf-8") as fp:
-        data = yaml.safe_load(fp) or {}
+        data = yaml.load(fp, Loader=YAML_LOADER) or {}
     products: list[ProductDefinition] = []
     for item in data.get("products", []):
         name = str(item.get("name", "")).strip()
@@ -72,6 +70,81 @@ def _load_configured_products(config_path: str) -> tuple[ProductDefinition, ...]
     return tuple(products)
 
 
+@dataclass(frozen=True)
+class ProductCatalog:
+    """読み込み済みの製品一覧と、name/source_name/data_subdir（小文字）からの索引。"""
+
+    products: tuple[ProductDefinition, ...]
+    version: tuple[int, int] | None = None
+    index: dict[str, ProductDefinition] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, products: Iterable[ProductDefinition], version: tuple[int, int] | None = None) -> "ProductCatalog":
+        items = tuple(products)
+        index: dict[str, ProductDefinition] = {}
+        for product in items:
+            for key in (product.name, product.source_name, product.data_subdir):
+                # 複数の製品が同じ名前を持つ場合は定義順で先の製品を優先する
+                index.setdefault(key.lower(), product)
+        return cls(products=items, version=version, index=index)
+
+    def find(self, product_name: str) -> ProductDefinition | None:
+        return self.index.get(product_name.lower())
+
+
+_EMPTY_CATALOG = ProductCatalog.build(())
+
+
+class ProductRegistry:
+    """products.yaml を解析済みの ProductCatalog として保持し、mtime が変わったら差し替える。
+
+    新しいカタログを作り終えてから1回の代入で入れ替えるため、読み手が
+    組み立て途中の状態を見ることはない。
+    """
+
+    def __init__(self, config_path: str | Path = DEFAULT_CONFIG_PATH) -> None:
+        self.config_path = Path(config_path)
+        self._catalog = _EMPTY_CATALOG
+        self._lock = threading.Lock()
+
+    def catalog(self) -> ProductCatalog:
+        try:
+            stat = self.config_path.stat()
+        except FileNotFoundError:
+            self._catalog = _EMPTY_CATALOG
+            return self._catalog
+        version = (stat.st_mtime_ns, stat.st_size)
+        catalog = self._catalog
+        if catalog.version == version:
+            return catalog
+        with self._lock:
+            if self._catalog.version != version:
+                self._catalog = ProductCatalog.build(_parse_products_file(self.config_path), version)
+            return self._catalog
+
+    def reload(self) -> ProductCatalog:
+        with self._lock:
+            self._catalog = _EMPTY_CATALOG
+        return self.catalog()
+
+
+_REGISTRIES: dict[str, ProductRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_product_registry(config_path: str | Path | None = None) -> ProductRegistry:
+    key = (Path(config_path) if config_path else DEFAULT_CONFIG_PATH).as_posix()
+    registry = _REGISTRIES.get(key)
+    if registry is None:
+        with _REGISTRIES_LOCK:
+            registry = _REGISTRIES.setdefault(key, ProductRegistry(key))
+    return registry
+
+
+def _load_configured_products(config_path: str) -> tuple[ProductDefinition, ...]:
+    return get_product_registry(config_path).catalog().products
+
+
 def _discover_from_data_dir(data_dir: Path) -> list[ProductDefinition]:
     if not data_dir.exists():
         return []
@@ -107,16 +180,18 @@ def find_product_definition(
     """name/source/data_subdir のいずれかに合致する製品設定を取得。"""
     if isinstance(product_name, ProductDefinition):
         return product_name
-    needle = product_name.lower()
-    for product in list_products(data_dir=data_dir, config_path=config_path):
-        candidates = {
-            product.name.lower(),
-            product.source_name.lower(),
-            product.data_subdir.lower(),
-        }
-        if needle in candidates:
-            return product
-    return None
-
-
-__all__ = ["ProductDefinition", "list_products", "find_product_definition", "DEFAULT_SPEC_DIR"]
+    catalog = get_product_registry(config_path).catalog()
+    if catalog.products:
+        return catalog.find(product_name)
+    return ProductCatalog.build(_discover_from_data_dir(Path(data_dir))).find(product_name)
+
+
+__all__ = [
+    "ProductDefinition",
+    "ProductCatalog",
+    "ProductRegistry",
+    "get_product_registry",
+    "list_products",
+    "find_product_definition",
+    "DEFAULT_SPEC_DIR",
+]
@@ -1,6 +1,27 @@
 """ドメインサービスをまとめるパッケージ。"""
 
-from .yield_service import YieldService
+from .yield_service import StageDataset, YieldService
+from .capability import CapabilityResult, compute_capability, worst_parameters
+from .spc import SPCResult, compute_bulk_spc, individual_limits
+from .rollup import YieldRollups
+from .wafer_grid import WaferGrid
 from .wat_service import WATService
+from .prefetch import PrefetchScheduler, RefreshStatus, ensure_prefetch_scheduler, get_prefetch_scheduler
 
-__all__ = ["YieldService", "WATService"]
+__all__ = [
+    "YieldService",
+    "StageDataset",
+    "YieldRollups",
+    "WATService",
+    "WaferGrid",
+    "SPCResult",
+    "compute_bulk_spc",
+    "individual_limits",
+    "CapabilityResult",
+    "compute_capability",
+    "worst_parameters",
+    "PrefetchScheduler",
+    "RefreshStatus",
+    "ensure_prefetch_scheduler",
+    "get_prefetch_scheduler",
+]
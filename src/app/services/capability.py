@@ -0,0 +1,160 @@
+"""WAT パラメータの工程能力指数（Cp/Cpk/Pp/Ppk）を一括で計算する。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from ..data.cache import frame_nbytes
+from ..specs import CompiledSpecs, limits_table
+from .spc import D2_CONSTANT, WAT_SPEC_STAGE, parameter_columns
+
+CAPABILITY_COLUMNS: tuple[str, ...] = (
+    "Parameter",
+    "n",
+    "mean",
+    "std_overall",
+    "sigma_within",
+    "USL",
+    "LSL",
+    "Cp",
+    "Cpk",
+    "Pp",
+    "Ppk",
+)
+PERIOD_COLUMN = "Period"
+
+
+@dataclass(frozen=True)
+class CapabilityResult:
+    """全体・BulkID 別・期間別の工程能力表（いずれも縦持ち）。"""
+
+    overall: pd.DataFrame
+    by_bulk: pd.DataFrame
+    by_period: pd.DataFrame
+
+    @property
+    def nbytes(self) -> int:
+        return frame_nbytes(self.overall) + frame_nbytes(self.by_bulk) + frame_nbytes(self.by_period)
+
+    def table(self, level: str) -> pd.DataFrame:
+        return {"overall": self.overall, "BulkID": self.by_bulk, PERIOD_COLUMN: self.by_period}[level]
+
+
+def _indices(stats: pd.DataFrame) -> pd.DataFrame:
+    """n/mean/std_overall/sigma_within/USL/LSL 列から各指数を列演算で求める。"""
+    usl, lsl, mean = stats["USL"], stats["LSL"], stats["mean"]
+    within = stats["sigma_within"].where(stats["sigma_within"] > 0)
+    overall = stats["std_overall"].where(stats["std_overall"] > 0)
+    upper, lower = usl - mean, mean - lsl
+    # 片側規格の場合は Cpk/Ppk を存在する側だけで評価する
+    nearest = pd.concat([upper, lower], axis=1).min(axis=1, skipna=True)
+    stats["Cp"] = (usl - lsl) / (6 * within)
+    stats["Cpk"] = nearest / (3 * within)
+    stats["Pp"] = (usl - lsl) / (6 * overall)
+    stats["Ppk"] = nearest / (3 * overall)
+    return stats
+
+
+def _grouped_capability(
+    values: pd.DataFrame,
+    moving_ranges: pd.DataFrame,
+    keys: pd.Series | None,
+    limits: pd.DataFrame,
+    key_name: str | None,
+) -> pd.DataFrame:
+    if keys is None:
+        stats = pd.DataFrame(
+            {
+                "n": values.count(),
+                "mean": values.mean(),
+                "std_overall": values.std(),
+                "sigma_within": moving_ranges.mean() / D2_CONSTANT,
+            }
+        )
+        stats.index.name = "Parameter"
+        stats = stats.reset_index()
+    else:
+        grouped = values.groupby(keys, sort=True, observed=True)
+        wide = pd.concat(
+            {
+                "n": grouped.count(),
+                "mean": grouped.mean(),
+                "std_overall": grouped.std(),
+                "sigma_within": moving_ranges.groupby(keys, sort=True, observed=True).mean() / D2_CONSTANT,
+            },
+            axis=1,
+        )
+        wide.columns.names = ["stat", "Parameter"]
+        wide.index.name = key_name
+        stats = wide.stack(level="Parameter", future_stack=True).reset_index()
+        stats.columns.name = None
+    stats["USL"] = stats["Parameter"].map(limits["USL"]).astype(float)
+    stats["LSL"] = stats["Parameter"].map(limits["LSL"]).astype(float)
+    stats["n"] = stats["n"].fillna(0).astype(int)
+    stats = _indices(stats)
+    columns = ([key_name] if key_name else []) + list(CAPABILITY_COLUMNS)
+    return stats[columns]
+
+
+def compute_capability(
+    df: pd.DataFrame,
+    spec_df: pd.DataFrame | CompiledSpecs | None,
+    parameters: Iterable[str] | None = None,
+    *,
+    period: str = "M",
+) -> CapabilityResult:
+    """規格表を一度だけ結合し、全体・BulkID 別・期間別の Cp/Cpk/Pp/Ppk を求める。
+
+    群内σは I-MR 管理図と同じく、BulkID 内の移動範囲の平均 / d2 で推定する。
+    """
+    params = list(parameters) if parameters is not None else parameter_columns(df)
+    params = [p for p in params if p in df.columns]
+    if df.empty or not params:
+        empty = pd.DataFrame(columns=list(CAPABILITY_COLUMNS))
+        return CapabilityResult(
+            empty,
+            pd.DataFrame(columns=["BulkID", *CAPABILITY_COLUMNS]),
+            pd.DataFrame(columns=[PERIOD_COLUMN, *CAPABILITY_COLUMNS]),
+        )
+
+    values = df[params].astype(np.float64)
+    limits = limits_table(spec_df, stage=WAT_SPEC_STAGE)
+    if "BulkID" in df.columns:
+        bulk_keys = df["BulkID"]
+        moving_ranges = values.groupby(bulk_keys, sort=False, observed=True).diff().abs()
+    else:
+        bulk_keys = None
+        moving_ranges = values.diff().abs()
+
+    overall = _grouped_capability(values, moving_ranges, None, limits, None)
+    by_bulk = (
+        _grouped_capability(values, moving_ranges, bulk_keys, limits, "BulkID")
+        if bulk_keys is not None
+        else pd.DataFrame(columns=["BulkID", *CAPABILITY_COLUMNS])
+    )
+    if "Time" in df.columns:
+        period_keys = pd.to_datetime(df["Time"]).dt.to_period(period).astype(str).rename(PERIOD_COLUMN)
+        by_period = _grouped_capability(values, moving_ranges, period_keys, limits, PERIOD_COLUMN)
+    else:
+        by_period = pd.DataFrame(columns=[PERIOD_COLUMN, *CAPABILITY_COLUMNS])
+    return CapabilityResult(overall, by_bulk, by_period)
+
+
+def worst_parameters(table: pd.DataFrame, *, index: str = "Cpk", only_with_specs: bool = True) -> pd.DataFrame:
+    """指数の小さい順（=能力の低い順）に並べる。"""
+    if only_with_specs:
+        table = table[table["USL"].notna() | table["LSL"].notna()]
+    return table.sort_values(index, ascending=True, na_position="last", kind="stable").reset_index(drop=True)
+
+
+__all__ = [
+    "CAPABILITY_COLUMNS",
+    "CapabilityResult",
+    "PERIOD_COLUMN",
+    "compute_capability",
+    "worst_parameters",
+]
@@ -0,0 +1,185 @@
+"""設定済み品種のデータをバックグラウンドで先読み・更新するスケジューラ。"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+
+from ..config import AppConfig
+from ..data import DatasetStore, create_repository, create_snapshot_store, get_dataset_store
+from ..data.cache import WAT_STAGE_KEY
+from ..products import ProductDefinition, list_products
+from .wat_service import WATService
+from .yield_service import YieldService
+
+
+@dataclass(frozen=True)
+class RefreshStatus:
+    """(product, stage) ごとの直近の更新結果。"""
+
+    product: str
+    stage: str
+    last_refresh: datetime | None
+    duration_seconds: float | None
+    rows: int | None
+    error: str | None = None
+
+
+class PrefetchScheduler:
+    """全品種の (product, stage) と WAT を一定間隔で更新し、キャッシュを温めておく。
+
+    同時実行数を `concurrency` に制限し、各ジョブの開始を 0〜`jitter_seconds` 秒ずらして
+    Oracle への負荷集中を避ける。`store` を渡すと、更新した Yield データセットを共有ストアに登録して
+    全粒度のロールアップを作っておく（ページを開いたときは作成済みのものを使う）。
+    """
+
+    def __init__(
+        self,
+        yield_service: YieldService,
+        wat_service: WATService,
+        *,
+        interval_seconds: float,
+        concurrency: int = 2,
+        jitter_seconds: float = 0.0,
+        products: Callable[[], list[ProductDefinition]] = list_products,
+        store: DatasetStore | None = None,
+        backend: str = "",
+    ) -> None:
+        self.yield_service = yield_service
+        self.wat_service = wat_service
+        self.interval_seconds = interval_seconds
+        self.concurrency = max(concurrency, 1)
+        self.jitter_seconds = max(jitter_seconds, 0.0)
+        self._products = products
+        self.store = store
+        self.backend = backend
+        self._status: dict[tuple[str, str], RefreshStatus] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            if self._stop.wait(self.interval_seconds):
+                break
+
+    def jobs(self) -> list[tuple[ProductDefinition, str]]:
+        jobs: list[tuple[ProductDefinition, str]] = []
+        for product in self._products():
+            for stage in product.stages:
+                if stage in YieldService.STAGES:
+                    jobs.append((product, stage))
+            jobs.append((product, WAT_STAGE_KEY))
+        return jobs
+
+    def run_once(self) -> list[RefreshStatus]:
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="prefetch") as pool:
+            futures = [pool.submit(self._refresh, product, stage) for product, stage in self.jobs()]
+            return [f.result() for f in futures]
+
+    def _refresh(self, product: ProductDefinition, stage: str) -> RefreshStatus:
+        if self.jitter_seconds and self._stop.wait(random.uniform(0, self.jitter_seconds)):
+            return self._status.get((product.name, stage)) or RefreshStatus(product.name, stage, None, None, None)
+        started = time.perf_counter()
+        try:
+            if stage == WAT_STAGE_KEY:
+                df: pd.DataFrame = self.wat_service.refresh_dataset(product.source_name)
+            else:
+                df = self.yield_service.refresh_dataset(product, stage)
+                if self.store is not None and not df.empty:
+                    self._materialize_rollups(product, stage, df)
+            status = RefreshStatus(
+                product=product.name,
+                stage=stage,
+                last_refresh=datetime.now(),
+                duration_seconds=time.perf_counter() - started,
+                rows=len(df),
+            )
+        except Exception as exc:  # noqa: BLE001 - 1品種の失敗で全体を止めない
+            previous = self._status.get((product.name, stage))
+            status = RefreshStatus(
+                product=product.name,
+                stage=stage,
+                last_refresh=previous.last_refresh if previous else None,
+                duration_seconds=time.perf_counter() - started,
+                rows=previous.rows if previous else None,
+                error=f"{type(exc).__name__}: {exc}",
+            )
+        with self._lock:
+            self._status[(product.name, stage)] = status
+        return status
+
+    def _materialize_rollups(self, product: ProductDefinition, stage: str, df: pd.DataFrame) -> None:
+        """ページと同じキーで開き、直前の版があれば差分でロールアップを更新する。"""
+        handle = self.store.open(
+            self.backend,
+            product.name,
+            stage,
+            lambda: self.yield_service.load_dataset(product, stage),
+            initial=lambda: df,
+        )
+        try:
+            handle.derived("rollups", YieldService.build_rollups, update=YieldService.update_rollups)
+        finally:
+            handle.release()
+
+    def status(self) -> list[RefreshStatus]:
+        with self._lock:
+            return sorted(self._status.values(), key=lambda s: (s.product, s.stage))
+
+
+_SCHEDULER: PrefetchScheduler | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def ensure_prefetch_scheduler(config: AppConfig) -> PrefetchScheduler | None:
+    """PREFETCH_INTERVAL_SECONDS > 0 ならプロセスで1つだけスケジューラを起動する。"""
+    global _SCHEDULER
+    if config.prefetch_interval_seconds <= 0:
+        return None
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            repo = create_repository(config)
+            snapshots = create_snapshot_store(config)
+            _SCHEDULER = PrefetchScheduler(
+                YieldService(repo, snapshots),
+                WATService(repo, snapshots),
+                interval_seconds=config.prefetch_interval_seconds,
+                concurrency=config.prefetch_concurrency,
+                jitter_seconds=config.prefetch_jitter_seconds,
+                store=get_dataset_store(config),
+                backend=config.database.backend,
+            )
+            _SCHEDULER.start()
+    return _SCHEDULER
+
+
+def get_prefetch_scheduler() -> PrefetchScheduler | None:
+    return _SCHEDULER
+
+
+__all__ = ["PrefetchScheduler", "RefreshStatus", "ensure_prefetch_scheduler", "get_prefetch_scheduler"]
@@ -0,0 +1,346 @@
+"""Yield サマリーを期間別・BulkID 別の部分集計（ロールアップ）から組み立てる。
+
+部分集計は指標ごとの (率の合計, 件数) と (ダイ数の合計, EffectiveNum の合計) で持つため、
+パーティション間で足し合わせて併合できる。前者からウエハ平均、後者からダイ加重の歩留まりを求める。
+データセットは Time の月でパーティションに分け、差分更新では行の内容が変わった月だけを集計し直す。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import ClassVar
+
+import numpy as np
+import pandas as pd
+
+# 集計粒度と Period の頻度（BulkID は期間ではなくロット単位）
+GRANULARITIES: dict[str, str | None] = {
+    "Daily": "D",
+    "Weekly": "W",
+    "Monthly": "M",
+    "Quarterly": "Q",
+    "BulkID": None,
+}
+GROUP_COLUMNS: dict[str, str] = {g: "BulkID" if freq is None else "Period" for g, freq in GRANULARITIES.items()}
+# mean: ウエハごとの率の単純平均 / weighted: ダイ数の合計 / EffectiveNum の合計
+AGGREGATION_MODES: tuple[str, ...] = ("mean", "weighted")
+WEIGHT_COLUMN = "EffectiveNum"
+# Time が欠けた行のパーティション（BulkID 別の集計にだけ含まれる）
+NO_TIME_PARTITION = -1
+
+
+def metric_columns(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if c.startswith("FAIL_BIN_") or c == "0_PASS"]
+
+
+def _times(df: pd.DataFrame) -> pd.Series:
+    times = df["Time"]
+    return times if pd.api.types.is_datetime64_any_dtype(times.dtype) else pd.to_datetime(times, errors="coerce")
+
+
+def _group_keys(df: pd.DataFrame, granularity: str) -> pd.Series:
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"未対応の集計粒度です: {granularity}")
+    freq = GRANULARITIES[granularity]
+    if freq is None:
+        return df["BulkID"]
+    return _times(df).dt.to_period(freq)
+
+
+@dataclass(frozen=True)
+class YieldCounts:
+    """ウエハごとの BIN ダイ数と EffectiveNum を float32 で持つ、率の列に付随する表現。
+
+    リポジトリの率は BIN ダイ数 / EffectiveNum * 100 なので、率 × EffectiveNum / 100 で元のダイ数に戻る
+    （float32 の率からでも相対誤差 1e-7 程度）。合計は float64 で取るため、件数の和は丸まらない。
+    EffectiveNum が欠けている・0 のウエハは effective = 0 とし、加重集計から除く。
+    """
+
+    metrics: list[str]
+    dies: np.ndarray
+    effective: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, metrics: list[str] | None = None) -> "YieldCounts":
+        if WEIGHT_COLUMN not in df.columns:
+            raise ValueError(f"{WEIGHT_COLUMN} 列が必要です。")
+        metrics = metric_columns(df) if metrics is None else metrics
+        effective = pd.to_numeric(df[WEIGHT_COLUMN], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        effective = np.where(np.isfinite(effective) & (effective > 0), effective, 0.0)
+        rates = np.nan_to_num(df[metrics].to_numpy(dtype=np.float64, na_value=np.nan))
+        dies = rates * (effective[:, None] / 100)
+        return cls(metrics=metrics, dies=dies.astype(np.float32), effective=effective.astype(np.float32))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.dies.nbytes + self.effective.nbytes)
+
+
+def _sum_levels(frame: pd.DataFrame | pd.Series, level: int | list[int]) -> pd.DataFrame | pd.Series:
+    return frame.fillna(0).groupby(level=level, sort=False).sum()
+
+
+@dataclass(frozen=True)
+class RollupPartial:
+    """(グループ × 指標) の率の合計・件数（NaN は数えない）と、ダイ数・EffectiveNum の合計。
+
+    partitions を渡して作ると index が (パーティション, グループ) の2段になり、
+    パーティション単位で差し替えたり、collapse でグループ単位に足し合わせたりできる。
+    EffectiveNum 列がないデータセットでは dies / effective は None（加重集計は不可）。
+    """
+
+    sums: pd.DataFrame
+    counts: pd.DataFrame
+    dies: pd.DataFrame | None = None
+    effective: pd.Series | None = None
+
+    @property
+    def weighted(self) -> bool:
+        return self.dies is not None
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        granularity: str,
+        metrics: list[str],
+        partitions: np.ndarray | None = None,
+        yield_counts: YieldCounts | None = None,
+    ) -> "RollupPartial":
+        """yield_counts を渡すと、複数の粒度で作るときにダイ数の復元を使い回せる。"""
+        # 率・ダイ数・EffectiveNum を1ブロックの float64 に並べ、1回の groupby で合計する
+        k = len(metrics)
+        blocks = [df[metrics].to_numpy(dtype=np.float64, na_value=np.nan)]
+        if yield_counts is None and WEIGHT_COLUMN in df.columns:
+            yield_counts = YieldCounts.from_frame(df, metrics)
+        if yield_counts is not None:
+            blocks += [yield_counts.dies, yield_counts.effective[:, None]]
+        values = pd.DataFrame(np.hstack(blocks) if len(blocks) > 1 else blocks[0])
+        keys = pd.Series(_group_keys(df, granularity).array, name=GROUP_COLUMNS[granularity])
+        grouped = values.groupby(keys if partitions is None else [partitions, keys], observed=True, sort=False)
+        totals = grouped.sum()
+        sums = totals.iloc[:, :k].set_axis(metrics, axis=1)
+        counts = grouped[list(range(k))].count().set_axis(metrics, axis=1)
+        if len(blocks) == 1:
+            return cls(sums=sums, counts=counts)
+        return cls(
+            sums=sums,
+            counts=counts,
+            dies=totals.iloc[:, k : 2 * k].set_axis(metrics, axis=1),
+            effective=totals.iloc[:, 2 * k].rename(WEIGHT_COLUMN),
+        )
+
+    @classmethod
+    def concat(cls, partials: list["RollupPartial"]) -> "RollupPartial":
+        """部分集計を行方向に連結する（同じグループの行は併合しない）。"""
+        weighted = all(p.weighted for p in partials)
+        return cls(
+            sums=pd.concat([p.sums for p in partials]),
+            counts=pd.concat([p.counts for p in partials]),
+            dies=pd.concat([p.dies for p in partials]) if weighted else None,
+            effective=pd.concat([p.effective for p in partials]) if weighted else None,
+        )
+
+    @classmethod
+    def merge(cls, partials: list["RollupPartial"]) -> "RollupPartial":
+        """同じ粒度の部分集計を足し合わせる（同じグループが複数の部分集計にまたがってもよい）。"""
+        if len(partials) == 1:
+            return partials[0]
+        return cls.concat(partials)._sum_over(list(range(partials[0].sums.index.nlevels)))
+
+    def _sum_over(self, level: int | list[int]) -> "RollupPartial":
+        return RollupPartial(
+            sums=_sum_levels(self.sums, level),
+            counts=_sum_levels(self.counts, level).astype(np.int64),
+            dies=None if self.dies is None else _sum_levels(self.dies, level),
+            effective=None if self.effective is None else _sum_levels(self.effective, level),
+        )
+
+    def only_partitions(self, keep: list[int]) -> "RollupPartial":
+        mask = self.sums.index.get_level_values(0).isin(keep)
+        return RollupPartial(
+            sums=self.sums[mask],
+            counts=self.counts[mask],
+            dies=None if self.dies is None else self.dies[mask],
+            effective=None if self.effective is None else self.effective[mask],
+        )
+
+    def collapse(self) -> "RollupPartial":
+        """パーティションの段を足し合わせ、グループ単位の部分集計にする。"""
+        if self.sums.index.nlevels == 1:
+            return self
+        return self._sum_over(-1)
+
+    def summary(self, granularity: str, metrics: list[str], mode: str = "mean") -> pd.DataFrame:
+        """グループごとの指標（mean: 率の合計 / 件数、weighted: ダイ数 / EffectiveNum * 100）と Category 列。"""
+        if mode not in AGGREGATION_MODES:
+            raise ValueError(f"未対応の集計方法です: {mode}")
+        group_col = GROUP_COLUMNS[granularity]
+        if mode == "weighted":
+            if self.dies is None:
+                raise ValueError(f"{WEIGHT_COLUMN} 列がないためダイ加重では集計できません。")
+            numerator = self.dies.reindex(columns=metrics).sort_index()
+            denominator = np.repeat(
+                self.effective.reindex(numerator.index).to_numpy(dtype=np.float64, na_value=0.0)[:, None] / 100,
+                len(metrics),
+                axis=1,
+            )
+        else:
+            numerator = self.sums.reindex(columns=metrics).sort_index()
+            denominator = self.counts.reindex(index=numerator.index, columns=metrics).to_numpy(
+                dtype=np.float64, na_value=0.0
+            )
+        values = np.divide(
+            numerator.to_numpy(dtype=np.float64, na_value=0.0),
+            denominator,
+            out=np.full(denominator.shape, np.nan),
+            where=denominator > 0,
+        )
+        out = pd.DataFrame(values, index=numerator.index, columns=metrics).rename_axis(group_col).reset_index()
+        out["Category"] = _categories(out[group_col], granularity)
+        return out
+
+
+def _categories(keys: pd.Series, granularity: str) -> pd.Series:
+    if granularity == "Weekly":
+        iso = keys.dt.to_timestamp().dt.isocalendar()
+        return iso["year"].astype(str) + "WW" + iso["week"].astype(str).str.zfill(2)
+    if granularity == "Monthly":
+        return keys.dt.month.astype(str) + "月"
+    return keys.astype(str)
+
+
+def summarize(df: pd.DataFrame, granularity: str, mode: str = "mean") -> pd.DataFrame:
+    """ロールアップを作らずに1粒度だけ集計する（単発の集計・比較用）。"""
+    metrics = metric_columns(df)
+    return RollupPartial.from_frame(df, granularity, metrics).summary(granularity, metrics, mode)
+
+
+def _month_codes(df: pd.DataFrame) -> np.ndarray:
+    times = _times(df)
+    codes = (times.dt.year * 12 + times.dt.month - 1).to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isnan(codes), NO_TIME_PARTITION, codes).astype(np.int64)
+
+
+def _fingerprints(df: pd.DataFrame, codes: np.ndarray) -> dict[int, tuple[int, int]]:
+    """月ごとの (行数, 全列の行ハッシュの和)。どのセルが変わっても、その月だけ集計し直す。
+
+    和は 2^64 で折り返す順序によらない値なので、行の並び替えでは変わらない。
+    """
+    if not len(df):
+        return {}
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sums = np.add.reduceat(hashes[order], starts)
+    rows = np.diff(np.r_[starts, len(df)])
+    return {
+        int(code): (int(count), int(total))
+        for code, count, total in zip(sorted_codes[starts], rows, sums)
+    }
+
+
+@dataclass
+class YieldRollups:
+    """1データセット分の全粒度（D/W/M/Q/BulkID）のサマリーを保持する。
+
+    部分集計は (月パーティション, グループ) 単位で持ち、差分更新では内容の変わった月の行だけを
+    集計し直して差し替える。併合したサマリーは作成時に実体化するため、粒度の切り替えは
+    作成済みの表を返すだけで済む。
+    """
+
+    GRANULARITIES: ClassVar[tuple[str, ...]] = tuple(GRANULARITIES)
+
+    metrics: list[str]
+    rows: int
+    fingerprints: dict[int, tuple[int, int]] = field(repr=False)
+    partials: dict[str, RollupPartial] = field(repr=False)
+    summaries: dict[tuple[str, str], pd.DataFrame] = field(repr=False)
+    # 直近の作成・更新で集計し直した月パーティション数
+    rebuilt: int = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, previous: "YieldRollups | None" = None) -> "YieldRollups":
+        """previous を渡すと、行の内容が変わっていない月の部分集計を再利用する。"""
+        metrics = metric_columns(df)
+        granularities = [g for g in GRANULARITIES if GRANULARITIES[g] is not None or "BulkID" in df.columns]
+        weighted = WEIGHT_COLUMN in df.columns
+        if previous is not None and (
+            previous.metrics != metrics or set(previous.partials) != set(granularities) or previous.weighted != weighted
+        ):
+            previous = None
+        codes = _month_codes(df) if "Time" in df.columns else np.full(len(df), NO_TIME_PARTITION, dtype=np.int64)
+        fingerprints = _fingerprints(df, codes)
+        kept = [
+            code
+            for code, fingerprint in fingerprints.items()
+            if previous is not None and previous.fingerprints.get(code) == fingerprint
+        ]
+        if previous is not None and len(kept) == len(fingerprints) == len(previous.fingerprints):
+            return cls(metrics, len(df), fingerprints, previous.partials, previous.summaries, rebuilt=0)
+
+        if kept:
+            changed = ~np.isin(codes, kept)
+            fresh_df, fresh_codes = df[changed], codes[changed]
+        else:
+            fresh_df, fresh_codes = df, codes
+        partials: dict[str, RollupPartial] = {}
+        summaries: dict[tuple[str, str], pd.DataFrame] = {}
+        modes = AGGREGATION_MODES if weighted else ("mean",)
+        yield_counts = YieldCounts.from_frame(fresh_df, metrics) if weighted else None
+        for granularity in granularities:
+            partial = RollupPartial.from_frame(
+                fresh_df, granularity, metrics, partitions=fresh_codes, yield_counts=yield_counts
+            )
+            if kept:
+                partial = RollupPartial.concat([previous.partials[granularity].only_partitions(kept), partial])
+            partials[granularity] = partial
+            collapsed = partial.collapse()
+            for mode in modes:
+                summaries[(granularity, mode)] = collapsed.summary(granularity, metrics, mode)
+        return cls(metrics, len(df), fingerprints, partials, summaries, rebuilt=len(fingerprints) - len(kept))
+
+    def update(self, df: pd.DataFrame) -> "YieldRollups":
+        """新しい版のデータセットに合わせ、変わった月だけ集計し直したロールアップを返す。"""
+        return YieldRollups.from_frame(df, previous=self)
+
+    @property
+    def nbytes(self) -> int:
+        """部分集計と実体化したサマリーのバイト数。"""
+        frames: list[pd.DataFrame | pd.Series] = list(self.summaries.values())
+        for partial in self.partials.values():
+            frames += [f for f in (partial.sums, partial.counts, partial.dies, partial.effective) if f is not None]
+        return sum(int(f.memory_usage(index=True, deep=True).sum()) for f in frames)
+
+    @property
+    def weighted(self) -> bool:
+        """ダイ加重の集計ができるか（元のデータセットに EffectiveNum 列があったか）。"""
+        return all(p.weighted for p in self.partials.values())
+
+    def partial(self, granularity: str) -> RollupPartial:
+        """グループ単位に足し合わせた部分集計（他のデータセットの部分集計と merge できる）。"""
+        return self.partials[granularity].collapse()
+
+    def summary(self, granularity: str, mode: str = "mean") -> pd.DataFrame:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"未対応の集計粒度です: {granularity}")
+        if mode not in AGGREGATION_MODES:
+            raise ValueError(f"未対応の集計方法です: {mode}")
+        if mode == "weighted" and not self.weighted:
+            raise ValueError(f"{WEIGHT_COLUMN} 列がないためダイ加重では集計できません。")
+        table = self.summaries.get((granularity, mode))
+        if table is None:
+            return pd.DataFrame()
+        return table.copy(deep=False)
+
+
+__all__ = [
+    "AGGREGATION_MODES",
+    "GRANULARITIES",
+    "RollupPartial",
+    "YieldCounts",
+    "YieldRollups",
+    "metric_columns",
+    "summarize",
+]
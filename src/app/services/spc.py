@@ -0,0 +1,312 @@
+"""WAT 全パラメータの BulkID 別 SPC 統計を一括で計算するエンジン。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from ..data.cache import frame_nbytes
+from ..specs import CompiledSpecs, limits_table
+
+# I-MR 管理図の d2 定数（サブグループサイズ 2）
+D2_CONSTANT = 1.128
+MOVING_AVERAGE_WINDOW = 3
+# Spec に stage 列がある場合に WAT 用として優先する工程名
+WAT_SPEC_STAGE = "WAT"
+WAT_ID_COLUMNS: frozenset[str] = frozenset({"Product", "BulkID", "WaferID", "DieX", "DieY", "Site", "Time"})
+
+# SPCResult.bulk の列（Parameter, BulkID ごとに1行）
+BULK_COLUMNS: tuple[str, ...] = (
+    "Parameter",
+    "BulkID",
+    "Time",
+    "seq",
+    "mean_val",
+    "std_val",
+    "count",
+    "moving_avg",
+    "avg_mr",
+    "CL",
+    "UCL",
+    "LCL",
+    "USL",
+    "LSL",
+)
+
+
+@dataclass(frozen=True)
+class ControlRule:
+    """BulkID 平均系列に対する Western Electric / Nelson ルール。"""
+
+    code: str
+    description: str
+    window: int
+    min_hits: int
+    kind: str  # "beyond": |z| が threshold 超（同じ側）/ "trend": 単調増加・減少
+    threshold: float = 0.0
+    weight: float = 1.0
+
+
+RULES: tuple[ControlRule, ...] = (
+    ControlRule("WE1", "1点が ±3σ 外", window=1, min_hits=1, kind="beyond", threshold=3.0, weight=4.0),
+    ControlRule("WE2", "連続3点中2点が同じ側の ±2σ 外", window=3, min_hits=2, kind="beyond", threshold=2.0, weight=3.0),
+    ControlRule("WE3", "連続5点中4点が同じ側の ±1σ 外", window=5, min_hits=4, kind="beyond", threshold=1.0, weight=2.0),
+    ControlRule("WE4", "連続8点が中心線の同じ側", window=8, min_hits=8, kind="beyond", threshold=0.0, weight=2.0),
+    ControlRule("N3", "連続6点が単調増加または単調減少", window=6, min_hits=6, kind="trend", weight=1.5),
+)
+RULE_CODES: tuple[str, ...] = tuple(rule.code for rule in RULES)
+
+
+def parameter_columns(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if c not in WAT_ID_COLUMNS]
+
+
+def imr_limits(center: pd.Series, avg_mr: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """CL ± 3·MR̄/d2。移動範囲が得られない（1点のみ・ばらつき0）場合は CL を返す。"""
+    half_width = 3 * avg_mr.fillna(0.0) / D2_CONSTANT
+    return center + half_width, center - half_width
+
+
+def individual_limits(values: pd.Series) -> tuple[float, float, float]:
+    """1系列の行順の移動範囲から I チャートの (CL, UCL, LCL) を求める。"""
+    values = pd.to_numeric(values, errors="coerce")
+    center = pd.Series([values.mean()])
+    avg_mr = pd.Series([values.diff().abs().mean()])
+    ucl, lcl = imr_limits(center, avg_mr)
+    return float(center.iloc[0]), float(ucl.iloc[0]), float(lcl.iloc[0])
+
+
+def _none_if_nan(value: object) -> float | None:
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
+
+
+@dataclass
+class SPCResult:
+    """compute_bulk_spc の結果。
+
+    bulk: (Parameter, BulkID) ごとの平均・標準偏差・件数・移動平均・I-MR 管理限界・規格値。
+    summary: Parameter ごとの BulkID 平均系列に対する中心線・σ・管理限界・規格値。
+    """
+
+    bulk: pd.DataFrame
+    summary: pd.DataFrame
+    _by_parameter: dict[str, pd.DataFrame] | None = field(default=None, init=False, repr=False)
+
+    @property
+    def parameters(self) -> list[str]:
+        return list(self.summary.index)
+
+    @property
+    def nbytes(self) -> int:
+        """表と、trend() が作ったパラメータ別の分割結果を合わせたバイト数。"""
+        frames = [self.bulk, self.summary, *(self._by_parameter or {}).values()]
+        return sum(frame_nbytes(frame) for frame in frames)
+
+    def trend(self, parameter: str) -> pd.DataFrame:
+        """build_bulk_trend_chart がそのまま読める、時系列順の1パラメータ分。"""
+        if self._by_parameter is None:
+            self._by_parameter = {
+                str(name): group.reset_index(drop=True)
+                for name, group in self.bulk.groupby("Parameter", sort=False, observed=True)
+            }
+        return self._by_parameter.get(parameter, pd.DataFrame(columns=list(BULK_COLUMNS)))
+
+    def control_limits(self, parameter: str, bulk_id: object) -> tuple[float, float, float] | None:
+        """BulkID 内の個別値に対する (CL, UCL, LCL)。"""
+        trend = self.trend(parameter)
+        row = trend[trend["BulkID"] == bulk_id]
+        if row.empty:
+            return None
+        cl, ucl, lcl = row.iloc[0][["CL", "UCL", "LCL"]]
+        return float(cl), float(ucl), float(lcl)
+
+    def spec_limits(self, parameter: str) -> tuple[float | None, float | None]:
+        if parameter not in self.summary.index:
+            return None, None
+        row = self.summary.loc[parameter]
+        return _none_if_nan(row["USL"]), _none_if_nan(row["LSL"])
+
+
+def compute_bulk_spc(
+    df: pd.DataFrame,
+    parameters: Iterable[str] | None = None,
+    spec_df: pd.DataFrame | CompiledSpecs | None = None,
+    *,
+    window: int = MOVING_AVERAGE_WINDOW,
+) -> SPCResult:
+    """全パラメータ分の BulkID 集計・移動平均・I-MR 限界・規格値を1回の groupby で求める。
+
+    BulkID 内の管理限界は individual_limits と同じく、行順の移動範囲の平均から求める。
+    """
+    params = list(parameters) if parameters is not None else parameter_columns(df)
+    params = [p for p in params if p in df.columns]
+    if df.empty or not params or "BulkID" not in df.columns:
+        empty_summary = pd.DataFrame(columns=["n_bulks", "center", "sigma", "UCL", "LCL", "USL", "LSL"])
+        empty_summary.index.name = "Parameter"
+        return SPCResult(pd.DataFrame(columns=list(BULK_COLUMNS)), empty_summary)
+
+    values = df[params]
+    keys = df["BulkID"]
+    # BulkID はカテゴリ型で届くため、観測されたロットだけを集計する
+    grouped = values.groupby(keys, sort=True, observed=True)
+    mean = grouped.mean()
+    std = grouped.std()
+    count = grouped.count()
+    avg_mr = values.groupby(keys, sort=False, observed=True).diff().abs().groupby(keys, sort=True, observed=True).mean()
+
+    if "Time" in df.columns:
+        first_time = df["Time"].groupby(keys, sort=True, observed=True).first()
+        order = first_time.sort_values(kind="stable").index
+    else:
+        first_time = pd.Series(pd.NaT, index=mean.index)
+        order = mean.index
+    mean, std, count, avg_mr = (frame.reindex(order) for frame in (mean, std, count, avg_mr))
+    moving = mean.rolling(window=window, min_periods=1).mean()
+
+    stats = pd.concat(
+        {"mean_val": mean, "std_val": std, "count": count, "moving_avg": moving, "avg_mr": avg_mr},
+        axis=1,
+    )
+    stats.columns.names = ["stat", "Parameter"]
+    bulk = stats.stack(level="Parameter", future_stack=True).reset_index()
+    bulk["Parameter"] = pd.Categorical(bulk["Parameter"], categories=params)
+    seq = pd.Series(np.arange(len(order)), index=order)
+    bulk["seq"] = bulk["BulkID"].map(seq).to_numpy()
+    bulk["Time"] = bulk["BulkID"].map(first_time).to_numpy()
+    bulk["count"] = bulk["count"].fillna(0).astype(int)
+    bulk = bulk.sort_values(["Parameter", "seq"], kind="stable").reset_index(drop=True)
+    bulk["CL"] = bulk["mean_val"]
+    bulk["UCL"], bulk["LCL"] = imr_limits(bulk["CL"], bulk["avg_mr"])
+
+    # BulkID 平均系列（欠測を詰めた順序）に対する管理限界
+    seq_means = mean.stack(future_stack=False)
+    seq_mr = seq_means.groupby(level=1, sort=False).diff().abs().groupby(level=1, sort=False).mean()
+    summary = pd.DataFrame(
+        {
+            "n_bulks": mean.count(),
+            "center": mean.mean(),
+            "avg_mr": seq_mr.reindex(params),
+        }
+    )
+    summary.index.name = "Parameter"
+    summary["sigma"] = summary["avg_mr"] / D2_CONSTANT
+    summary["UCL"], summary["LCL"] = imr_limits(summary["center"], summary["avg_mr"])
+
+    limits = limits_table(spec_df, stage=WAT_SPEC_STAGE)
+    summary["USL"] = limits["USL"].reindex(summary.index).to_numpy()
+    summary["LSL"] = limits["LSL"].reindex(summary.index).to_numpy()
+    bulk["USL"] = bulk["Parameter"].map(summary["USL"]).astype(float)
+    bulk["LSL"] = bulk["Parameter"].map(summary["LSL"]).astype(float)
+
+    return SPCResult(bulk[list(BULK_COLUMNS)], summary.drop(columns=["avg_mr"]))
+
+
+def _window_count(mask: np.ndarray, window: int) -> np.ndarray:
+    """各行で終わる直近 window 行（列ごと）の True の個数。"""
+    if window == 1:
+        return mask.astype(np.int32)
+    csum = np.cumsum(mask, axis=0, dtype=np.int32)
+    shifted = np.zeros_like(csum)
+    shifted[window:] = csum[:-window]
+    return csum - shifted
+
+
+def _packed_z_scores(result: SPCResult) -> tuple[np.ndarray, np.ndarray, list[str], pd.DataFrame]:
+    """BulkID 平均を (系列位置 × パラメータ) の z 行列にし、列ごとに欠測を末尾へ詰める。
+
+    欠測 BulkID を飛ばした系列で連続性を判定するため、order[i, j] に元の系列位置を保持する。
+    """
+    means = result.bulk.pivot(index="seq", columns="Parameter", values="mean_val")
+    means.columns = [str(c) for c in means.columns]
+    summary = result.summary.reindex(means.columns)
+    sigma = summary["sigma"].to_numpy(dtype=float)
+    sigma = np.where(sigma > 0, sigma, np.nan)
+    z = (means.to_numpy(dtype=float) - summary["center"].to_numpy(dtype=float)) / sigma
+    order = np.argsort(np.isnan(z), axis=0, kind="stable")
+    bulks = result.bulk.drop_duplicates("seq").set_index("seq")[["BulkID", "Time"]].reindex(means.index)
+    return np.take_along_axis(z, order, axis=0), order, list(means.columns), bulks
+
+
+def detect_rule_violations(result: SPCResult, rules: Iterable[ControlRule] = RULES) -> pd.DataFrame:
+    """全パラメータの BulkID 平均系列にルールを適用し、違反点（ウィンドウ末尾の BulkID）を返す。"""
+    columns = ["Parameter", "BulkID", "Time", "seq", "rule", "description", "weight", "z"]
+    if result.bulk.empty:
+        return pd.DataFrame(columns=columns)
+    z, order, params, bulks = _packed_z_scores(result)
+    valid = ~np.isnan(z)
+    frames: list[pd.DataFrame] = []
+    for rule in rules:
+        if rule.kind == "trend":
+            step = np.diff(z, axis=0, prepend=np.nan)
+            hits = (_window_count(step > 0, rule.window - 1) >= rule.window - 1) | (
+                _window_count(step < 0, rule.window - 1) >= rule.window - 1
+            )
+        else:
+            hits = (_window_count(z > rule.threshold, rule.window) >= rule.min_hits) | (
+                _window_count(z < -rule.threshold, rule.window) >= rule.min_hits
+            )
+        rows, cols = np.nonzero(hits & valid)
+        if rows.size == 0:
+            continue
+        seq_pos = order[rows, cols]
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Parameter": np.asarray(params, dtype=object)[cols],
+                    "BulkID": bulks["BulkID"].to_numpy()[seq_pos],
+                    "Time": bulks["Time"].to_numpy()[seq_pos],
+                    "seq": bulks.index.to_numpy()[seq_pos],
+                    "rule": rule.code,
+                    "description": rule.description,
+                    "weight": rule.weight,
+                    "z": z[rows, cols],
+                }
+            )
+        )
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True).sort_values(["Parameter", "seq", "rule"], ignore_index=True)
+
+
+def rank_violations(violations: pd.DataFrame, result: SPCResult | None = None) -> pd.DataFrame:
+    """パラメータごとに違反を集計し、重み付きスコア・直近の違反時刻の順に並べる。"""
+    if violations.empty:
+        return pd.DataFrame(columns=["Parameter", "score", "violations", "last_bulk", "last_time", *RULE_CODES])
+    by_rule = violations.pivot_table(index="Parameter", columns="rule", values="seq", aggfunc="size", fill_value=0)
+    by_rule = by_rule.reindex(columns=list(RULE_CODES), fill_value=0)
+    latest = violations.sort_values("seq").groupby("Parameter").tail(1).set_index("Parameter")
+    ranked = pd.DataFrame(
+        {
+            "score": violations.groupby("Parameter")["weight"].sum(),
+            "violations": violations.groupby("Parameter").size(),
+            "last_bulk": latest["BulkID"],
+            "last_time": latest["Time"],
+        }
+    ).join(by_rule)
+    if result is not None and "n_bulks" in result.summary.columns:
+        # 系列の長さが違っても比較できるように、BulkID 数あたりの比率で並べる
+        ranked["score"] = ranked["score"] / result.summary["n_bulks"].reindex(ranked.index).clip(lower=1)
+    ranked = ranked.sort_values(["score", "last_time"], ascending=[False, False])
+    ranked.index.name = "Parameter"
+    return ranked.reset_index()
+
+
+__all__ = [
+    "BULK_COLUMNS",
+    "ControlRule",
+    "RULES",
+    "RULE_CODES",
+    "D2_CONSTANT",
+    "SPCResult",
+    "compute_bulk_spc",
+    "detect_rule_violations",
+    "imr_limits",
+    "individual_limits",
+    "parameter_columns",
+    "rank_violations",
+]
@@ -0,0 +1,226 @@
+"""WAT 縦持ちデータをウエハごとの (DieY, DieX) 密行列にまとめたウエハマップ表現。"""
+
+from __future__ import annotations
+
+import threading
+import warnings
+from dataclasses import dataclass, field
+from typing import Hashable
+
+import numpy as np
+import pandas as pd
+
+from .spc import parameter_columns
+
+WAFER_KEY_COLUMNS: tuple[str, ...] = ("BulkID", "WaferID")
+# スタックマップで選べる統計量（fail_rate は規格外となったウエハの割合）
+STACK_STATISTICS: tuple[str, ...] = ("mean", "median", "sigma", "fail_rate", "count")
+
+
+def _die_axis(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(軸の座標, 各行の軸上の位置)。整数座標は欠けた列・行も含む連続した範囲にする。"""
+    numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    finite = numeric[np.isfinite(numeric)]
+    if finite.size and np.all(finite == np.round(finite)):
+        low, high = int(finite.min()), int(finite.max())
+        axis = np.arange(low, high + 1)
+        codes = np.where(np.isfinite(numeric), numeric - low, -1).astype(np.int64)
+        return axis, codes
+    codes, axis = pd.factorize(numeric, sort=True, use_na_sentinel=True)
+    return np.asarray(axis, dtype=np.float64), codes.astype(np.int64)
+
+
+def stack_wafer_maps(
+    layers: np.ndarray,
+    statistic: str = "mean",
+    *,
+    usl: float | None = None,
+    lsl: float | None = None,
+) -> np.ndarray:
+    """(ウエハ, DieY, DieX) をウエハ軸方向に1回の配列演算で (DieY, DieX) へ縮約する。
+
+    NaN（未測定）はダイごとに除外する。どのウエハでも未測定のダイは NaN のまま残す。
+    """
+    if statistic not in STACK_STATISTICS:
+        raise ValueError(f"未対応の統計量です: {statistic}")
+    layers = np.asarray(layers, dtype=np.float64)
+    measured = np.isfinite(layers)
+    counts = measured.sum(axis=0)
+    has_data = counts > 0
+    if statistic == "count":
+        return np.where(has_data, counts, np.nan)
+    if statistic == "fail_rate":
+        with np.errstate(invalid="ignore"):
+            failed = np.zeros(layers.shape, dtype=bool)
+            if usl is not None:
+                failed |= layers > usl
+            if lsl is not None:
+                failed |= layers < lsl
+        rate = failed.sum(axis=0) / np.maximum(counts, 1)
+        return np.where(has_data, rate * 100, np.nan)
+    # 全ウエハ未測定のダイで出る "empty slice" 警告は NaN を返すだけなので抑止する
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if statistic == "mean":
+            return np.nanmean(layers, axis=0)
+        if statistic == "median":
+            return np.nanmedian(layers, axis=0)
+        return np.nanstd(layers, axis=0, ddof=1)
+
+
+@dataclass
+class WaferGrid:
+    """ウエハ × DieY × DieX の密な配列でパラメータ値を保持する。
+
+    データセットごとに1度だけ座標を因子化し、パラメータの3次元配列は初回参照時に
+    np.bincount で作ってキャッシュする。以降のウエハ・パラメータ切り替えは配列の添字参照のみ。
+    ウエハ上に存在しない (DieY, DieX) は NaN で、off_wafer マスクで判別できる。
+    """
+
+    frame: pd.DataFrame
+    wafers: pd.DataFrame
+    x: np.ndarray
+    y: np.ndarray
+    present: np.ndarray
+    _cells: np.ndarray = field(repr=False)
+    _positions: dict[Hashable, int] = field(repr=False)
+    _layers: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "WaferGrid":
+        keys = [c for c in WAFER_KEY_COLUMNS if c in df.columns]
+        if "WaferID" not in keys or "DieX" not in df.columns or "DieY" not in df.columns:
+            raise ValueError("WaferID / DieX / DieY 列が必要です。")
+        x, x_codes = _die_axis(df["DieX"])
+        y, y_codes = _die_axis(df["DieY"])
+        # ウエハは初出順ではなく (Time, BulkID, WaferID) 順に並べる
+        order_cols = (["Time"] if "Time" in df.columns else []) + keys
+        wafers = (
+            df[order_cols].drop_duplicates(keys).sort_values(order_cols, kind="stable").reset_index(drop=True)
+        )
+        wafer_index = pd.MultiIndex.from_frame(wafers[keys]) if len(keys) > 1 else pd.Index(wafers["WaferID"])
+        row_keys = pd.MultiIndex.from_frame(df[keys]) if len(keys) > 1 else pd.Index(df["WaferID"])
+        wafer_codes = wafer_index.get_indexer(row_keys).astype(np.int64)
+
+        valid = (wafer_codes >= 0) & (x_codes >= 0) & (y_codes >= 0)
+        n_cells = len(y) * len(x)
+        cells = np.where(valid, wafer_codes * n_cells + y_codes * len(x) + x_codes, -1)
+        present = np.bincount(cells[valid], minlength=len(wafers) * n_cells) > 0
+
+        positions: dict[Hashable, int] = {}
+        wafer_ids = wafers["WaferID"].tolist()
+        if len(keys) > 1:
+            positions.update({key: i for i, key in enumerate(wafer_index)})
+        # WaferID が一意なら WaferID 単独でも引けるようにする
+        if len(set(wafer_ids)) == len(wafer_ids):
+            positions.update({wafer: i for i, wafer in enumerate(wafer_ids)})
+        return cls(
+            frame=df,
+            wafers=wafers,
+            x=x,
+            y=y,
+            present=present.reshape(len(wafers), len(y), len(x)),
+            _cells=cells,
+            _positions=positions,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """座標・マスク・作成済みレイヤーのバイト数（元の DataFrame は含めない）。"""
+        arrays = [self.x, self.y, self.present, self._cells, *self._layers.values()]
+        return sum(a.nbytes for a in arrays) + int(self.wafers.memory_usage(index=True, deep=True).sum())
+
+    @property
+    def n_wafers(self) -> int:
+        return len(self.wafers)
+
+    @property
+    def off_wafer(self) -> np.ndarray:
+        """(DieY, DieX) の2次元マスク。どのウエハでも測定されていない座標が True。"""
+        return ~self.present.any(axis=0)
+
+    @property
+    def parameters(self) -> list[str]:
+        return parameter_columns(self.frame)
+
+    def position(self, wafer_id: Hashable, bulk_id: Hashable | None = None) -> int:
+        key = wafer_id if bulk_id is None else (bulk_id, wafer_id)
+        try:
+            return self._positions[key]
+        except KeyError:
+            raise KeyError(f"ウエハが見つかりません: {key!r}") from None
+
+    def layer(self, parameter: str) -> np.ndarray:
+        """(ウエハ, DieY, DieX) の値配列。同じダイの重複測定は平均する。"""
+        cached = self._layers.get(parameter)
+        if cached is not None:
+            return cached
+        if parameter not in self.frame.columns:
+            raise KeyError(parameter)
+        values = pd.to_numeric(self.frame[parameter], errors="coerce").to_numpy(dtype=np.float64)
+        valid = (self._cells >= 0) & np.isfinite(values)
+        size = self.present.size
+        sums = np.bincount(self._cells[valid], weights=values[valid], minlength=size)
+        counts = np.bincount(self._cells[valid], minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            layer = np.where(counts > 0, sums / counts, np.nan).reshape(self.present.shape)
+        layer.setflags(write=False)
+        with self._lock:
+            self._layers.setdefault(parameter, layer)
+        return self._layers[parameter]
+
+    def die_map(self, parameter: str, position: int) -> np.ndarray:
+        """1ウエハ分の (DieY, DieX) 行列（layer のビュー）。"""
+        return self.layer(parameter)[position]
+
+    def positions(
+        self,
+        *,
+        bulk_id: Hashable | None = None,
+        start: object | None = None,
+        end: object | None = None,
+    ) -> np.ndarray:
+        """BulkID や Time の範囲（両端含む）に該当するウエハ位置。指定がなければ全ウエハ。"""
+        keep = np.ones(self.n_wafers, dtype=bool)
+        if bulk_id is not None and "BulkID" in self.wafers.columns:
+            keep &= (self.wafers["BulkID"] == bulk_id).to_numpy()
+        if "Time" in self.wafers.columns and (start is not None or end is not None):
+            times = pd.to_datetime(self.wafers["Time"])
+            if start is not None:
+                keep &= (times >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                keep &= (times <= pd.Timestamp(end)).to_numpy()
+        return np.flatnonzero(keep)
+
+    def stack(
+        self,
+        parameter: str,
+        statistic: str = "mean",
+        positions: np.ndarray | None = None,
+        *,
+        usl: float | None = None,
+        lsl: float | None = None,
+    ) -> np.ndarray:
+        """指定ウエハ（省略時は全ウエハ）のダイごとの平均・中央値・σ・不良率などの合成マップ。"""
+        layer = self.layer(parameter)
+        return stack_wafer_maps(layer if positions is None else layer[positions], statistic, usl=usl, lsl=lsl)
+
+    def wafer_label(self, position: int) -> str:
+        row = self.wafers.iloc[position]
+        return f"{row['WaferID']} ({row['BulkID']})" if "BulkID" in row.index else str(row["WaferID"])
+
+    def die_frame(self, parameter: str, position: int) -> pd.DataFrame:
+        """1ウエハ分の測定済みダイを DieX / DieY / 値の表にする（プレビュー表示用）。"""
+        z = self.die_map(parameter, position)
+        rows, cols = np.nonzero(self.present[position])
+        return pd.DataFrame({"DieX": self.x[cols], "DieY": self.y[rows], parameter: z[rows, cols]})
+
+    def value_range(self, parameter: str, position: int | None = None) -> tuple[float | None, float | None]:
+        values = self.layer(parameter) if position is None else self.die_map(parameter, position)
+        if not np.isfinite(values).any():
+            return (None, None)
+        return (float(np.nanmin(values)), float(np.nanmax(values)))
+
+
+__all__ = ["STACK_STATISTICS", "WAFER_KEY_COLUMNS", "WaferGrid", "stack_wafer_maps"]
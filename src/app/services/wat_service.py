@@ -3,25 +3,67 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import ClassVar
 
+import numpy as np
 import pandas as pd
 
-from ..data import DatabaseRepository
+from ..data import DatabaseRepository, SnapshotStore
+from ..data.cache import WAT_STAGE_KEY
+from ..data.progress import ProgressCallback
+from ..data.snapshots import WAT_KIND
+from ..specs import CompiledSpecs, extract_limits
+from .capability import CapabilityResult, compute_capability
+from .spc import (
+    WAT_SPEC_STAGE,
+    SPCResult,
+    compute_bulk_spc,
+    detect_rule_violations,
+    parameter_columns,
+    rank_violations,
+)
+from .wafer_grid import STACK_STATISTICS, WaferGrid
 
 
 @dataclass
 class WATService:
     repo: DatabaseRepository
+    snapshots: SnapshotStore | None = None
 
-    def load_dataset(self, product_name: str) -> pd.DataFrame:
-        return self.repo.load_wat_measurements(product_name)
+    STACK_STATISTICS: ClassVar[tuple[str, ...]] = STACK_STATISTICS
+    PARAMETER_ORDERS: ClassVar[tuple[str, ...]] = ("severity", "name", "original")
+
+    def load_dataset(self, product_name: str, progress: ProgressCallback | None = None) -> pd.DataFrame:
+        """progress を渡すとチャンク取得ごとに (処理済み行数, 見込み総数 or None) が通知される。"""
+        if self.snapshots is not None:
+            return self.snapshots.load(
+                WAT_KIND,
+                product_name,
+                WAT_STAGE_KEY,
+                lambda since: self.repo.load_wat_measurements(product_name, since=since, progress=progress),
+            )
+        return self.repo.load_wat_measurements(product_name, progress=progress)
+
+    def refresh_dataset(self, product_name: str) -> pd.DataFrame:
+        """キャッシュ/スナップショットを最新化してから返す（バックグラウンド更新用）。"""
+        refresh = getattr(self.repo, "refresh_wat_measurements", None)
+        if self.snapshots is None and refresh is not None:
+            refresh(product_name)
+        return self.load_dataset(product_name)
+
+    def list_wafer_index(self, product_name: str) -> pd.DataFrame:
+        """ウエハ選択用の (Product, BulkID, WaferID, Time) 一覧。測定値は読み込まない。"""
+        return self.repo.list_wat_wafers(product_name)
+
+    def load_lot(self, product_name: str, bulk_id: str, wafer_id: object | None = None) -> pd.DataFrame:
+        """選択された BulkID（またはその1ウエハ）だけをオンデマンドで取得する。"""
+        return self.repo.load_wat_lot(product_name, bulk_id, wafer_id)
 
     @staticmethod
     def available_parameters(df: pd.DataFrame) -> list[str]:
         if df.empty:
             return []
-        id_cols = {"Product", "BulkID", "WaferID", "DieX", "DieY", "Site", "Time"}
-        return [c for c in df.columns if c not in id_cols]
+        return parameter_columns(df)
 
     @staticmethod
     def list_wafers(df: pd.DataFrame) -> list[str]:
@@ -29,6 +71,28 @@ class WATService:
             return []
         return sorted(df["WaferID"].dropna().unique())
 
+    @staticmethod
+    def build_wafer_grid(df: pd.DataFrame) -> WaferGrid | None:
+        """ウエハ切り替えを配列参照で済ませるための密行列表現を作る（データセットごとに1度）。"""
+        if df.empty or not {"WaferID", "DieX", "DieY"} <= set(df.columns):
+            return None
+        return WaferGrid.from_frame(df)
+
+    @staticmethod
+    def composite_wafer_map(
+        grid: WaferGrid,
+        parameter: str,
+        statistic: str = "mean",
+        positions: np.ndarray | None = None,
+        specs: pd.DataFrame | CompiledSpecs | None = None,
+    ) -> np.ndarray:
+        """選択ウエハのダイごとの mean/median/sigma/fail_rate/count を一括で求める。
+
+        fail_rate は WAT 工程の USL/LSL の外に出たウエハの割合（%）。
+        """
+        usl, lsl = extract_limits(specs, parameter, stage=WAT_SPEC_STAGE)
+        return grid.stack(parameter, statistic, positions, usl=usl, lsl=lsl)
+
     @staticmethod
     def filter_by_wafer(df: pd.DataFrame, wafer_id: str) -> pd.DataFrame:
         if df.empty or "WaferID" not in df.columns:
@@ -44,15 +108,51 @@ class WATService:
             return (None, None)
         return (float(series.min()), float(series.max()))
 
+    @staticmethod
+    def compute_spc(
+        df: pd.DataFrame, specs: pd.DataFrame | CompiledSpecs | None = None, parameters: list[str] | None = None
+    ) -> SPCResult:
+        """全パラメータの BulkID 別統計・移動平均・I-MR 限界・規格値を一括で求める。"""
+        return compute_bulk_spc(df, parameters, specs)
+
+    @staticmethod
+    def compute_capability(df: pd.DataFrame, specs: pd.DataFrame | CompiledSpecs | None) -> CapabilityResult:
+        """全体・BulkID 別・月別の Cp/Cpk/Pp/Ppk を一括で求める。"""
+        return compute_capability(df, specs)
+
+    @staticmethod
+    def detect_violations(spc: SPCResult) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Western Electric / Nelson ルールの (違反点一覧, パラメータ別ランキング) を返す。"""
+        violations = detect_rule_violations(spc)
+        return violations, rank_violations(violations, spc)
+
+    @staticmethod
+    def order_parameters(
+        parameters: list[str],
+        ranking: pd.DataFrame,
+        *,
+        search: str = "",
+        order: str = "severity",
+        flagged_only: bool = False,
+    ) -> list[str]:
+        """検索語で絞り込み、SPC 違反スコア順・名前順・元の順序のいずれかに並べる。"""
+        flagged = list(ranking["Parameter"]) if not ranking.empty else []
+        if flagged_only:
+            candidates = flagged
+        elif order == "severity":
+            flagged_set = set(flagged)
+            candidates = flagged + [p for p in parameters if p not in flagged_set]
+        else:
+            candidates = list(parameters)
+        if order == "name":
+            candidates = sorted(candidates, key=str.lower)
+        needle = search.strip().lower()
+        if needle:
+            candidates = [p for p in candidates if needle in p.lower()]
+        return candidates
+
     @staticmethod
     def aggregate_bulk_trend(df: pd.DataFrame, parameter: str) -> pd.DataFrame:
         if df.empty or parameter not in df.columns:
             return pd.DataFrame()
-        agg = (
-            df.groupby("BulkID")
-            .agg(mean_val=(parameter, "mean"), Time=("Time", "first"))
-            .sort_values("Time")
-            .reset_index()
-        )
-        agg["moving_avg"] = agg["mean_val"].rolling(window=3, min_periods=1).mean()
-        return agg
+        return compute_bulk_spc(df, [parameter]).trend(parameter)
@@ -2,20 +2,36 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import ClassVar
+from typing import ClassVar, Iterable, Iterator
 
 import pandas as pd
 
-from ..data import DatabaseRepository
+from ..data import DatabaseRepository, SnapshotStore
+from ..data.schema import constant_category
+from ..data.snapshots import YIELD_KIND
 from ..products import ProductDefinition, find_product_definition, list_products
+from .rollup import AGGREGATION_MODES, YieldRollups, summarize
+
+
+@dataclass(frozen=True)
+class StageDataset:
+    """load_many が完了順に返す (product, stage) ごとの結果。"""
+
+    product: str
+    stage: str
+    data: pd.DataFrame
 
 
 @dataclass
 class YieldService:
     repo: DatabaseRepository
+    snapshots: SnapshotStore | None = None
+    max_workers: int = 4
 
     STAGES: ClassVar[tuple[str, str]] = ("CP", "FT")
+    AGGREGATION_MODES: ClassVar[tuple[str, ...]] = AGGREGATION_MODES
 
     def get_products(self, data_dir: str = "data") -> list[ProductDefinition]:
         """設定ファイル優先で品種リストを取得する。"""
@@ -32,54 +48,80 @@ class YieldService:
         if stage_upper not in self.STAGES:
             raise ValueError(f"Unsupported stage: {stage}")
         source_name = self._resolve_source_name(product)
-        df = self.repo.load_yield_overview(source_name, stage_upper)
+        if self.snapshots is not None:
+            df = self.snapshots.load(
+                YIELD_KIND,
+                source_name,
+                stage_upper,
+                lambda since: self.repo.load_yield_overview(source_name, stage_upper, since=since),
+                fill_value=0.0,
+            )
+        else:
+            df = self.repo.load_yield_overview(source_name, stage_upper)
         if df.empty:
             return df
         if "Time" in df.columns:
             df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
-        df["Stage"] = stage_upper
+        df["Stage"] = constant_category(stage_upper, len(df))
         return df
 
+    def refresh_dataset(self, product: ProductDefinition | str, stage: str = "CP") -> pd.DataFrame:
+        """キャッシュ/スナップショットを最新化してから返す（バックグラウンド更新用）。"""
+        refresh = getattr(self.repo, "refresh_yield_overview", None)
+        if self.snapshots is None and refresh is not None:
+            refresh(self._resolve_source_name(product), stage.upper())
+        return self.load_dataset(product, stage)
+
+    def load_many(
+        self,
+        products: Iterable[ProductDefinition | str],
+        stages: Iterable[str] | None = None,
+    ) -> Iterator[StageDataset]:
+        """複数の (product, stage) を並列に読み込み、完了した順に返す。
+
+        oracledb はネットワーク待ちの間 GIL を解放するため、プール接続上の
+        スレッド並列でクエリ待ち時間を重ねられる。同時実行数は `max_workers` で制限する。
+        """
+        stage_list = [s.upper() for s in (stages or self.STAGES)]
+        jobs: list[tuple[ProductDefinition | str, str]] = []
+        for product in products:
+            for stage in stage_list:
+                if isinstance(product, ProductDefinition) and not product.supports_stage(stage):
+                    continue
+                jobs.append((product, stage))
+        if not jobs:
+            return
+        workers = min(self.max_workers, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yield-load") as pool:
+            futures = {pool.submit(self.load_dataset, product, stage): (product, stage) for product, stage in jobs}
+            for future in as_completed(futures):
+                product, stage = futures[future]
+                name = product.name if isinstance(product, ProductDefinition) else str(product)
+                yield StageDataset(product=name, stage=stage, data=future.result())
+
     def load_all_stages(self, product: ProductDefinition | str) -> dict[str, pd.DataFrame]:
-        """CP/FT両方のDataFrameを返す。"""
-        return {stage: self.load_dataset(product, stage) for stage in self.STAGES}
+        """CP/FT両方のDataFrameを並列に取得して返す。"""
+        results = {item.stage: item.data for item in self.load_many([product], self.STAGES)}
+        return {stage: results[stage] for stage in self.STAGES if stage in results}
 
     @staticmethod
-    def build_summary(df: pd.DataFrame, agg: str) -> pd.DataFrame:
-        if df.empty:
-            return df
-        df = df.copy()
-        df["Time"] = pd.to_datetime(df["Time"], errors="coerce")
-        if agg != "BulkID":
-            freq_map = {
-                "Daily": "D",
-                "Weekly": "W",
-                "Monthly": "M",
-                "Quarterly": "Q",
-            }
-            df["Period"] = df["Time"].dt.to_period(freq_map[agg])
-            group_col = "Period"
-        else:
-            group_col = "BulkID"
-
-        metric_cols = [c for c in df.columns if c.startswith("FAIL_BIN_") or c == "0_PASS"]
-        agg_dict = {c: "mean" for c in metric_cols}
-        out = (
-            df.groupby(group_col)
-            .agg(agg_dict)
-            .sort_index()
-            .reset_index()
-        )
-        if agg == "Weekly":
-            period_ts = out["Period"].dt.to_timestamp()
-            iso = period_ts.dt.isocalendar()
-            out["Category"] = (
-                iso["year"].astype(str)
-                + "WW"
-                + iso["week"].astype(str).str.zfill(2)
-            )
-        elif agg == "Monthly":
-            out["Category"] = out["Period"].dt.month.astype(str) + "月"
-        else:
-            out["Category"] = out[group_col].astype(str)
-        return out
+    def build_rollups(df: pd.DataFrame, previous: YieldRollups | None = None) -> YieldRollups:
+        """全粒度のサマリーを1度に実体化する（previous があれば変わった月だけ集計し直す）。"""
+        return YieldRollups.from_frame(df, previous=previous)
+
+    @staticmethod
+    def update_rollups(previous: YieldRollups, df: pd.DataFrame) -> YieldRollups:
+        return previous.update(df)
+
+    @staticmethod
+    def build_summary(data: pd.DataFrame | YieldRollups, agg: str, mode: str = "mean") -> pd.DataFrame:
+        """ロールアップを渡すと作成済みの表を返し、DataFrame なら指定粒度だけその場で集計する。
+
+        mode="mean" はウエハごとの率の単純平均、"weighted" は BIN ダイ数の合計 / EffectiveNum の合計
+        （EffectiveNum 列が必要）。
+        """
+        if isinstance(data, YieldRollups):
+            return data.summary(agg, mode)
+        if data.empty:
+            return data
+        return summarize(data, agg, mode)
@@ -2,22 +2,133 @@
 
 from __future__ import annotations
 
-from functools import lru_cache
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import pandas as pd
 import yaml
 
-from .products import DEFAULT_SPEC_DIR, find_product_definition
+from .products import DEFAULT_SPEC_DIR, YAML_LOADER, ProductDefinition, find_product_definition
 
+SpecKey = tuple[str, "str | None", "str | None"]  # (parameter, stage, revision)
 
-@lru_cache(maxsize=1)
-def _read_specs_file(relative_path: str) -> pd.DataFrame | None:
-    spec_path = DEFAULT_SPEC_DIR / relative_path
-    if not spec_path.exists():
+
+def _to_limit(value: object) -> float | None:
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
         return None
-    with spec_path.open(encoding="utf-8") as fp:
-        data = yaml.safe_load(fp) or {}
+    return None if pd.isna(number) else number
+
+
+def _normalize(value: object, *, upper: bool = False) -> str | None:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # 欠損を含む列では YAML の整数が float になるため "1.0" ではなく "1" に揃える
+        value = int(value)
+    text = str(value).strip()
+    if not text:
+        return None
+    return text.upper() if upper else text
+
+
+def _revision_order(revision: str | None) -> tuple[int, float, str]:
+    """版は数値として読めれば数値で比較する（"10" を "9" より新しいとみなす）。"""
+    text = revision or ""
+    try:
+        return (1, float(text), text)
+    except ValueError:
+        return (0, 0.0, text)
+
+
+@dataclass(frozen=True)
+class CompiledSpecs:
+    """parameter をキーに USL/LSL を O(1) で引ける、コンパイル済みの Spec。
+
+    エントリに `stage` / `revision` があれば工程・版ごとの値として保持する。
+    revision 未指定の検索では、版なしのエントリ（なければ最新版）を使う。
+    """
+
+    source: str
+    frame: pd.DataFrame
+    entries: dict[SpecKey, tuple[float | None, float | None]]
+    defaults: dict[tuple[str, str | None], tuple[float | None, float | None]]
+    _tables: dict[tuple[str | None, str | None], pd.DataFrame] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, source: str = "<frame>") -> "CompiledSpecs":
+        df = df.copy()
+        df.columns = df.columns.str.strip()
+        entries: dict[SpecKey, tuple[float | None, float | None]] = {}
+        revisions: dict[tuple[str, str | None], dict[str | None, tuple[float | None, float | None]]] = {}
+        if "parameter" in df.columns:
+            usl = df["USL"] if "USL" in df.columns else pd.Series(None, index=df.index)
+            lsl = df["LSL"] if "LSL" in df.columns else pd.Series(None, index=df.index)
+            stage = df["stage"] if "stage" in df.columns else pd.Series(None, index=df.index)
+            revision = df["revision"] if "revision" in df.columns else pd.Series(None, index=df.index)
+            for param, u, lo, st, rev in zip(df["parameter"], usl, lsl, stage, revision):
+                name = _normalize(param)
+                if name is None:
+                    continue
+                key = (name, _normalize(st, upper=True), _normalize(rev))
+                # 重複は先頭を採用する（従来の extract_limits と同じ）
+                if key not in entries:
+                    entries[key] = (_to_limit(u), _to_limit(lo))
+                    revisions.setdefault(key[:2], {})[key[2]] = entries[key]
+        defaults: dict[tuple[str, str | None], tuple[float | None, float | None]] = {}
+        for scope, by_revision in revisions.items():
+            if None in by_revision:
+                defaults[scope] = by_revision[None]
+            else:
+                defaults[scope] = by_revision[max(by_revision, key=_revision_order)]
+        return cls(source=source, frame=df, entries=entries, defaults=defaults)
+
+    @property
+    def parameters(self) -> list[str]:
+        return list(dict.fromkeys(param for param, _ in self.defaults))
+
+    @property
+    def stages(self) -> list[str]:
+        return sorted({stage for _, stage in self.defaults if stage})
+
+    @property
+    def revisions(self) -> list[str]:
+        return sorted({rev for _, _, rev in self.entries if rev}, key=_revision_order)
+
+    def lookup(
+        self, parameter: str, *, stage: str | None = None, revision: str | None = None
+    ) -> tuple[float | None, float | None]:
+        """工程・版の指定があればそれを優先し、なければ共通の値にフォールバックする。"""
+        stage = _normalize(stage, upper=True)
+        for scope in ((stage, None) if stage else (None,)):
+            if revision is not None:
+                hit = self.entries.get((parameter, scope, _normalize(revision)))
+                if hit is not None:
+                    return hit
+            hit = self.defaults.get((parameter, scope))
+            if hit is not None:
+                return hit
+        return None, None
+
+    def table(self, *, stage: str | None = None, revision: str | None = None) -> pd.DataFrame:
+        """parameter をインデックスとする USL/LSL 表（指定の工程・版で解決済み）。"""
+        key = (_normalize(stage, upper=True), _normalize(revision))
+        cached = self._tables.get(key)
+        if cached is None:
+            params = self.parameters
+            limits = [self.lookup(p, stage=key[0], revision=key[1]) for p in params]
+            cached = pd.DataFrame(limits, index=pd.Index(params, name="parameter"), columns=["USL", "LSL"], dtype=float)
+            self._tables[key] = cached
+        return cached
+
+
+def _compile_specs_file(path: Path) -> CompiledSpecs | None:
+    with path.open(encoding="utf-8") as fp:
+        data = yaml.load(fp, Loader=YAML_LOADER) or {}
     specs = data.get("specs")
     if not specs:
         return None
@@ -25,34 +136,127 @@ def _read_specs_file(relative_path: str) -> pd.DataFrame | None:
     if df.empty:
         return None
     df.columns = df.columns.str.strip()
-    return df
+    # ファイル全体に対する stage / revision の既定値
+    for column in ("stage", "revision"):
+        if data.get(column) is not None:
+            df[column] = df[column].fillna(data[column]) if column in df.columns else data[column]
+    return CompiledSpecs.from_frame(df, source=path.as_posix())
+
+
+class SpecRegistry:
+    """Spec ファイルを1度だけ解析して保持し、mtime が変わったら読み直す。"""
+
+    def __init__(self, spec_dir: str | Path = DEFAULT_SPEC_DIR) -> None:
+        self.spec_dir = Path(spec_dir)
+        self._files: dict[str, tuple[tuple[int, int], CompiledSpecs | None]] = {}
+        self._inline: dict[str, tuple[ProductDefinition, CompiledSpecs | None]] = {}
+        self._lock = threading.Lock()
+
+    def get_file(self, relative_path: str) -> CompiledSpecs | None:
+        path = self.spec_dir / relative_path
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._files.pop(relative_path, None)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(relative_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            cached = self._files.get(relative_path)
+            if cached is None or cached[0] != version:
+                cached = (version, _compile_specs_file(path))
+                self._files[relative_path] = cached
+        return cached[1]
+
+    def _get_inline(self, definition: ProductDefinition) -> CompiledSpecs | None:
+        cached = self._inline.get(definition.name)
+        # products.yaml の再読込で定義オブジェクトが替われば作り直す
+        if cached is not None and cached[0] is definition:
+            return cached[1]
+        df = pd.DataFrame(list(definition.specs))
+        compiled = None if df.empty else CompiledSpecs.from_frame(df, source=f"products.yaml:{definition.name}")
+        with self._lock:
+            self._inline[definition.name] = (definition, compiled)
+        return compiled
+
+    def for_product(self, product_id: str | ProductDefinition) -> CompiledSpecs | None:
+        """config/products.yaml の spec_file（なければインライン specs）を返す。"""
+        definition = find_product_definition(product_id)
+        if definition is None:
+            return None
+        if definition.spec_file:
+            compiled = self.get_file(definition.spec_file)
+            if compiled is not None:
+                return compiled
+        if definition.specs:
+            return self._get_inline(definition)
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._files.clear()
+            self._inline.clear()
+
+
+_REGISTRY = SpecRegistry()
+
+
+def get_spec_registry() -> SpecRegistry:
+    return _REGISTRY
+
+
+def load_compiled_specs(product_id: str | ProductDefinition) -> CompiledSpecs | None:
+    return _REGISTRY.for_product(product_id)
 
 
-@lru_cache(maxsize=32)
 def load_specs(product_id: str) -> pd.DataFrame | None:
     """config/products.yaml で指定された spec_file を読み込む。"""
-    definition = find_product_definition(product_id)
-    if definition is None:
-        return None
-    if definition.spec_file:
-        df = _read_specs_file(definition.spec_file)
-        if df is not None:
-            return df
-    if definition.specs:
-        df = pd.DataFrame(definition.specs)
-        if df.empty:
-            return None
-        df.columns = df.columns.str.strip()
-        return df
-    return None
+    compiled = load_compiled_specs(product_id)
+    return None if compiled is None else compiled.frame
 
 
-def extract_limits(spec_df: pd.DataFrame | None, parameter: str) -> tuple[float | None, float | None]:
-    if spec_df is None or spec_df.empty:
-        return None, None
-    match = spec_df[spec_df["parameter"] == parameter]
-    if match.empty:
+def _compiled(spec_df: pd.DataFrame | CompiledSpecs | None) -> CompiledSpecs | None:
+    if spec_df is None:
+        return None
+    if isinstance(spec_df, CompiledSpecs):
+        return spec_df
+    if spec_df.empty:
+        return None
+    return CompiledSpecs.from_frame(spec_df)
+
+
+def extract_limits(
+    spec_df: pd.DataFrame | CompiledSpecs | None,
+    parameter: str,
+    *,
+    stage: str | None = None,
+    revision: str | None = None,
+) -> tuple[float | None, float | None]:
+    compiled = _compiled(spec_df)
+    if compiled is None:
         return None, None
-    usl = match["USL"].iloc[0] if "USL" in spec_df.columns else None
-    lsl = match["LSL"].iloc[0] if "LSL" in spec_df.columns else None
-    return usl, lsl
+    return compiled.lookup(parameter, stage=stage, revision=revision)
+
+
+def limits_table(
+    spec_df: pd.DataFrame | CompiledSpecs | None, *, stage: str | None = None, revision: str | None = None
+) -> pd.DataFrame:
+    """parameter をインデックスとする USL/LSL 表。重複時は extract_limits と同じく先頭を採用する。"""
+    compiled = _compiled(spec_df)
+    if compiled is None:
+        return pd.DataFrame(columns=["USL", "LSL"], dtype=float)
+    return compiled.table(stage=stage, revision=revision)
+
+
+__all__ = [
+    "CompiledSpecs",
+    "SpecRegistry",
+    "extract_limits",
+    "get_spec_registry",
+    "limits_table",
+    "load_compiled_specs",
+    "load_specs",
+]
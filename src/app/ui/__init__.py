@@ -1,9 +1,17 @@
 """UIコンポーネント系ヘルパー。"""
 
 from .components import (
+    load_progress_bar,
+    paginate,
     sidebar_backend_selector,
     sidebar_product_selector,
     sidebar_run_button,
 )
 
-__all__ = ["sidebar_backend_selector", "sidebar_product_selector", "sidebar_run_button"]
+__all__ = [
+    "load_progress_bar",
+    "paginate",
+    "sidebar_backend_selector",
+    "sidebar_product_selector",
+    "sidebar_run_button",
+]
@@ -3,13 +3,16 @@
 from __future__ import annotations
 
 from dataclasses import replace
-from typing import Iterable, Sequence
+from typing import Iterable, Sequence, TypeVar
 
 import streamlit as st
 
 from ..config import AppConfig
+from ..data.progress import ProgressCallback
 from ..products import ProductDefinition
 
+T = TypeVar("T")
+
 
 def sidebar_product_selector(products: Iterable[ProductDefinition]) -> ProductDefinition | None:
     st.sidebar.subheader("Product")
@@ -46,5 +49,47 @@ def sidebar_backend_selector(config: AppConfig) -> AppConfig:
     if selected == config.database.backend:
         return config
     new_db = replace(config.database, backend=selected)
-    st.sidebar.warning(f"DBバックエンドを {selected} に切り替えました。再読込してください。")
+    st.sidebar.warning(f"DBバックエンドを {selected} に切り替えました。接続は共有プールから再利用されます。")
     return replace(config, database=new_db)
+
+
+def load_progress_bar(label: str) -> tuple[ProgressCallback, "st.delta_generator.DeltaGenerator"]:
+    """取得中の行数を表示するプログレスバーと、それを更新するコールバックを返す。"""
+    bar = st.progress(0.0, text=label)
+
+    def update(done: int, total: int | None) -> None:
+        if total:
+            bar.progress(min(done / total, 1.0), text=f"{label} {done:,} / {total:,} 行")
+        else:
+            bar.progress(0.0, text=f"{label} {done:,} 行")
+
+    return update, bar
+
+
+def paginate(
+    items: Sequence[T],
+    *,
+    key: str,
+    page_sizes: Sequence[int] = (6, 12, 24, 48),
+    default_size: int = 12,
+) -> list[T]:
+    """ページサイズとページ番号の入力欄を表示し、現在ページ分の要素だけを返す。"""
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox(
+            "表示件数",
+            options=list(page_sizes),
+            index=list(page_sizes).index(default_size) if default_size in page_sizes else 0,
+            key=f"{key}_page_size",
+        )
+    total_pages = max((len(items) + page_size - 1) // page_size, 1)
+    with page_col:
+        page = st.number_input("ページ", min_value=1, max_value=total_pages, value=1, step=1, key=f"{key}_page")
+    start = (int(page) - 1) * page_size
+    visible = list(items[start : start + page_size])
+    with info_col:
+        if items:
+            st.caption(f"{len(items)} 件中 {start + 1}–{start + len(visible)} 件目（{int(page)} / {total_pages} ページ）")
+        else:
+            st.caption("該当する項目はありません。")
+    return visible
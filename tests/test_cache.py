@@ -0,0 +1,35 @@
+"""CachedRepository の同時取得まとめのテスト。"""
+
+from __future__ import annotations
+
+import unittest
+
+import pandas as pd
+
+from src.app.data.cache import CachedRepository
+
+
+class _CountingRepository:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def load_yield_overview(self, product_name: str, stage: str = "CP", *, since=None) -> pd.DataFrame:
+        self.calls += 1
+        return pd.DataFrame({"Yield": [0.9]})
+
+
+class FetchTest(unittest.TestCase):
+    def test_miss_just_before_previous_flight_finished_reuses_its_result(self) -> None:
+        inner = _CountingRepository()
+        repo = CachedRepository(inner, "sqlite", ttl_seconds=60, max_bytes=1 << 20)
+        repo.load_yield_overview("P")
+        # 直前の実行が結果を入れる前にキャッシュを見た呼び出しを再現する
+        get = repo.cache.get
+        repo.cache.get = lambda key, count=True: None if count else get(key, count=count)
+        df = repo.load_yield_overview("P")
+        self.assertEqual(inner.calls, 1)
+        self.assertEqual(df["Yield"].tolist(), [0.9])
+
+
+if __name__ == "__main__":
+    unittest.main()
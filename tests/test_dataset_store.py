@@ -0,0 +1,60 @@
+"""DatasetStore の版判定とメモリ上限のテスト。"""
+
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.app.data.dataset_store import DatasetStore, data_version
+
+
+def _frame(rows: int = 5000) -> pd.DataFrame:
+    return pd.DataFrame({"BulkID": [f"B{i // 25:04d}" for i in range(rows)], "PRM": np.ones(rows)})
+
+
+class DataVersionTest(unittest.TestCase):
+    def test_single_cell_change_outside_sample_changes_version(self) -> None:
+        df = _frame()
+        corrected = df.copy()
+        corrected.loc[1, "PRM"] = 999.0
+        self.assertNotEqual(data_version(df), data_version(corrected))
+
+    def test_open_serves_corrected_frame(self) -> None:
+        store = DatasetStore(max_bytes=1 << 30)
+        df = _frame()
+        first = store.open("sqlite", "P", "CP", lambda: df)
+        corrected = df.copy()
+        corrected.loc[1, "PRM"] = 999.0
+        second = store.open("sqlite", "P", "CP", lambda: corrected)
+        self.assertNotEqual(first.version, second.version)
+        self.assertEqual(second.frame.loc[1, "PRM"], 999.0)
+
+
+class DerivedBytesTest(unittest.TestCase):
+    def test_derived_values_count_toward_cap(self) -> None:
+        df = _frame()
+        store = DatasetStore(max_bytes=1 << 30)
+        handle = store.open("sqlite", "P", "CP", lambda: df)
+        frame_bytes = store.stats().bytes
+        handle.derived("grid", lambda frame: np.zeros(100_000))
+        self.assertEqual(store.stats().bytes, frame_bytes + 800_000)
+        self.assertEqual(store.entries()[0].derived_bytes, 800_000)
+
+    def test_derived_growth_evicts_idle_datasets(self) -> None:
+        df = _frame()
+        store = DatasetStore(max_bytes=1 << 30)
+        store.open("sqlite", "P", "CP", lambda: df).release()
+        handle = store.open("sqlite", "P", "WAT", lambda: df)
+        store.resize(store.stats().bytes + 400_000)
+        layers: dict[str, np.ndarray] = {}
+        self.assertIs(handle.derived("grid", lambda frame: layers), layers)
+        layers["mean"] = np.zeros(100_000)
+        handle.derived("grid", lambda frame: layers)
+        self.assertEqual([(e.stage, e.derived_bytes) for e in store.entries()], [("WAT", 800_000)])
+        self.assertEqual(store.stats().evictions, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""図キャッシュの指紋のテスト。"""
+
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.app.charts.figure_cache import frame_fingerprint
+
+
+def _frame(rows: int = 100_000) -> pd.DataFrame:
+    return pd.DataFrame({"BulkID": [f"B{i:06d}" for i in range(rows)], "Yield": np.arange(rows, dtype=np.float64)})
+
+
+class FrameFingerprintTest(unittest.TestCase):
+    def test_relabelled_row_changes_fingerprint(self) -> None:
+        df = _frame()
+        relabelled = df.copy()
+        relabelled.loc[1, "BulkID"] = "X000001"
+        self.assertNotEqual(frame_fingerprint(df), frame_fingerprint(relabelled))
+
+    def test_swapped_values_change_fingerprint(self) -> None:
+        df = _frame()
+        swapped = df.copy()
+        swapped.loc[[1, 2], "Yield"] = [2.0, 1.0]
+        self.assertNotEqual(frame_fingerprint(df), frame_fingerprint(swapped))
+
+    def test_dtype_is_part_of_fingerprint(self) -> None:
+        df = _frame(10)
+        self.assertNotEqual(frame_fingerprint(df), frame_fingerprint(df.astype({"Yield": np.float32})))
+
+    def test_in_place_change_is_seen_on_the_same_object(self) -> None:
+        df = _frame(10)
+        before = frame_fingerprint(df)
+        df.loc[3, "Yield"] = -1.0
+        self.assertNotEqual(before, frame_fingerprint(df))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""OracleRepository の WAT ストリーミング取得の進捗通知のテスト。"""
+
+from __future__ import annotations
+
+import unittest
+from dataclasses import replace
+
+import pandas as pd
+
+from src.app.config import load_config
+from src.app.data.oracle_repo import OracleRepository
+
+
+def _batch(bulk: str, wafers: range) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Product": "P",
+            "BulkID": bulk,
+            "WaferID": list(wafers),
+            "Time": pd.Timestamp("2026-01-01"),
+            "Parameter": "VTH",
+            "Value": 1.0,
+        }
+    )
+
+
+class _StubRepository(OracleRepository):
+    def __init__(self, batches: list[pd.DataFrame]) -> None:
+        config = load_config()
+        super().__init__(replace(config, database=replace(config.database, wat_chunk_rows=2)), pool=object())
+        self.batches = batches
+        self.queries: list[str] = []
+
+    def _read_sql(self, query: str, params: dict[str, object]) -> pd.DataFrame:
+        self.queries.append(query)
+        return pd.DataFrame()
+
+    def _iter_batches(self, query, params, size):
+        yield from self.batches
+
+
+class WatProgressTest(unittest.TestCase):
+    def test_streaming_does_not_count_rows_up_front(self) -> None:
+        repo = _StubRepository([_batch("B1", range(1, 3)), _batch("B2", range(1, 3))])
+        calls: list[tuple[int, int | None]] = []
+        list(repo.iter_wat_chunks("P", progress=lambda done, total: calls.append((done, total))))
+        self.assertEqual(repo.queries, [])
+        self.assertEqual(calls, [(0, None), (2, None), (4, None), (4, 4)])
+
+    def test_previous_full_load_is_used_as_estimate(self) -> None:
+        repo = _StubRepository([_batch("B1", range(1, 3)), _batch("B2", range(1, 3))])
+        list(repo.iter_wat_chunks("P"))
+        repo.batches.append(_batch("B3", range(1, 3)))
+        calls: list[tuple[int, int | None]] = []
+        list(repo.iter_wat_chunks("P", progress=lambda done, total: calls.append((done, total))))
+        self.assertEqual(calls, [(0, 4), (2, 4), (4, 4), (6, None), (6, 6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
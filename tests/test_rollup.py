@@ -0,0 +1,80 @@
+"""YieldRollups の差分更新と集計方法のテスト。"""
+
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.app.services.rollup import RollupPartial, YieldRollups
+
+
+def _frame(wafers: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    passed = rng.uniform(80, 95, wafers)
+    return pd.DataFrame(
+        {
+            "BulkID": [f"B{i // 25:03d}" for i in range(wafers)],
+            "Time": pd.Timestamp("2026-04-01") + pd.to_timedelta(np.arange(wafers) * 6, unit="h"),
+            "EffectiveNum": rng.integers(500, 1500, wafers).astype(np.float64),
+            "0_PASS": passed,
+            "FAIL_BIN_02_OPEN": 100 - passed,
+        }
+    )
+
+
+class IncrementalRollupTest(unittest.TestCase):
+    def assert_same_summaries(self, left: YieldRollups, right: YieldRollups) -> None:
+        for granularity in YieldRollups.GRANULARITIES:
+            for mode in ("mean", "weighted"):
+                pd.testing.assert_frame_equal(
+                    left.summary(granularity, mode), right.summary(granularity, mode), rtol=1e-12
+                )
+
+    def test_in_place_fail_bin_change_is_rebuilt(self) -> None:
+        df = _frame()
+        rollups = YieldRollups.from_frame(df)
+        corrected = df.copy()
+        in_may = corrected["Time"].dt.month == 5
+        corrected.loc[in_may, "FAIL_BIN_02_OPEN"] += 10
+        updated = rollups.update(corrected)
+        self.assertEqual(updated.rebuilt, 1)
+        self.assert_same_summaries(updated, YieldRollups.from_frame(corrected))
+
+    def test_unchanged_frame_reuses_everything(self) -> None:
+        df = _frame()
+        rollups = YieldRollups.from_frame(df)
+        updated = rollups.update(df.copy())
+        self.assertEqual(updated.rebuilt, 0)
+        self.assertIs(updated.summaries, rollups.summaries)
+
+    def test_appended_month_matches_full_build(self) -> None:
+        df = _frame()
+        extra = df.tail(40).assign(Time=lambda d: d["Time"] + pd.Timedelta(days=45))
+        grown = pd.concat([df, extra], ignore_index=True)
+        updated = YieldRollups.from_frame(df).update(grown)
+        self.assertLess(updated.rebuilt, len(updated.fingerprints))
+        self.assert_same_summaries(updated, YieldRollups.from_frame(grown))
+
+
+class WeightedRollupTest(unittest.TestCase):
+    def test_partials_merge_across_partitions(self) -> None:
+        df = _frame()
+        halves = [YieldRollups.from_frame(df.iloc[:300]), YieldRollups.from_frame(df.iloc[300:])]
+        merged = RollupPartial.merge([r.partial("Monthly") for r in halves])
+        whole = YieldRollups.from_frame(df)
+        pd.testing.assert_frame_equal(
+            merged.summary("Monthly", whole.metrics, "weighted"), whole.summary("Monthly", "weighted"), rtol=1e-12
+        )
+
+    def test_weighted_is_die_sum_ratio(self) -> None:
+        df = _frame()
+        summary = YieldRollups.from_frame(df).summary("BulkID", "weighted").set_index("BulkID")
+        dies = (df["0_PASS"] * df["EffectiveNum"] / 100).groupby(df["BulkID"]).sum()
+        expected = dies / df.groupby("BulkID")["EffectiveNum"].sum() * 100
+        np.testing.assert_allclose(summary["0_PASS"].to_numpy(), expected.to_numpy(), rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
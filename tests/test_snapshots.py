@@ -0,0 +1,83 @@
+"""SnapshotStore の再取得判定と書き込みのテスト。"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.app.data.snapshots import YIELD_KIND, SnapshotStore
+
+
+def _touch(path: Path, when: datetime) -> None:
+    stamp = when.timestamp()
+    os.utime(path, (stamp, stamp))
+
+
+class MissingMonthsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self._tmp.name, window=2, compact=False)
+        self.frame = pd.DataFrame({"Time": pd.to_datetime(["2026-09-10"]), "0_PASS": [90.0]})
+        self.store.write(YIELD_KIND, "P", "CP", self.frame, ["2026-08", "2026-09"])
+        self.august = self.store._partition_path(YIELD_KIND, "P", "CP", "2026-08")
+        self.september = self.store._partition_path(YIELD_KIND, "P", "CP", "2026-09")
+        _touch(self.august, datetime(2026, 9, 1, 0, 5))
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_partition_written_mid_month_is_refetched_after_rollover(self) -> None:
+        _touch(self.september, datetime(2026, 9, 15))
+        missing = self.store.missing_months(YIELD_KIND, "P", "CP", now=datetime(2026, 10, 2))
+        self.assertIn("2026-09", missing)
+        self.assertNotIn("2026-08", missing)
+
+    def test_partition_written_after_month_end_is_reused(self) -> None:
+        _touch(self.september, datetime(2026, 10, 1, 0, 30))
+        missing = self.store.missing_months(YIELD_KIND, "P", "CP", now=datetime(2026, 10, 2))
+        self.assertNotIn("2026-09", missing)
+        self.assertNotIn("2026-08", missing)
+
+
+class WriteTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self._tmp.name, window=2, compact=False)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_concurrent_writes_leave_complete_partitions(self) -> None:
+        frames = [
+            pd.DataFrame({"Time": pd.to_datetime(["2026-09-10"] * 2000), "0_PASS": [float(i)] * 2000})
+            for i in range(8)
+        ]
+        errors: list[BaseException] = []
+
+        def write(df: pd.DataFrame) -> None:
+            try:
+                self.store.write(YIELD_KIND, "P", "CP", df, ["2026-09"])
+            except BaseException as exc:  # noqa: BLE001
+                errors.append(exc)
+
+        threads = [threading.Thread(target=write, args=(df,)) for df in frames]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        path = self.store._partition_path(YIELD_KIND, "P", "CP", "2026-09")
+        written = pd.read_parquet(path)
+        self.assertEqual(len(written), 2000)
+        self.assertEqual(written["0_PASS"].nunique(), 1)
+        self.assertEqual(list(path.parent.glob("*.tmp")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""WAT チャートの間引きと軸の並びのテスト。"""
+
+from __future__ import annotations
+
+import ast
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.app.charts.render_budget import RenderBudget
+from src.app.charts.wat_charts import build_bulk_trend_chart, build_individual_chart
+from src.app.services.spc import individual_limits
+
+CHARTS_DIR = Path(__file__).resolve().parents[1] / "src" / "app" / "charts"
+
+
+def _trend(rows: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    # 時系列順の BulkID は名前順と一致しない
+    bulks = [f"B{(i * 7919) % 10000:04d}" for i in range(rows)]
+    mean_val = rng.normal(size=rows)
+    return pd.DataFrame(
+        {
+            "BulkID": bulks,
+            "mean_val": mean_val,
+            "moving_avg": pd.Series(mean_val).rolling(3).mean(),
+        }
+    )
+
+
+class BulkTrendChartTest(unittest.TestCase):
+    def test_downsampled_traces_share_bulks_in_time_order(self) -> None:
+        df = _trend()
+        fig = build_bulk_trend_chart(df, "VTH", None, None, budget=RenderBudget(max_points=50, webgl_threshold=10))
+        markers, line = fig.data
+        self.assertEqual(list(markers.x), list(line.x))
+        self.assertLessEqual(len(markers.x), 50)
+        order = {bulk: i for i, bulk in enumerate(df["BulkID"])}
+        self.assertEqual(list(markers.x), sorted(markers.x, key=order.__getitem__))
+        self.assertEqual(fig.layout.xaxis.categoryorder, "array")
+        self.assertEqual(list(fig.layout.xaxis.categoryarray), list(markers.x))
+
+
+
+class ChartLayerTest(unittest.TestCase):
+    def test_charts_do_not_import_services(self) -> None:
+        for path in CHARTS_DIR.glob("*.py"):
+            for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+                if isinstance(node, ast.ImportFrom):
+                    self.assertNotIn("services", node.module or "", f"{path.name}: {node.module}")
+
+    def test_individual_chart_draws_given_limits(self) -> None:
+        df = pd.DataFrame({"VTH": [1.0, 3.0, 2.0, 4.0]})
+        cl, ucl, lcl = individual_limits(df["VTH"])
+        self.assertAlmostEqual(cl, 2.5)
+        self.assertAlmostEqual(ucl - cl, 3 * (5 / 3) / 1.128)
+        fig = build_individual_chart(df, "VTH", None, None, limits=(cl, ucl, lcl))
+        self.assertEqual(sorted(shape.y0 for shape in fig.layout.shapes), sorted([cl, ucl, lcl]))
+
+
+if __name__ == "__main__":
+    unittest.main()